@@ -0,0 +1,269 @@
+"""Priority-aware admission control and load shedding for Surakshita
+
+Every request is classified by endpoint before it runs:
+
+    critical - SOS reports, incident creation and dispatch actions
+    heavy    - dashboards, full incident listings and bulk ingestion
+    normal   - everything else (logins, registration, small APIs)
+
+A fixed number of request slots is shared by all classes, but the last
+ADMISSION_SOS_RESERVED slots can only be taken by critical requests, so a
+flood of dashboard views can never starve an SOS report. Heavy requests
+additionally have their own cap and are refused while SQLite write-lock
+waits are elevated. A heavy request that cannot be admitted in time is
+degraded to the last snapshot of the same page for the same user, and
+shed with 503 only when no snapshot exists.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import sqlite3
+from flask import current_app, request, session, jsonify, g
+
+CRITICAL = 'critical'
+HEAVY = 'heavy'
+NORMAL = 'normal'
+
+CRITICAL_ENDPOINTS = {
+    'api_report_sos',
+    'new_incident',
+    'dispatch_unit',
+    'resolve_incident',
+    'dispatch_emergency_unit_legacy',
+}
+
+HEAVY_ENDPOINTS = {
+    'admin_dashboard',
+    'dashboard',
+    'incidents',
+    'api_incidents',
+    'api_analytics',
+    'api_incidents_bulk',
+}
+
+
+def classify(endpoint):
+    """Return the priority class for a Flask endpoint name"""
+    endpoint = endpoint.rpartition('.')[2]  # Ignore the blueprint prefix
+    if endpoint in CRITICAL_ENDPOINTS:
+        return CRITICAL
+    if endpoint in HEAVY_ENDPOINTS:
+        return HEAVY
+    return NORMAL
+
+
+class AdmissionController:
+    """Flask extension that admits, queues, degrades or sheds requests by priority"""
+
+    def __init__(self, app=None):
+        self._cond = threading.Condition()
+        self.in_flight = {CRITICAL: 0, HEAVY: 0, NORMAL: 0}
+        self.queued = 0
+        self.db_wait_ewma = 0.0
+        self.metrics = {
+            'admitted': {CRITICAL: 0, HEAVY: 0, NORMAL: 0},
+            'queued': {CRITICAL: 0, HEAVY: 0, NORMAL: 0},
+            'degraded': 0,
+            'shed': {CRITICAL: 0, HEAVY: 0, NORMAL: 0},
+            'queue_wait_seconds': 0.0,
+        }
+        self._snapshots = OrderedDict()
+        self._snapshot_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ADMISSION_ENABLED', True)
+        self.max_concurrent = app.config.get('ADMISSION_MAX_CONCURRENT', 32)
+        self.reserved = app.config.get('ADMISSION_SOS_RESERVED', 8)
+        self.heavy_max = app.config.get('ADMISSION_HEAVY_MAX', 8)
+        self.max_queue = app.config.get('ADMISSION_MAX_QUEUE', 64)
+        self.queue_timeout = app.config.get('ADMISSION_QUEUE_TIMEOUT', 2.0)
+        self.db_wait_threshold = app.config.get('ADMISSION_DB_WAIT_THRESHOLD', 0.25)
+        self.stale_seconds = app.config.get('ADMISSION_STALE_SECONDS', 300)
+        self.snapshot_limit = app.config.get('ADMISSION_SNAPSHOT_LIMIT', 512)
+
+        MonitoredCursor.controller = self
+        app.before_request(self._admit)
+        app.after_request(self._remember)
+        app.teardown_request(self._release)
+
+    # DB lock pressure
+    def record_db_wait(self, seconds):
+        """Feed one observed write-lock acquisition time into the moving average"""
+        self.db_wait_ewma = 0.8 * self.db_wait_ewma + 0.2 * seconds
+
+    def db_overloaded(self):
+        return self.db_wait_ewma > self.db_wait_threshold
+
+    # Slot accounting
+    def _total_in_flight(self):
+        return sum(self.in_flight.values())
+
+    def _has_capacity(self, priority):
+        total = self._total_in_flight()
+        if priority == CRITICAL:
+            return total < self.max_concurrent
+        if total >= self.max_concurrent - self.reserved:
+            return False
+        if priority == HEAVY:
+            return self.in_flight[HEAVY] < self.heavy_max and not self.db_overloaded()
+        return True
+
+    def acquire(self, priority, timeout):
+        """Take a slot for the given class, waiting up to timeout seconds"""
+        with self._cond:
+            if self._has_capacity(priority):
+                self.in_flight[priority] += 1
+                self.metrics['admitted'][priority] += 1
+                return True
+
+            if self.queued >= self.max_queue and priority != CRITICAL:
+                return False
+
+            self.queued += 1
+            self.metrics['queued'][priority] += 1
+            started = time.monotonic()
+            deadline = started + timeout
+            try:
+                while not self._has_capacity(priority):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.in_flight[priority] += 1
+                self.metrics['admitted'][priority] += 1
+                return True
+            finally:
+                self.queued -= 1
+                self.metrics['queue_wait_seconds'] += time.monotonic() - started
+
+    def release(self, priority):
+        with self._cond:
+            self.in_flight[priority] -= 1
+            self._cond.notify_all()
+
+    # Degraded snapshots
+    def _snapshot_key(self):
+        owner = 'admin' if session.get('is_admin_logged_in') else session.get('user_id')
+        return (request.endpoint, owner, request.full_path)
+
+    def _stale_response(self):
+        with self._snapshot_lock:
+            entry = self._snapshots.get(self._snapshot_key())
+        if entry is None or time.monotonic() - entry[0] > self.stale_seconds:
+            return None
+        stored_at, body, status, headers = entry
+        response = current_app.response_class(body, status=status, headers=headers)
+        response.headers['X-Degraded'] = 'stale-snapshot'
+        response.headers['Age'] = str(int(time.monotonic() - stored_at))
+        return response
+
+    # Flask hooks
+    def _admit(self):
+        if not self.enabled or request.endpoint is None:
+            return None
+
+        priority = classify(request.endpoint)
+        timeout = self.queue_timeout * (5 if priority == CRITICAL else 1)
+        if self.acquire(priority, timeout):
+            g.admission_class = priority
+            return None
+
+        if priority == HEAVY and request.method == 'GET':
+            stale = self._stale_response()
+            if stale is not None:
+                with self._cond:
+                    self.metrics['degraded'] += 1
+                return stale
+
+        with self._cond:
+            self.metrics['shed'][priority] += 1
+        response = jsonify({'success': False, 'error': 'Server busy, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    def _remember(self, response):
+        if response.is_streamed and g.get('admission_class') is not None:
+            # The body runs after teardown: hold the slot until the server closes the response
+            priority = g.pop('admission_class')
+            response.call_on_close(lambda: self.release(priority))
+            return response
+        if g.get('admission_class') == HEAVY and request.method == 'GET' and response.status_code == 200:
+            entry = (time.monotonic(), response.get_data(), response.status_code,
+                     [(k, v) for k, v in response.headers if k.lower() != 'set-cookie'])
+            with self._snapshot_lock:
+                self._snapshots[self._snapshot_key()] = entry
+                self._snapshots.move_to_end(self._snapshot_key())
+                while len(self._snapshots) > self.snapshot_limit:
+                    self._snapshots.popitem(last=False)
+        return response
+
+    def _release(self, exc=None):
+        priority = g.pop('admission_class', None)
+        if priority is not None:
+            self.release(priority)
+
+    def snapshot_metrics(self):
+        """Current queue, shed and in-flight figures as a JSON-serializable dict"""
+        with self._cond:
+            return {
+                'in_flight': dict(self.in_flight),
+                'queued_now': self.queued,
+                'admitted': dict(self.metrics['admitted']),
+                'queued_total': dict(self.metrics['queued']),
+                'shed': dict(self.metrics['shed']),
+                'degraded': self.metrics['degraded'],
+                'queue_wait_seconds': round(self.metrics['queue_wait_seconds'], 3),
+                'db_wait_ewma_ms': round(self.db_wait_ewma * 1000, 2),
+                'db_overloaded': self.db_overloaded(),
+                'limits': {
+                    'max_concurrent': self.max_concurrent,
+                    'sos_reserved': self.reserved,
+                    'heavy_max': self.heavy_max,
+                    'max_queue': self.max_queue,
+                },
+            }
+
+
+class MonitoredCursor(sqlite3.Cursor):
+    """Cursor that reports how long each write transaction took to open
+
+    The statement that starts a write transaction is where SQLite waits for the
+    database lock, so its duration is a direct measure of lock contention.
+    """
+
+    controller = None
+
+    def execute(self, sql, parameters=()):
+        if self.connection.in_transaction or self.controller is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        result = super().execute(sql, parameters)
+        if self.connection.in_transaction:
+            self.controller.record_db_wait(time.perf_counter() - started)
+        return result
+
+
+class MonitoredConnection(sqlite3.Connection):
+    """Connection whose writes feed lock-wait timings into admission control
+
+    Both the statement that opens a write transaction and the commit (which
+    waits for readers to finish) are timed.
+    """
+
+    def cursor(self, factory=MonitoredCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def commit(self):
+        controller = MonitoredCursor.controller
+        if not self.in_transaction or controller is None:
+            return super().commit()
+        started = time.perf_counter()
+        super().commit()
+        controller.record_db_wait(time.perf_counter() - started)
@@ -1,51 +1,109 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, session, flash, jsonify, make_response
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import sqlite3
 import bcrypt
-from functools import wraps
-from datetime import datetime
+import threading
+from functools import wraps, lru_cache
+from datetime import datetime, timezone
 import os
+import json
 from config import config
 from validators import validate_coordinates
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+import geofence
+from admission import AdmissionController, MonitoredConnection
+from assets import Assets
+from versions import VersionStamps, VersionedSnapshot
+from archival import restore_incident, start_scheduler as start_archiver
+from migrate import ensure_schema
+from database import enable_wal
+from backup import start_scheduler as start_backups
+from replica import Replica
+from sla import start_scheduler as start_sla, stored_report as stored_sla_report
+from subscriptions import Notifier, validate_subscription, add_subscription, delete_subscription
+from audit import AuditLog, MAX_SEARCH_LIMIT, search as search_audit, verify_chain
+from risk import RISK_COLUMNS, RiskGrid, validate_route
+from forecast import Forecaster
+from profiler import Profiler, format_folded, validate_session as validate_profile_session
+from shards import ShardRouter, allocate_ids, poll_floor
+from serialize import json_response, query_rows, rows_response
+from bulk import BulkPayloadError, parse_payload, validate_batch, ingest, resolve_duplicates, summarize
 
-# Initialize Flask app
-app = Flask(__name__)
+# All routes live on this blueprint; create_app() attaches it to an app
+main = Blueprint('main', __name__)
 
-# Load configuration based on FLASK_ENV
-env = os.getenv('FLASK_ENV', 'development')
-app.config.from_object(config[env])
-
-# Initialize extensions
-csrf = CSRFProtect(app)  # Initialize CSRF protection
+# Extensions are created unbound and initialized in create_app()
+csrf = CSRFProtect()
 limiter = Limiter(
-    app=app,
     key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri=app.config.get('RATELIMIT_STORAGE_URL', 'memory://')
+    default_limits=["200 per day", "50 per hour"]
 )
+admission = AdmissionController()  # Reserve capacity for SOS traffic, shed heavy pages under load
+assets = Assets()  # Fingerprinted, precompressed static files and compressed responses
+profiler = Profiler()  # Sampled stacks of chosen requests, switched on by admins (see profiler.py)
+
+# Data-change stamp shared by all workers - bumped after every incident write.
+# The backing file is only mapped on first use.
+data_version = VersionStamps('surakshita.db-version')
+
+
+# Matches new incidents against users' geofence subscriptions (see subscriptions.py)
+notifier = Notifier('surakshita.db')
+
+# Admin and dispatch actions, written in batches off the request path (see audit.py)
+audit_log = AuditLog('surakshita.db')
+
+# Optional per-region incident shard files next to the primary database (see shards.py)
+shards = ShardRouter('surakshita.db', MonitoredConnection)
 
-# Initialize geocoder for reverse geocoding
-geolocator = Nominatim(user_agent="surakshita_admin")
+# Read-only copy of the database for dashboards and aggregates (see replica.py)
+replica = Replica('surakshita.db', data_version, router=shards)
+
+# Time-decayed incident risk per grid cell, for scoring routes (see risk.py)
+risk_grid = RiskGrid('surakshita.db', data_version, router=shards)
+
+# Next-24h incident forecasts per region and type, retrained hourly (see forecast.py)
+forecaster = Forecaster('surakshita.db', router=shards)
+
+# Reverse geocoder - geopy is imported and the client built on first use
+_geolocator = None
+_geolocator_lock = threading.Lock()
+
+def get_geolocator():
+    global _geolocator
+    if _geolocator is None:
+        with _geolocator_lock:
+            if _geolocator is None:
+                from geopy.geocoders import Nominatim
+                _geolocator = Nominatim(user_agent="surakshita_admin")
+    return _geolocator
+
+def format_location_name(location):
+    """Build a 'City, State, Country' string from a geopy reverse-geocoding result"""
+    if location and location.raw.get('address'):
+        address = location.raw['address']
+        # Try to get city, town, or village
+        city = address.get('city') or address.get('town') or address.get('village') or address.get('state_district')
+        state = address.get('state')
+        country = address.get('country')
+        
+        # Build location string
+        parts = [p for p in [city, state, country] if p]
+        return ', '.join(parts) if parts else 'Unknown Location'
+    return 'Unknown Location'
+
+@lru_cache(maxsize=4096)
+def _reverse_geocode(latitude, longitude):
+    # Failed lookups raise and are therefore not cached
+    location = get_geolocator().reverse(f"{latitude}, {longitude}", timeout=5)
+    return format_location_name(location)
 
 def get_location_name(latitude, longitude):
     """Convert latitude/longitude to city name (admin-only feature)"""
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
     try:
-        location = geolocator.reverse(f"{latitude}, {longitude}", timeout=5)
-        if location and location.raw.get('address'):
-            address = location.raw['address']
-            # Try to get city, town, or village
-            city = address.get('city') or address.get('town') or address.get('village') or address.get('state_district')
-            state = address.get('state')
-            country = address.get('country')
-            
-            # Build location string
-            parts = [p for p in [city, state, country] if p]
-            return ', '.join(parts) if parts else 'Unknown Location'
-        return 'Unknown Location'
+        return _reverse_geocode(latitude, longitude)
     except (GeocoderTimedOut, GeocoderServiceError):
         return 'Location lookup failed'
     except Exception:
@@ -53,17 +111,87 @@ def get_location_name(latitude, longitude):
 
 # Database helper function
 def get_db():
-    conn = sqlite3.connect('surakshita.db')
+    conn = sqlite3.connect('surakshita.db', factory=MonitoredConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Read routing - heavy reads go to the replica when it has the data they need
+def read_source(user_id=None):
+    """Pick the database for a heavy read: (stamp of the data it will see, connect function)
+
+    Pass the user for reads of one user's incidents, None for global aggregates.
+    The stamp belongs in the ETag, so replica data is never tagged as current.
+    With sharding both the replica and the primary fan out over every shard.
+    """
+    stamp = replica.serving_stamp(user_id)
+    replica.count_read(stamp)
+    if stamp is None:
+        return data_version.current(user_id), shards.connect_all
+    return stamp, replica.connect
+
+# Shared incident queries - also used by the async serving mode (async_server.py)
+def insert_sos_incident(conn, user_id, incident_type, description, latitude, longitude, required_help):
+    """Insert a High Alert SOS incident and return its id"""
+    cursor = conn.cursor()
+    ids = allocate_ids(conn)  # None in the primary: AUTOINCREMENT
+    cursor.execute('''
+        INSERT INTO incidents 
+        (id, user_id, incident_type, description, latitude, longitude, status, priority, is_sos, required_help)
+        VALUES (?, ?, ?, ?, ?, ?, 'High Alert', 'Critical', 1, ?)
+    ''', (ids[0] if ids else None, user_id, incident_type, description, latitude, longitude, required_help))
+    incident_id = cursor.lastrowid
+    conn.commit()
+    data_version.bump(user_id)
+    notifier.submit(incident_id, user_id, incident_type, latitude, longitude)
+    return incident_id
+
+# Include High Alert, any Dispatched status, and SOS incidents. Timestamps are
+# already strings in SQLite; is_dispatched (for UI sync) is computed in SQL.
+ADMIN_ALERTS_SQL = '''
+    SELECT i.*, u.username, u.email, i.status GLOB 'Dispatched*' AS is_dispatched
+    FROM incidents i
+    JOIN users u ON i.user_id = u.id
+    WHERE (i.status = 'High Alert' OR i.status LIKE 'Dispatched%' OR i.status = 'Dispatched' OR i.is_sos = 1)
+    AND i.id > ?
+    ORDER BY i.created_at DESC
+'''
+ADMIN_ALERT_CONVERTERS = {'is_dispatched': bool}
+
+def fetch_admin_alerts(conn, after_id=0):
+    """Fetch High Alert, Dispatched and SOS incidents for the admin alert feed"""
+    serializer, cursor = query_rows(conn, ADMIN_ALERTS_SQL, (after_id,), ADMIN_ALERT_CONVERTERS)
+    return serializer.rows(cursor.fetchall())
+
+# Conditional GET helpers - version stamps are checked before any SQL runs
+def not_modified(etag):
+    """Empty 304 response for a client whose copy is still current"""
+    response = current_app.response_class(status=304)
+    return tag_response(response, etag)
+
+def tag_response(response, etag):
+    """Attach a strong ETag and force revalidation on every request"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def audit(action, target=None, **details):
+    """Record an action by whoever is signed in - queued, never waits for the database"""
+    if session.get('is_admin_logged_in'):
+        actor = 'admin'
+    elif 'user_id' in session:
+        actor = f"user:{session['user_id']}"
+    else:
+        actor = 'anonymous'
+    details = {name: value for name, value in details.items() if value is not None}
+    audit_log.record(actor, action, target, details or None, request.remote_addr)
+
 # Login required decorator
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Please login to access this page.', 'warning')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -73,7 +201,7 @@ def admin_only(f):
     def decorated_function(*args, **kwargs):
         if not session.get('is_admin_logged_in'):
             flash('Admin access required.', 'error')
-            return redirect(url_for('admin_portal_login'))
+            return redirect(url_for('main.admin_portal_login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -83,7 +211,7 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Please login to access this page.', 'warning')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         
         # Check if user is admin
         conn = get_db()
@@ -96,20 +224,20 @@ def admin_required(f):
         
         if not user or not user['is_admin']:
             flash('Access denied. Admin privileges required.', 'error')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         
         return f(*args, **kwargs)
     return decorated_function
 
 # Routes
-@app.route('/')
+@main.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.login'))
 
 # Admin Portal Login - Separate from user authentication
-@app.route('/admin', methods=['GET', 'POST'])
+@main.route('/admin', methods=['GET', 'POST'])
 def admin_portal_login():
     """Dedicated admin portal login with hardcoded credentials"""
     if request.method == 'POST':
@@ -121,15 +249,17 @@ def admin_portal_login():
             session.clear()  # Clear any existing user sessions to avoid conflicts
             session['is_admin_logged_in'] = True
             session['username'] = 'System Admin'
+            audit('admin.login')
             flash('Admin Portal Accessed', 'success')
-            return redirect(url_for('admin_dashboard'))  # Explicit return for redirect
+            return redirect(url_for('main.admin_dashboard'))  # Explicit return for redirect
         
+        audit('admin.login_failed', username=username)
         flash('Invalid Admin Credentials', 'error')
-        return redirect(url_for('admin_portal_login'))  # Redirect back to admin login on failure
+        return redirect(url_for('main.admin_portal_login'))  # Redirect back to admin login on failure
     
     return render_template('login.html', is_admin_portal=True)
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 @limiter.limit("3 per hour")
 def register():
     if request.method == 'POST':
@@ -141,11 +271,11 @@ def register():
         # Validation
         if not username or not email or not password:
             flash('All fields are required.', 'error')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         if password != confirm_password:
             flash('Passwords do not match.', 'error')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         # Hash password with bcrypt
         password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
@@ -161,14 +291,14 @@ def register():
             conn.close()
             
             flash('Registration successful! Please login.', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         except sqlite3.IntegrityError:
             flash('Username or email already exists.', 'error')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 @limiter.limit("50 per minute")
 def login():
     if request.method == 'POST':
@@ -187,32 +317,35 @@ def login():
             session['username'] = user['username']
             session['is_admin'] = bool(user['is_admin']) if 'is_admin' in user.keys() else False
             flash(f'Welcome back, {user["username"]}!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash('Invalid username or password.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
     
     return render_template('login.html')
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     session.clear()
     flash('You have been logged out successfully.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/admin/logout')
+@main.route('/admin/logout')
 def admin_logout():
     """Admin logout - clears admin session"""
+    if session.get('is_admin_logged_in'):
+        audit('admin.logout')
     session.pop('is_admin_logged_in', None)
     session.pop('admin_username', None)
     flash('Admin logged out successfully.', 'success')
-    return redirect(url_for('admin_portal_login'))
+    return redirect(url_for('main.admin_portal_login'))
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 @login_required
 def dashboard():
-    conn = get_db()
+    _, connect = read_source(session['user_id'])
+    conn = connect()
     cursor = conn.cursor()
     
     # Get incident statistics
@@ -221,14 +354,14 @@ def dashboard():
             COUNT(*) as total,
             SUM(CASE WHEN status = 'Pending' THEN 1 ELSE 0 END) as pending,
             SUM(CASE WHEN status = 'Resolved' THEN 1 ELSE 0 END) as resolved
-        FROM incidents
+        FROM incidents_all
         WHERE user_id = ?
     ''', (session['user_id'],)).fetchone()
     
     # Convert Row objects to dictionaries for JSON serialization
     incidents_by_category = [dict(row) for row in cursor.execute('''
         SELECT incident_type, COUNT(*) as count
-        FROM incidents
+        FROM incidents_all
         WHERE user_id = ?
         GROUP BY incident_type
         ORDER BY count DESC
@@ -237,7 +370,7 @@ def dashboard():
     # Get reports over time for line chart (last 30 days)
     reports_over_time = [dict(row) for row in cursor.execute('''
         SELECT DATE(created_at) as date, COUNT(*) as count
-        FROM incidents
+        FROM incidents_all
         WHERE user_id = ? AND created_at >= DATE('now', '-30 days')
         GROUP BY DATE(created_at)
         ORDER BY date ASC
@@ -245,7 +378,7 @@ def dashboard():
     
     # Get recent incidents
     recent_incidents = cursor.execute('''
-        SELECT * FROM incidents 
+        SELECT * FROM incidents_all 
         WHERE user_id = ? 
         ORDER BY created_at DESC 
         LIMIT 10
@@ -261,10 +394,11 @@ def dashboard():
         reports_over_time=reports_over_time
     )
 
-@app.route('/incidents')
+@main.route('/incidents')
 @login_required
 def incidents():
-    conn = get_db()
+    _, connect = read_source(session['user_id'])
+    conn = connect()
     cursor = conn.cursor()
     
     # Get filter parameter
@@ -272,13 +406,13 @@ def incidents():
     
     if status_filter == 'all':
         incidents_list = cursor.execute('''
-            SELECT * FROM incidents 
+            SELECT * FROM incidents_all 
             WHERE user_id = ? 
             ORDER BY created_at DESC
         ''', (session['user_id'],)).fetchall()
     else:
         incidents_list = cursor.execute('''
-            SELECT * FROM incidents 
+            SELECT * FROM incidents_all 
             WHERE user_id = ? AND status = ?
             ORDER BY created_at DESC
         ''', (session['user_id'], status_filter.capitalize())).fetchall()
@@ -287,7 +421,7 @@ def incidents():
     
     return render_template('incidents.html', incidents=incidents_list, current_filter=status_filter)
 
-@app.route('/incidents/new', methods=['GET', 'POST'])
+@main.route('/incidents/new', methods=['GET', 'POST'])
 @login_required
 def new_incident():
     if request.method == 'POST':
@@ -300,7 +434,7 @@ def new_incident():
         # Validation
         if not all([incident_type, description, latitude, longitude, required_help]):
             flash('All fields are required.', 'error')
-            return redirect(url_for('new_incident'))
+            return redirect(url_for('main.new_incident'))
         
         try:
             latitude = float(latitude)
@@ -310,39 +444,42 @@ def new_incident():
             is_valid, error_msg = validate_coordinates(latitude, longitude)
             if not is_valid:
                 flash(error_msg, 'error')
-                return redirect(url_for('new_incident'))
+                return redirect(url_for('main.new_incident'))
             
             # Privacy: Round to 4 decimal places (~11m accuracy)
             latitude = round(latitude, 4)
             longitude = round(longitude, 4)
         except ValueError:
             flash('Invalid latitude or longitude values.', 'error')
-            return redirect(url_for('new_incident'))
+            return redirect(url_for('main.new_incident'))
         
-        conn = get_db()
+        conn = shards.connect_at(latitude, longitude)
         cursor = conn.cursor()
+        ids = allocate_ids(conn)
         cursor.execute('''
-            INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status, required_help)
-            VALUES (?, ?, ?, ?, ?, 'Pending', ?)
-        ''', (session['user_id'], incident_type, description, latitude, longitude, required_help))
+            INSERT INTO incidents (id, user_id, incident_type, description, latitude, longitude, status, required_help)
+            VALUES (?, ?, ?, ?, ?, ?, 'Pending', ?)
+        ''', (ids[0] if ids else None, session['user_id'], incident_type, description, latitude, longitude, required_help))
         conn.commit()
+        data_version.bump(session['user_id'])
+        notifier.submit(cursor.lastrowid, session['user_id'], incident_type, latitude, longitude)
         conn.close()
         
         flash('Incident reported successfully!', 'success')
-        return redirect(url_for('incidents'))
+        return redirect(url_for('main.incidents'))
     
     return render_template('new_incident.html')
 
-@app.route('/incidents/<int:incident_id>/update', methods=['POST'])
+@main.route('/incidents/<int:incident_id>/update', methods=['POST'])
 @login_required
 def update_incident_status(incident_id):
     new_status = request.form.get('status')
     
     if new_status not in ['Pending', 'Resolved']:
         flash('Invalid status.', 'error')
-        return redirect(url_for('incidents'))
+        return redirect(url_for('main.incidents'))
     
-    conn = get_db()
+    conn = shards.connect_for_incident(incident_id)
     cursor = conn.cursor()
     
     # Verify ownership
@@ -351,10 +488,17 @@ def update_incident_status(incident_id):
         (incident_id, session['user_id'])
     ).fetchone()
     
+    # Reopening an archived incident moves it back into the hot table
+    if not incident and restore_incident(conn, incident_id, session['user_id']):
+        incident = cursor.execute(
+            'SELECT * FROM incidents WHERE id = ? AND user_id = ?',
+            (incident_id, session['user_id'])
+        ).fetchone()
+    
     if not incident:
         flash('Incident not found.', 'error')
         conn.close()
-        return redirect(url_for('incidents'))
+        return redirect(url_for('main.incidents'))
     
     cursor.execute('''
         UPDATE incidents 
@@ -362,13 +506,14 @@ def update_incident_status(incident_id):
         WHERE id = ? AND user_id = ?
     ''', (new_status, incident_id, session['user_id']))
     conn.commit()
+    data_version.bump(session['user_id'])
     conn.close()
     
     flash(f'Incident status updated to {new_status}.', 'success')
-    return redirect(url_for('incidents'))
+    return redirect(url_for('main.incidents'))
 
 # API endpoint for dispatching emergency units
-@app.route('/api/dispatch/<int:incident_id>', methods=['POST'])
+@main.route('/api/dispatch/<int:incident_id>', methods=['POST'])
 @csrf.exempt  # Exempt from CSRF for API endpoint
 @login_required
 def dispatch_unit(incident_id):
@@ -384,7 +529,7 @@ def dispatch_unit(incident_id):
         if not unit:
             return jsonify({'success': False, 'message': 'Missing unit parameter'}), 400
         
-        conn = get_db()
+        conn = shards.connect_for_incident(incident_id)
         cursor = conn.cursor()
         
         # Verify incident exists
@@ -410,7 +555,9 @@ def dispatch_unit(incident_id):
         ''', (new_status, updated_description, unit, incident_id))
         
         conn.commit()
+        data_version.bump(incident['user_id'])
         conn.close()
+        audit('incident.dispatch', f'incident:{incident_id}', unit=unit, previous_status=incident['status'])
         
         return jsonify({
             'success': True, 
@@ -424,13 +571,13 @@ def dispatch_unit(incident_id):
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
 # API endpoint for marking incidents as resolved
-@app.route('/api/admin/resolve/<int:incident_id>', methods=['POST'])
+@main.route('/api/admin/resolve/<int:incident_id>', methods=['POST'])
 @csrf.exempt  # Exempt from CSRF for API endpoint
 @admin_only
 def resolve_incident(incident_id):
     """Endpoint for admin to mark incidents as resolved"""
     try:
-        conn = get_db()
+        conn = shards.connect_for_incident(incident_id)
         cursor = conn.cursor()
         
         # Verify incident exists
@@ -451,7 +598,9 @@ def resolve_incident(incident_id):
         ''', (incident_id,))
         
         conn.commit()
+        data_version.bump(incident['user_id'])
         conn.close()
+        audit('incident.resolve', f'incident:{incident_id}', previous_status=incident['status'])
         
         return jsonify({
             'success': True, 
@@ -463,7 +612,7 @@ def resolve_incident(incident_id):
         return jsonify({'success': False, 'error': f'Server error: {str(e)}'}), 500
 
 # Legacy API endpoint for backward compatibility with admin dashboard
-@app.route('/api/dispatch', methods=['POST'])
+@main.route('/api/dispatch', methods=['POST'])
 @csrf.exempt  # Exempt from CSRF for API endpoint
 @admin_only
 def dispatch_emergency_unit_legacy():
@@ -496,7 +645,7 @@ def dispatch_emergency_unit_legacy():
         unit_display_name = unit_names.get(unit_type.lower(), unit_type)
         new_status = f'Dispatched: {unit_display_name}'
         
-        conn = get_db()
+        conn = shards.connect_for_incident(alert_id)
         cursor = conn.cursor()
         
         # Verify incident exists
@@ -517,7 +666,9 @@ def dispatch_emergency_unit_legacy():
         ''', (new_status, alert_id))
         
         conn.commit()
+        data_version.bump(incident['user_id'])
         conn.close()
+        audit('incident.dispatch', f'incident:{alert_id}', unit=unit_display_name, previous_status=incident['status'])
         
         return jsonify({
             'success': True, 
@@ -530,53 +681,67 @@ def dispatch_emergency_unit_legacy():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Server error: {str(e)}'}), 500
 
-@app.route('/incidents/<int:incident_id>/delete', methods=['POST'])
+@main.route('/incidents/<int:incident_id>/delete', methods=['POST'])
 @login_required
 def delete_incident(incident_id):
-    conn = get_db()
+    conn = shards.connect_for_incident(incident_id)
     cursor = conn.cursor()
     
-    # Verify ownership and delete
-    cursor.execute(
-        'DELETE FROM incidents WHERE id = ? AND user_id = ?',
+    # Verify ownership and delete (from the hot table or the archive)
+    deleted = cursor.execute(
+        f'DELETE FROM incidents WHERE id = ? AND user_id = ? RETURNING {RISK_COLUMNS}',
         (incident_id, session['user_id'])
-    )
+    ).fetchall()
+    if not deleted:
+        deleted = cursor.execute(
+            f'DELETE FROM incidents_archive WHERE id = ? AND user_id = ? RETURNING {RISK_COLUMNS}',
+            (incident_id, session['user_id'])
+        ).fetchall()
     conn.commit()
+    data_version.bump(session['user_id'])
+    risk_grid.remove(deleted)  # A deleted report no longer counts towards route risk
     
-    if cursor.rowcount > 0:
+    if deleted:
         flash('Incident deleted successfully.', 'success')
     else:
         flash('Incident not found.', 'error')
     
     conn.close()
-    return redirect(url_for('incidents'))
+    return redirect(url_for('main.incidents'))
 
 # API endpoint for map data and analytics
-@app.route('/api/incidents')
+@main.route('/api/incidents')
 @login_required
 def api_incidents():
-    conn = get_db()
-    cursor = conn.cursor()
-    incidents_list = cursor.execute('''
+    stamp, connect = read_source(session['user_id'])
+    etag = f"incidents-u{session['user_id']}-{stamp:016x}"
+    if assets.fresh(etag):
+        return not_modified(etag)
+    
+    return tag_response(rows_response(connect(), '''
         SELECT id, incident_type, description, latitude, longitude, status, priority, is_sos, created_at
-        FROM incidents 
+        FROM incidents_all 
         WHERE user_id = ?
         ORDER BY created_at DESC
-    ''', (session['user_id'],)).fetchall()
-    conn.close()
-    
-    return jsonify([dict(incident) for incident in incidents_list])
+    ''', (session['user_id'],)), etag)
 
-@app.route('/api/analytics')
+@main.route('/api/analytics')
 @login_required
 def api_analytics():
-    conn = get_db()
+    # The 30-day timeline also changes when the date rolls over
+    today = datetime.now(timezone.utc).date().isoformat()
+    stamp, connect = read_source(session['user_id'])
+    etag = f"analytics-u{session['user_id']}-{today}-{stamp:016x}"
+    if assets.fresh(etag):
+        return not_modified(etag)
+    
+    conn = connect()
     cursor = conn.cursor()
     
     # Incidents by category
     category_data = cursor.execute('''
         SELECT incident_type, COUNT(*) as count
-        FROM incidents
+        FROM incidents_all
         WHERE user_id = ?
         GROUP BY incident_type
         ORDER BY count DESC
@@ -585,7 +750,7 @@ def api_analytics():
     # Reports over time (last 30 days)
     timeline_data = cursor.execute('''
         SELECT DATE(created_at) as date, COUNT(*) as count
-        FROM incidents
+        FROM incidents_all
         WHERE user_id = ? AND created_at >= DATE('now', '-30 days')
         GROUP BY DATE(created_at)
         ORDER BY date ASC
@@ -593,13 +758,13 @@ def api_analytics():
     
     conn.close()
     
-    return jsonify({
+    return tag_response(jsonify({
         'categories': [{'type': row['incident_type'], 'count': row['count']} for row in category_data],
         'timeline': [{'date': row['date'], 'count': row['count']} for row in timeline_data]
-    })
+    }), etag)
 
 # SOS Emergency Reporting Endpoint
-@app.route('/api/report', methods=['POST'])
+@main.route('/api/report', methods=['POST'])
 @login_required
 @limiter.limit("1 per minute")
 def api_report_sos():
@@ -628,18 +793,12 @@ def api_report_sos():
         latitude = round(float(latitude), 4)
         longitude = round(float(longitude), 4)
         
-        conn = get_db()
-        cursor = conn.cursor()
+        conn = shards.connect_at(latitude, longitude)
         
         # Insert SOS incident with High Alert status and required_help
-        cursor.execute('''
-            INSERT INTO incidents 
-            (user_id, incident_type, description, latitude, longitude, status, priority, is_sos, required_help)
-            VALUES (?, ?, ?, ?, ?, 'High Alert', 'Critical', 1, ?)
-        ''', (session['user_id'], incident_type, description, latitude, longitude, required_help))
-        
-        incident_id = cursor.lastrowid
-        conn.commit()
+        incident_id = insert_sos_incident(
+            conn, session['user_id'], incident_type, description, latitude, longitude, required_help
+        )
         conn.close()
         
         flash('SOS alert sent successfully! Help is on the way.', 'success')
@@ -653,54 +812,169 @@ def api_report_sos():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Geofence subscriptions - warnings about incidents near a user's places
+@main.route('/api/subscriptions')
+@login_required
+def api_subscriptions():
+    return rows_response(get_db(), '''
+        SELECT id, name, kind AS type, latitude, longitude, radius_m, polygon, created_at
+        FROM geofence_subscriptions
+        WHERE user_id = ?
+        ORDER BY id
+    ''', (session['user_id'],), key='subscriptions', converters={'polygon': lambda p: json.loads(p) if p else None})
+
+@main.route('/api/subscriptions', methods=['POST'])
+@login_required
+@limiter.limit("20 per hour")
+def api_create_subscription():
+    """Register a circle or polygon to be warned about incidents inside it"""
+    fields, error = validate_subscription(request.get_json(silent=True))
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    conn = get_db()
+    subscription_id = add_subscription(conn, session['user_id'], fields)
+    conn.close()
+    if subscription_id is None:
+        return jsonify({'success': False, 'error': 'Subscription limit reached'}), 409
+    return jsonify({'success': True, 'subscription_id': subscription_id}), 201
+
+@main.route('/api/subscriptions/<int:subscription_id>', methods=['DELETE'])
+@login_required
+def api_delete_subscription(subscription_id):
+    conn = get_db()
+    deleted = delete_subscription(conn, session['user_id'], subscription_id)
+    conn.close()
+    if not deleted:
+        return jsonify({'success': False, 'error': 'Subscription not found'}), 404
+    return jsonify({'success': True})
+
+NOTIFICATIONS_PAGE = 100  # Notifications per /api/notifications response
+
+@main.route('/api/notifications')
+@login_required
+def api_notifications():
+    """Incidents inside the user's subscriptions, NOTIFICATIONS_PAGE at a time
+    
+    Without a cursor the newest come first; page back with before_id (the
+    lowest id received). Poll with after_id (the highest id received): the
+    next ones come oldest first, so a backlog longer than a page arrives over
+    several polls instead of its oldest part being skipped. A full page means
+    there are more.
+    """
+    after_id = request.args.get('after_id', type=int)
+    if after_id is not None:
+        where, order, cursor = 'n.id > ?', 'ASC', after_id
+    else:
+        where, order, cursor = 'n.id < ?', 'DESC', request.args.get('before_id', 2 ** 63 - 1, type=int)
+    return rows_response(get_db(), f'''
+        SELECT n.id, n.incident_id, n.incident_type, n.latitude, n.longitude, n.created_at,
+               s.name AS subscription_name
+        FROM notifications n
+        LEFT JOIN geofence_subscriptions s ON s.id = n.subscription_id
+        WHERE n.user_id = ? AND {where}
+        ORDER BY n.id {order}
+        LIMIT {NOTIFICATIONS_PAGE}
+    ''', (session['user_id'], cursor), key='notifications')
+
+# Route safety - risk of the cells a route passes through (see risk.py)
+@main.route('/api/route/score', methods=['POST'])
+@login_required
+@limiter.limit("60 per minute")
+def api_route_score():
+    """Per-segment and total risk along a polyline of [latitude, longitude] points"""
+    if not risk_grid.enabled:
+        return jsonify({'success': False, 'error': 'Route scoring is not available'}), 503
+    
+    points, error = validate_route(request.get_json(silent=True), risk_grid.cell)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    return json_response({'success': True, **risk_grid.score_route(points)})
+
+# Bulk ingestion for partner helplines and offline sync (see bulk.py)
+@main.route('/api/incidents/bulk', methods=['POST'])
+@login_required
+@limiter.limit("10 per minute")
+def api_incidents_bulk():
+    """Store a JSON array or NDJSON batch of incidents, returning a result per row"""
+    if (request.content_length or 0) > current_app.config['BULK_MAX_BYTES']:
+        return jsonify({'success': False, 'error': 'Batch too large'}), 413
+    
+    try:
+        records, parse_errors = parse_payload(request.get_data(cache=False), request.mimetype)
+    except BulkPayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if len(records) > current_app.config['BULK_MAX_ROWS']:
+        return jsonify({'success': False, 'error': f"At most {current_app.config['BULK_MAX_ROWS']} incidents per batch"}), 413
+    
+    rows, results, duplicates = validate_batch(records, parse_errors)
+    
+    # One ingest per shard file (a single one, the primary, without sharding)
+    by_shard = {}
+    for row in rows:
+        by_shard.setdefault(shards.shard_for(row[2][2], row[2][3]), []).append(row)
+    for shard_no, shard_rows in sorted(by_shard.items()):
+        conn = shards.connect(shard_no)
+        try:
+            ingest(conn, session['user_id'], shard_rows, results,
+                   chunk_size=current_app.config['BULK_CHUNK_SIZE'], stamps=data_version)
+        finally:
+            conn.close()
+    resolve_duplicates(results, duplicates)
+    
+    counts = summarize(results)
+    response = json_response({'success': counts['failed'] == 0, **counts, 'results': results})
+    if counts['failed']:
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+    return response
+
 # Real-time polling endpoint for new incidents
-@app.route('/api/poll/incidents')
+@main.route('/api/poll/incidents')
 @login_required
 def api_poll_incidents():
     """Polling endpoint to check for new incidents"""
     last_id = request.args.get('last_id', 0, type=int)
     
-    conn = get_db()
-    cursor = conn.cursor()
+    etag = data_version.etag(f"poll-u{session['user_id']}-{last_id}", session['user_id'])
+    if assets.fresh(etag):
+        return not_modified(etag)
     
-    # Get incidents newer than last_id
-    new_incidents = cursor.execute('''
+    # Get incidents newer than last_id - with shards also the last few seconds before
+    # it, which another shard may have committed late; the page skips ids it has
+    return tag_response(rows_response(shards.connect_all(), '''
         SELECT id, incident_type, description, latitude, longitude, status, priority, is_sos, created_at
         FROM incidents 
         WHERE user_id = ? AND id > ?
         ORDER BY id DESC
-    ''', (session['user_id'], last_id)).fetchall()
-    
-    conn.close()
-    
-    return jsonify({
-        'incidents': [dict(inc) for inc in new_incidents],
-        'count': len(new_incidents)
-    })
+    ''', (session['user_id'], poll_floor(last_id)), key='incidents'), etag)
 
-# Admin Dashboard - Secure Portal with Separate Authentication
-@app.route('/admin/dashboard')
-@admin_only
-def admin_dashboard():
-    """Admin dashboard - Central Dispatch Monitor showing ALL incidents"""
-    # Audit log: Track admin portal access
-    print(f"[AUDIT] Admin Portal Access: username={session.get('admin_username')}, timestamp={datetime.now().isoformat()}, action='VIEW_ADMIN_DASHBOARD'")
+def build_admin_snapshot():
+    """Compute the dispatch monitor data: active alerts, resolved list and stats
     
-    conn = get_db()
-    cursor = conn.cursor()
+    Active alerts always come from the primary (every shard, when sharded); the
+    history and totals may come from the replica (see admin_version()).
+    """
+    conn = shards.connect_all()
     
     # Separate active alerts (not resolved) from resolved incidents
-    active_alerts = cursor.execute('''
+    active_alerts = conn.execute('''
         SELECT i.*, u.username, u.email
         FROM incidents i
         JOIN users u ON i.user_id = u.id
         WHERE i.status != 'Resolved'
         ORDER BY i.created_at DESC
     ''').fetchall()
+    conn.close()
+    
+    _, connect = read_source()
+    conn = connect()
+    cursor = conn.cursor()
     
     resolved_incidents = cursor.execute('''
         SELECT i.*, u.username, u.email
-        FROM incidents i
+        FROM incidents_all i
         JOIN users u ON i.user_id = u.id
         WHERE i.status = 'Resolved'
         ORDER BY i.created_at DESC
@@ -712,7 +986,7 @@ def admin_dashboard():
             COUNT(*) as total_alerts,
             SUM(CASE WHEN status != 'Resolved' THEN 1 ELSE 0 END) as active_alerts,
             SUM(CASE WHEN status = 'Resolved' THEN 1 ELSE 0 END) as resolved_alerts
-        FROM incidents
+        FROM incidents_all
     ''').fetchone()
     
     conn.close()
@@ -736,60 +1010,248 @@ def admin_dashboard():
             incident_dict['location_name'] = 'Unknown Location'
         resolved_incidents_with_location.append(incident_dict)
     
-    return render_template('admin_dashboard.html', 
-                         active_alerts=active_alerts_with_location, 
-                         resolved_incidents=resolved_incidents_with_location, 
-                         stats=stats)
+    return {
+        'active_alerts': active_alerts_with_location,
+        'resolved_incidents': resolved_incidents_with_location,
+        'stats': dict(stats)
+    }
+
+def admin_version():
+    """Version of the dispatch monitor data: the primary's stamp, mixed with the replica's while it lags"""
+    primary = data_version.current()
+    copied = replica.serving_stamp()
+    if copied is None or copied == primary:
+        return primary
+    return (primary * 0x9E3779B97F4A7C15 ^ copied) & 0xFFFFFFFFFFFFFFFF
+
+# One shared snapshot for all dispatchers, rebuilt once per data change
+admin_snapshot = VersionedSnapshot(build_admin_snapshot, data_version, admin_version)
+
+# Admin Dashboard - Secure Portal with Separate Authentication
+@main.route('/admin/dashboard')
+@admin_only
+def admin_dashboard():
+    """Admin dashboard - Central Dispatch Monitor showing ALL incidents"""
+    audit('admin.dashboard.view')
+    
+    # Unchanged data and no pending flash messages: the browser's copy is current
+    etag = f"admin-{admin_version():016x}"
+    if assets.fresh(etag) and not session.get('_flashes'):
+        return not_modified(etag)
+    
+    version, snapshot = admin_snapshot.get()
+    
+    response = make_response(render_template('admin_dashboard.html', **snapshot))
+    return tag_response(response, f"admin-{version:016x}")
 
 # API endpoint for admin to poll new alerts
-@app.route('/api/admin/poll/alerts')
+@main.route('/api/admin/poll/alerts')
 @admin_only
 def api_admin_poll_alerts():
     """Admin polling endpoint for new high alerts with dispatch status"""
-    last_id = request.args.get('last_id', 0, type=int)
+    etag = data_version.etag('alerts')
+    if assets.fresh(etag):
+        return not_modified(etag)
     
+    return tag_response(rows_response(shards.connect_all(), ADMIN_ALERTS_SQL, (0,), key='alerts',
+                                      converters=ADMIN_ALERT_CONVERTERS), etag)
+
+# Admission control metrics for admins
+@main.route('/api/admin/metrics/admission')
+@admin_only
+def api_admin_admission_metrics():
+    """Queue, shed and in-flight figures from the admission controller"""
+    audit('admin.metrics.view', kind='admission')
+    return jsonify(admission.snapshot_metrics())
+
+# Replica lag and read routing for admins
+@main.route('/api/admin/metrics/replica')
+@admin_only
+def api_admin_replica_metrics():
+    """Replica lag, refresh and routing figures"""
+    audit('admin.metrics.view', kind='replica')
+    return jsonify(replica.snapshot_metrics())
+
+# Shard placement and routing for admins
+@main.route('/api/admin/metrics/shards')
+@admin_only
+def api_admin_shard_metrics():
+    """Shard files, writes routed to each and fan-out/lookup counts"""
+    audit('admin.metrics.view', kind='shards')
+    return jsonify(shards.snapshot_metrics())
+
+# Dispatch response-time percentiles, precomputed by sla.py
+@main.route('/api/admin/sla')
+@admin_only
+def api_admin_sla():
+    """Time-to-dispatch and time-to-resolve percentiles by region, unit type and incident type"""
+    audit('admin.sla.view')
     conn = get_db()
-    cursor = conn.cursor()
+    watermark, report = stored_sla_report(conn)
+    conn.close()
     
-    # Fetch new alerts with proper serialization, including dispatch status
-    # Include High Alert, any Dispatched status, and SOS incidents
-    new_alerts = cursor.execute('''
-        SELECT i.*, u.username, u.email
-        FROM incidents i
-        JOIN users u ON i.user_id = u.id
-        WHERE (i.status = 'High Alert' OR i.status LIKE 'Dispatched%' OR i.status = 'Dispatched' OR i.is_sos = 1)
-        ORDER BY i.created_at DESC
-    ''').fetchall()
+    etag = f"sla-{watermark}"
+    if assets.fresh(etag):
+        return not_modified(etag)
+    return tag_response(current_app.response_class(report, mimetype='application/json'), etag)
+
+# One forecast payload for all admins, rebuilt after each training
+forecast_snapshot = VersionedSnapshot(forecaster.forecast, data_version, forecaster.version)
+
+# Expected incidents for the next 24 hours, from forecast.py's seasonal models
+@main.route('/api/admin/forecast')
+@admin_only
+def api_admin_forecast():
+    """Expected incidents per hour, region and incident type for the next 24 hours; ?region= and ?limit= filter"""
+    if not forecaster.enabled:
+        return jsonify({'success': False, 'error': 'Forecasting is not available'}), 503
+    audit('admin.forecast.view')
+    
+    region = request.args.get('region')
+    limit = max(request.args.get('limit', 0, type=int), 0)
+    etag = f"forecast-{forecaster.version()}-{region or ''}-{limit}"
+    if assets.fresh(etag):
+        return not_modified(etag)
+    
+    version, payload = forecast_snapshot.get()
+    if region or limit:
+        regions = [r for r in payload['regions'] if not region or r['region'] == region]
+        payload = dict(payload, regions=regions[:limit] if limit else regions)
+    return tag_response(json_response(payload), f"forecast-{version}-{region or ''}-{limit}")
+
+# On-demand sampling profiler (see profiler.py)
+@main.route('/api/admin/profiler', methods=['GET', 'POST', 'DELETE'])
+@csrf.exempt  # Exempt from CSRF for API endpoint
+@admin_only
+def api_admin_profiler():
+    """GET the running session and past ones, POST to start profiling a share of requests, DELETE to stop"""
+    if not profiler.enabled:
+        return jsonify({'success': False, 'error': 'Profiling is not available'}), 503
+    
+    if request.method == 'POST':
+        fields, error = validate_profile_session(request.get_json(silent=True))
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        session_info = profiler.start_session(fields)
+        audit('admin.profiler.start', f"profile:{session_info['id']}", **fields)
+        return jsonify({'success': True, 'session': session_info}), 201
+    
+    if request.method == 'DELETE':
+        stopped = profiler.stop_session()
+        audit('admin.profiler.stop')
+        return jsonify({'success': True, 'stopped': stopped})
+    
+    audit('admin.metrics.view', kind='profiler')
+    return jsonify({'session': profiler.current_session(), 'sessions': profiler.sessions(),
+                    'worker': profiler.snapshot_metrics()})
+
+@main.route('/api/admin/profiler/<session_id>')
+@admin_only
+def api_admin_profile(session_id):
+    """A session's profiles summed into one collapsed-stack file (?endpoint= for one endpoint)"""
+    if not profiler.enabled:
+        return jsonify({'success': False, 'error': 'Profiling is not available'}), 503
+    
+    endpoint = request.args.get('endpoint')
+    stacks = profiler.session_stacks(session_id, endpoint)
+    if stacks is None:
+        return jsonify({'success': False, 'error': 'Profiling session not found'}), 404
+    audit('admin.profiler.download', f'profile:{session_id}', endpoint=endpoint)
+    
+    response = current_app.response_class(format_folded(stacks), mimetype='text/plain')
+    response.headers['Content-Disposition'] = f'attachment; filename="{session_id}{"-" + endpoint if endpoint else ""}.folded"'
+    return response
+
+# Audit review for admins
+@main.route('/api/admin/audit')
+@admin_only
+def api_admin_audit():
+    """Audit entries newest first, filtered by action, actor, target and time; ?verify=1 also checks the chain"""
+    filters = {name: request.args.get(name) for name in ('action', 'actor', 'target', 'since', 'until')}
+    audit('admin.audit.view', filters={name: value for name, value in filters.items() if value} or None)
+    audit_log.flush()  # Include this worker's entries from the last flush interval
     
+    limit = max(1, min(request.args.get('limit', 100, type=int), MAX_SEARCH_LIMIT))
+    conn = get_db()
+    entries = search_audit(conn, before_id=request.args.get('before_id', type=int), limit=limit, **filters)
+    payload = {
+        'entries': entries,
+        'count': len(entries),
+        'next_before_id': entries[-1]['id'] if entries and len(entries) >= limit else None,
+        'writer': audit_log.snapshot_metrics(),
+    }
+    if request.args.get('verify') == '1':
+        payload['chain'] = verify_chain(conn)
     conn.close()
+    return json_response(payload)
+
+def create_app(config_name=None):
+    """Application factory - builds a configured app with all routes attached"""
+    app = Flask(__name__)
     
-    # Strictly convert SQLite Row objects to dictionaries
-    serialized_alerts = []
-    for row in new_alerts:
-        alert_dict = dict(row)
-        # Ensure all datetime objects are converted to strings
-        if 'created_at' in alert_dict and alert_dict['created_at']:
-            alert_dict['created_at'] = str(alert_dict['created_at'])
-        if 'updated_at' in alert_dict and alert_dict['updated_at']:
-            alert_dict['updated_at'] = str(alert_dict['updated_at'])
-        
-        # Ensure dispatch status is included for UI sync
-        alert_dict['is_dispatched'] = alert_dict.get('status', '').startswith('Dispatched')
-        
-        # Include required_help and dispatched_unit in response
-        alert_dict['required_help'] = alert_dict.get('required_help', '')
-        alert_dict['dispatched_unit'] = alert_dict.get('dispatched_unit', '')
-        
-        serialized_alerts.append(alert_dict)
+    # Load configuration based on FLASK_ENV
+    env = config_name or os.getenv('FLASK_ENV', 'development')
+    app.config.from_object(config[env])
+    config[env].init_app(app)
+    app.config.setdefault('RATELIMIT_STORAGE_URI', app.config.get('RATELIMIT_STORAGE_URL', 'memory://'))
+    
+    # Initialize extensions
+    csrf.init_app(app)  # Initialize CSRF protection
+    limiter.init_app(app)
+    # Before admission: its after_request hook then runs last, so degraded snapshots are
+    # stored uncompressed and encoded for whichever client they are served to
+    assets.init_app(app)
+    admission.init_app(app)
+    # After admission, so time spent queued for a slot is not sampled
+    profiler.init_app(app)
+    app.register_blueprint(main)
+    
+    # Verify the schema once; concurrent workers wait for whichever one migrates
+    if app.config.get('AUTO_MIGRATE', True):
+        ensure_schema('surakshita.db')
+        enable_wal('surakshita.db')
+    
+    # Create and migrate the shard files when incidents are sharded
+    shards.init_app(app)
+    
+    # Match new incidents against geofence subscriptions off the request path
+    notifier.init_app(app)
     
-    return jsonify({
-        'alerts': serialized_alerts,
-        'count': len(serialized_alerts)
-    })
+    # Write queued audit entries in batches on a background thread
+    audit_log.init_app(app)
+    
+    # Fold new incidents into the route risk grid whenever the data changes
+    risk_grid.init_app(app)
+    
+    # Retrain the incident forecasts once every hour is complete
+    forecaster.init_app(app)
+    
+    # Keep the read-only replica refreshed (after migrating, so it never copies a half-migrated schema)
+    replica.init_app(app)
+    
+    # Rasterize the India geofence off the request path, so the first SOS doesn't pay for it
+    threading.Thread(target=geofence.india, name='surakshita-geofence', daemon=True).start()
+    
+    # Move long-resolved incidents to incidents_archive on a schedule, in every shard file
+    if app.config.get('ARCHIVE_INTERVAL_MINUTES'):
+        for path in shards.paths:
+            start_archiver(path, app.config['ARCHIVE_AFTER_DAYS'], app.config['ARCHIVE_INTERVAL_MINUTES'], data_version)
+    
+    # Fold new status transitions into the SLA percentile sketches
+    if app.config.get('SLA_INTERVAL_SECONDS'):
+        start_sla('surakshita.db', app.config['SLA_INTERVAL_SECONDS'], shards.paths[1:])
+    
+    # Verified, compressed hot backups of the live database
+    if app.config.get('BACKUP_INTERVAL_MINUTES'):
+        start_backups('surakshita.db', app.config['BACKUP_DIR'], app.config['BACKUP_INTERVAL_MINUTES'], app.config['BACKUP_KEEP'])
+        for shard_no, path in enumerate(shards.paths[1:], 1):
+            start_backups(path, os.path.join(app.config['BACKUP_DIR'], f'shard-{shard_no:02d}'),
+                          app.config['BACKUP_INTERVAL_MINUTES'], app.config['BACKUP_KEEP'])
+    
+    return app
+
+# WSGI entry point (e.g. gunicorn app:app)
+app = create_app()
 
 if __name__ == '__main__':
-    # Initialize database on first run
-    from database import init_db
-    init_db()
-    
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,128 @@
+"""Hot/cold archival of resolved incidents for Surakshita
+
+Incidents resolved more than ARCHIVE_AFTER_DAYS ago are moved from the hot
+`incidents` table into `incidents_archive`, keeping the active-alert queries
+and per-user scans small. History queries and exports read the
+`incidents_all` view (a UNION ALL of both tables), so archived rows stay
+visible everywhere a user or admin looks at history.
+
+Rows move in small batches, each in its own short IMMEDIATE transaction with a
+pause in between, so an SOS insert never waits behind the archiver for long.
+
+The archive table, view and indexes are created by
+migrations/0004_incident_archive.py.
+
+Run on a schedule from the app (ARCHIVE_INTERVAL_MINUTES) or from cron:
+    python archival.py --days 30
+"""
+import argparse
+import sqlite3
+import threading
+import time
+
+# Column list shared by both tables and the union view
+INCIDENT_COLUMNS = (
+    'id, user_id, incident_type, description, latitude, longitude, status, priority, '
+    'is_sos, required_help, dispatched_unit, created_at, updated_at'
+)
+
+
+def archive_resolved(db_path='surakshita.db', after_days=30, batch_size=500, pause=0.05, stamps=None):
+    """Move incidents resolved more than after_days ago into the archive
+
+    Args:
+        db_path: SQLite database file
+        after_days: Minimum age (by updated_at) of a resolved incident
+        batch_size: Rows moved per transaction
+        pause: Seconds to sleep between batches so other writers get the lock
+        stamps: Optional VersionStamps to bump after each batch
+
+    Returns:
+        Number of incidents archived
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cutoff = f'-{int(after_days)} days'
+    moved = 0
+    try:
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute('''
+                    SELECT id, user_id FROM incidents
+                    WHERE status = 'Resolved' AND updated_at < DATETIME('now', ?)
+                    ORDER BY id
+                    LIMIT ?
+                ''', (cutoff, batch_size)).fetchall()
+                if not rows:
+                    conn.execute('COMMIT')
+                    break
+
+                ids = [(row[0],) for row in rows]
+                conn.executemany(f'''
+                    INSERT OR REPLACE INTO incidents_archive ({INCIDENT_COLUMNS})
+                    SELECT {INCIDENT_COLUMNS} FROM incidents WHERE id = ?
+                ''', ids)
+                conn.executemany('DELETE FROM incidents WHERE id = ?', ids)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+            moved += len(rows)
+            if stamps is not None:
+                for user_id in {row[1] for row in rows}:
+                    stamps.bump(user_id)
+            if len(rows) < batch_size:
+                break
+            time.sleep(pause)
+    finally:
+        conn.close()
+    return moved
+
+
+def restore_incident(conn, incident_id, user_id=None):
+    """Move one archived incident back into the hot table (e.g. when it is reopened)
+
+    Returns:
+        True if the incident was found in the archive and restored
+    """
+    owner_clause = ' AND user_id = ?' if user_id is not None else ''
+    params = (incident_id, user_id) if user_id is not None else (incident_id,)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        INSERT INTO incidents ({INCIDENT_COLUMNS})
+        SELECT {INCIDENT_COLUMNS} FROM incidents_archive WHERE id = ?{owner_clause}
+    ''', params)
+    if cursor.rowcount == 0:
+        return False
+    cursor.execute('DELETE FROM incidents_archive WHERE id = ?', (incident_id,))
+    return True
+
+
+def start_scheduler(db_path, after_days, interval_minutes, stamps=None):
+    """Run archive_resolved() every interval_minutes on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval_minutes * 60)
+            try:
+                moved = archive_resolved(db_path, after_days, stamps=stamps)
+                if moved:
+                    print(f"[ARCHIVE] Moved {moved} resolved incidents to incidents_archive")
+            except (sqlite3.Error, OSError, RuntimeError) as e:
+                print(f"[ARCHIVE] Archival run failed: {e}")
+
+    thread = threading.Thread(target=run, name='surakshita-archiver', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archive resolved incidents')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--days', type=int, default=30, help='archive incidents resolved more than N days ago')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    from versions import VersionStamps
+    moved = archive_resolved(args.db, args.days, args.batch_size, stamps=VersionStamps(f'{args.db}-version'))
+    print(f"Archived {moved} incidents")
@@ -0,0 +1,191 @@
+"""Compressed responses and fingerprinted, long-cached static assets
+
+Static files are read once at startup. For each one the extension keeps a
+content hash and precompressed gzip (and brotli, when installed) variants,
+so serving an asset is a dictionary lookup - nothing is compressed per
+request.
+
+url_for('static', filename=...) gets a ?v=<content hash> parameter added
+automatically. Requests carrying the current hash are answered with
+'Cache-Control: public, max-age=31536000, immutable', so repeat visits never
+ask for them again; a changed file gets a new hash and therefore a new URL.
+Requests without it (or with an old hash) must revalidate.
+
+Dynamic HTML/JSON/CSV responses are compressed in an after_request hook
+when the client accepts it. Streamed responses are compressed chunk by
+chunk with a sync flush, so rows still reach the client as they are read.
+A response that rendered a CSRF token is sent uncompressed: next to
+reflected user input its compressed length would leak the token (BREACH).
+A compressed response's ETag gets the encoding appended, like the static
+variants, so no two representations share a tag; fresh() matches either.
+
+brotli is used when installed (pip install brotli), otherwise gzip only.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+
+from flask import current_app, g, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/javascript', 'application/javascript', 'application/json',
+    'text/csv', 'text/plain', 'image/svg+xml',
+}
+ENCODINGS = ('br', 'gzip')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASH_LENGTH = 12
+
+
+class StaticAsset:
+    """One static file: its content hash and every encoding worth sending"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.bodies = {'identity': data}
+        if self.mimetype in COMPRESSIBLE_TYPES:
+            variants = {'gzip': gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(data, quality=11)
+            # A variant is only kept if it actually saves bytes
+            self.bodies.update((name, body) for name, body in variants.items() if len(body) < len(data))
+
+
+class Assets:
+    """Flask extension for fingerprinted static files and response compression"""
+
+    def __init__(self, app=None):
+        self.files = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        self.build(app.static_folder)
+
+        self._send_static = app.view_functions['static']
+        app.view_functions['static'] = self.serve
+        app.url_defaults(self._fingerprint)
+        if self.enabled:
+            app.after_request(self.compress)
+
+    def build(self, folder):
+        """Hash and precompress every file under the static folder"""
+        files = {}
+        for root, _, names in os.walk(folder):
+            for name in names:
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, folder).replace(os.sep, '/')] = StaticAsset(path)
+        self.files = files
+
+    def _fingerprint(self, endpoint, values):
+        if endpoint == 'static':
+            asset = self.files.get(values.get('filename'))
+            if asset is not None:
+                values.setdefault('v', asset.digest)
+
+    def _encoding(self, available):
+        """Best encoding the client accepts out of available (brotli first), or 'identity'"""
+        accepted = request.accept_encodings
+        for name in ENCODINGS:
+            if name in available and accepted[name]:
+                return name
+        return 'identity'
+
+    def serve(self, filename):
+        """The static view: precompressed variant, immutable when the URL carries the current hash"""
+        asset = self.files.get(filename)
+        if asset is None:
+            return self._send_static(filename=filename)  # Added after startup - served as before
+
+        encoding = self._encoding(asset.bodies) if self.enabled else 'identity'
+        response = current_app.response_class(asset.bodies[encoding], mimetype=asset.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        if len(asset.bodies) > 1:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(f'{asset.digest}-{encoding}')  # One strong ETag per encoding
+        if request.args.get('v') == asset.digest:
+            response.headers['Cache-Control'] = IMMUTABLE
+        else:
+            response.headers['Cache-Control'] = 'public, no-cache'
+        return response.make_conditional(request)
+
+    def fresh(self, etag):
+        """True if If-None-Match names etag or the tag of a compressed copy of it"""
+        tags = request.if_none_match
+        return tags.contains(etag) or any(tags.contains(f'{etag}-{name}') for name in ENCODINGS)
+
+    def compress(self, response):
+        """after_request hook: compress HTML, JSON and CSV bodies for clients that accept it"""
+        if request.endpoint == 'static':
+            return response
+        if response.status_code == 304:
+            return self._tag_held_variant(response)
+        if (response.status_code < 200 or response.status_code == 204
+                or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token') in g):  # Token rendered
+            return response
+        encoding = self._encoding(('br', 'gzip') if brotli is not None else ('gzip',))
+        if encoding == 'identity':
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            if encoding == 'br':
+                response.set_data(brotli.compress(data, quality=self.brotli_quality))
+            else:
+                response.set_data(gzip.compress(data, self.level, mtime=0))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)  # Never the tag of the identity body
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _tag_held_variant(self, response):
+        """A 304 repeats the tag of the copy the client holds, compressed or not"""
+        etag, weak = response.get_etag()
+        if etag and not request.if_none_match.contains(etag):
+            for name in ENCODINGS:
+                if request.if_none_match.contains(f'{etag}-{name}'):
+                    response.set_etag(f'{etag}-{name}', weak)
+                    break
+        return response
+
+    def _stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            process, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+            process, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                body = process(chunk) + flush()
+                if body:
+                    yield body
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
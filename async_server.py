@@ -0,0 +1,477 @@
+"""Asyncio serving mode for the latency-critical Surakshita endpoints
+
+Serves the SOS report endpoint, the admin alert feed and a Server-Sent Events
+push channel on an ASGI event loop, next to the existing Flask routes:
+
+    uvicorn async_server:asgi_app --host 0.0.0.0 --port 5000
+
+Every other path is handed to the Flask app through asgiref's WSGI adapter, so
+one process serves the whole site. Database calls run on a dedicated executor
+and reverse geocoding never blocks the loop, so a slow Nominatim lookup or a
+long fetchall() only delays the request that needs it.
+"""
+import asyncio
+import hmac
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadData, URLSafeTimedSerializer
+from werkzeug.http import parse_etags
+
+from app import app, shards, data_version, insert_sos_incident, fetch_admin_alerts, format_location_name
+from validators import validate_coordinates
+from serialize import dumps
+from shards import poll_floor
+
+# Dedicated executor for blocking SQLite calls - sized independently of the
+# number of open client connections
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ASYNC_DB_WORKERS', 4)),
+    thread_name_prefix='surakshita-db'
+)
+
+SOS_RATE_LIMIT_SECONDS = 60   # Mirrors the "1 per minute" limit on the Flask route
+PUSH_POLL_INTERVAL = float(os.getenv('ASYNC_PUSH_INTERVAL', 2.0))
+PUSH_KEEPALIVE_SECONDS = 15
+
+
+async def run_db(func, *args):
+    """Run a blocking database function on the DB executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_EXECUTOR, func, *args)
+
+
+def _insert_sos(user_id, incident_type, description, latitude, longitude, required_help):
+    conn = shards.connect_at(latitude, longitude)
+    try:
+        return insert_sos_incident(conn, user_id, incident_type, description, latitude, longitude, required_help)
+    finally:
+        conn.close()
+
+
+def _insert_sos_limited(user_id, incident_type, description, latitude, longitude, required_help,
+                        seconds=SOS_RATE_LIMIT_SECONDS):
+    """Insert an SOS report unless the user saved one in the last seconds; None when rate limited
+
+    The check and the insert run under an exclusive lock on a side database
+    (surakshita.db-sos.lock), so a burst of posts from one user - to this
+    worker or another, for any shard - cannot all pass the check before the
+    first row is committed.
+    """
+    lock = sqlite3.connect(f'{shards.db_path}-sos.lock', timeout=30, isolation_level=None)
+    try:
+        lock.execute('BEGIN EXCLUSIVE')
+        try:
+            if _sent_sos_recently(user_id, seconds):
+                return None
+            return _insert_sos(user_id, incident_type, description, latitude, longitude, required_help)
+        finally:
+            lock.execute('ROLLBACK')
+    finally:
+        lock.close()
+
+
+def _sent_sos_recently(user_id, seconds=SOS_RATE_LIMIT_SECONDS):
+    """Whether the user has a committed SOS report from the last seconds, in any worker or shard"""
+    conn = shards.connect_all()
+    try:
+        return conn.execute(
+            "SELECT 1 FROM incidents WHERE user_id = ? AND created_at > datetime('now', ?) AND is_sos = 1 LIMIT 1",
+            (user_id, f'-{seconds} seconds')).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def _fetch_alerts(after_id=0):
+    conn = shards.connect_all()
+    try:
+        return fetch_admin_alerts(conn, after_id)
+    finally:
+        conn.close()
+
+
+def _max_incident_id():
+    return shards.max_incident_id()
+
+
+class AsyncGeocoder:
+    """Reverse geocoder that never blocks the event loop
+
+    Uses geopy's aiohttp adapter when aiohttp is installed, otherwise runs the
+    regular Nominatim client on its own small executor. Results are cached per
+    rounded coordinate so repeated alerts from one area cost a single lookup.
+    """
+
+    def __init__(self, max_workers=2, cache_size=4096):
+        self.cache_size = cache_size
+        self.max_workers = max_workers
+        self._cache = OrderedDict()
+        self._client = None
+        self._executor = None
+
+    def _create_client(self):
+        """Build the geopy client on first lookup, keeping geopy out of worker startup"""
+        from geopy.geocoders import Nominatim
+        try:
+            from geopy.adapters import AioHTTPAdapter
+            import aiohttp  # noqa: F401
+            self._client = Nominatim(user_agent="surakshita_admin", adapter_factory=AioHTTPAdapter)
+        except ImportError:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='surakshita-geo')
+            self._client = Nominatim(user_agent="surakshita_admin")
+
+    async def location_name(self, latitude, longitude):
+        """Return the 'City, State, Country' name for a coordinate"""
+        from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+        key = (round(float(latitude), 3), round(float(longitude), 3))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        if self._client is None:
+            self._create_client()
+        query = f"{latitude}, {longitude}"
+        try:
+            if self._executor is None:
+                location = await self._client.reverse(query, timeout=5)
+            else:
+                loop = asyncio.get_running_loop()
+                location = await loop.run_in_executor(
+                    self._executor, lambda: self._client.reverse(query, timeout=5)
+                )
+            name = format_location_name(location)
+        except (GeocoderTimedOut, GeocoderServiceError):
+            return 'Location lookup failed'
+        except Exception:
+            return 'Unknown Location'
+
+        self._cache[key] = name
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return name
+
+
+class AlertBroadcaster:
+    """Fans new admin alerts out to every connected push-channel client
+
+    One background task polls the database for the whole process, so the cost
+    of the feed does not grow with the number of connected dispatchers. SOS
+    reports received on this process wake the task immediately.
+    """
+
+    def __init__(self, geocoder, interval=PUSH_POLL_INTERVAL, queue_size=100):
+        self.geocoder = geocoder
+        self.interval = interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.last_id = 0
+        self.sent = set()  # Ids above poll_floor(last_id) already broadcast
+        self._wakeup = None
+        self._task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def notify(self):
+        """Check for new alerts now instead of waiting for the next interval"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self.last_id = await run_db(_max_incident_id)
+        self.sent = {alert['id'] for alert in await run_db(_fetch_alerts, poll_floor(self.last_id))}
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                alerts = await run_db(_fetch_alerts, poll_floor(self.last_id))
+            except sqlite3.Error as e:
+                print(f"[ASYNC] Alert feed query failed: {e}")
+                continue
+            # Shards commit independently: the look-back finds late commits, the ids sent skip the rest
+            alerts = [alert for alert in alerts if alert['id'] not in self.sent]
+            if not alerts:
+                continue
+
+            self.last_id = max(self.last_id, *(alert['id'] for alert in alerts))
+            floor = poll_floor(self.last_id)
+            self.sent = {incident_id for incident_id in self.sent if incident_id > floor}
+            self.sent.update(alert['id'] for alert in alerts)
+            names = await asyncio.gather(*[
+                self.geocoder.location_name(alert['latitude'], alert['longitude'])
+                for alert in alerts
+            ])
+            for alert, name in zip(alerts, names):
+                alert['location_name'] = name
+
+            event = _sse_event('alerts', {'alerts': alerts, 'count': len(alerts)})
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # Slow client - it resyncs from /api/admin/poll/alerts on reconnect
+                    self.unsubscribe(queue)
+
+
+geocoder = AsyncGeocoder()
+broadcaster = AlertBroadcaster(geocoder)
+
+# Flask session and CSRF tokens are read with the same serializers Flask uses
+_session_serializer = app.session_interface.get_signing_serializer(app)
+_csrf_serializer = URLSafeTimedSerializer(
+    app.config.get('WTF_CSRF_SECRET_KEY') or app.secret_key, salt='wtf-csrf-token'
+)
+
+
+# ASGI helpers
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _load_session(scope):
+    """Decode the signed Flask session cookie, returning {} when absent or invalid"""
+    raw = _header(scope, b'cookie')
+    if not raw:
+        return {}
+    cookie = SimpleCookie()
+    cookie.load(raw)
+    morsel = cookie.get(app.config['SESSION_COOKIE_NAME'])
+    if morsel is None:
+        return {}
+    try:
+        return _session_serializer.loads(
+            morsel.value, max_age=int(app.permanent_session_lifetime.total_seconds())
+        )
+    except BadData:
+        return {}
+
+
+def _csrf_valid(scope, session):
+    token = _header(scope, b'x-csrftoken')
+    if not token or 'csrf_token' not in session:
+        return False
+    try:
+        raw = _csrf_serializer.loads(token, max_age=app.config.get('WTF_CSRF_TIME_LIMIT'))
+    except BadData:
+        return False
+    return hmac.compare_digest(session['csrf_token'], raw)
+
+
+def _sse_event(name, payload):
+    return b"event: %s\ndata: %s\n\n" % (name.encode('utf-8'), dumps(payload))
+
+
+class _BodyTooLarge(Exception):
+    """The request body is longer than MAX_CONTENT_LENGTH"""
+
+
+async def _read_body(scope, receive):
+    """The request body, raising _BodyTooLarge past MAX_CONTENT_LENGTH as Flask's 413 does"""
+    limit = app.config.get('MAX_CONTENT_LENGTH')
+    declared = _header(scope, b'content-length')
+    if limit is not None and declared is not None and declared.isdigit() and int(declared) > limit:
+        raise _BodyTooLarge()
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise _BodyTooLarge()  # Stop reading: nothing more is buffered
+        chunks.append(chunk)
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def _send_json(send, payload, status=200, headers=()):
+    body = dumps(payload) if payload is not None else b''
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# Async endpoints
+async def report_sos(scope, receive, send, session):
+    """Async twin of api_report_sos() in app.py"""
+    if 'user_id' not in session:
+        return await _send_json(send, {'success': False, 'error': 'Login required'}, 401)
+    if not _csrf_valid(scope, session):
+        return await _send_json(send, {'success': False, 'error': 'Invalid CSRF token'}, 400)
+
+    user_id = session['user_id']
+    try:
+        body = await _read_body(scope, receive)
+    except _BodyTooLarge:
+        return await _send_json(send, {'success': False, 'error': 'Request body too large'}, 413)
+
+    try:
+        data = json.loads(body or b'{}')
+        latitude = data.get('latitude')
+        longitude = data.get('longitude')
+        incident_type = data.get('incident_type', 'SOS Emergency')
+        description = data.get('description', 'Emergency SOS alert triggered')
+        required_help = data.get('required_help')
+
+        # Validation
+        if not latitude or not longitude:
+            return await _send_json(send, {'success': False, 'error': 'Location required'}, 400)
+
+        if not required_help:
+            return await _send_json(send, {'success': False, 'error': 'Required help type must be specified'}, 400)
+
+        # Validate coordinates are within Indian territories
+        is_valid, error_msg = validate_coordinates(latitude, longitude)
+        if not is_valid:
+            return await _send_json(send, {'success': False, 'error': error_msg}, 400)
+
+        # Privacy: Round to 4 decimal places (~11m accuracy)
+        latitude = round(float(latitude), 4)
+        longitude = round(float(longitude), 4)
+
+        # The user's last SOS row is the limit, so it holds across workers and only counts reports that were saved
+        incident_id = await run_db(
+            _insert_sos_limited, user_id, incident_type, description, latitude, longitude, required_help
+        )
+        if incident_id is None:
+            return await _send_json(send, {'success': False, 'error': 'Rate limit exceeded'}, 429)
+        broadcaster.notify()
+
+        return await _send_json(send, {
+            'success': True,
+            'message': 'SOS alert sent successfully',
+            'incident_id': incident_id
+        })
+
+    except Exception as e:
+        return await _send_json(send, {'success': False, 'error': str(e)}, 500)
+
+
+async def admin_poll_alerts(scope, receive, send, session):
+    """Async twin of api_admin_poll_alerts() in app.py"""
+    if not session.get('is_admin_logged_in'):
+        return await _send_json(send, {'success': False, 'error': 'Admin access required'}, 403)
+
+    etag = data_version.etag('alerts')
+    headers = [(b'etag', f'"{etag}"'.encode('latin-1')), (b'cache-control', b'private, no-cache')]
+    if parse_etags(_header(scope, b'if-none-match')).contains(etag):
+        return await _send_json(send, None, 304, headers)
+
+    alerts = await run_db(_fetch_alerts)
+    await _send_json(send, {'alerts': alerts, 'count': len(alerts)}, headers=headers)
+
+
+async def admin_stream_alerts(scope, receive, send, session):
+    """Server-Sent Events push channel for new admin alerts"""
+    if not session.get('is_admin_logged_in'):
+        return await _send_json(send, {'success': False, 'error': 'Admin access required'}, 403)
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+
+    queue = broadcaster.subscribe()
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=PUSH_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                chunk = next_event.result()
+            else:
+                next_event.cancel()
+                if disconnected in done:
+                    break
+                chunk = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        broadcaster.unsubscribe(queue)
+        disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+ROUTES = {
+    ('POST', '/api/report'): report_sos,
+    ('GET', '/api/admin/poll/alerts'): admin_poll_alerts,
+    ('GET', '/api/admin/stream/alerts'): admin_stream_alerts,
+}
+
+flask_asgi = WsgiToAsgi(app)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await broadcaster.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await broadcaster.stop()
+            DB_EXECUTOR.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def asgi_app(scope, receive, send):
+    """ASGI entry point - async fast paths first, Flask for everything else"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    handler = ROUTES.get((scope.get('method'), scope.get('path')))
+    if handler is None:
+        return await flask_asgi(scope, receive, send)
+
+    await handler(scope, receive, send, _load_session(scope))
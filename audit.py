@@ -0,0 +1,214 @@
+"""Durable, hash-chained audit log of admin and dispatch actions
+
+record() runs on the request path and only puts a tuple on an in-process
+queue - a few microseconds, no I/O. A writer thread drains the queue every
+AUDIT_FLUSH_SECONDS and appends the entries to the audit_log table in
+batches of up to AUDIT_BATCH_SIZE rows per transaction. Entries still queued
+when the process exits are written by an atexit hook; a batch that fails to
+write is kept and retried, in order, on the next flush.
+
+Every row stores the hash of the row before it and its own SHA-256 over that
+hash and its content. Hashes are computed inside the write transaction, so
+the chain stays a single line across workers. Triggers refuse UPDATE and
+DELETE; a row edited or removed by other means breaks the chain from that
+point on, which verify_chain() reports.
+
+Table, indexes and triggers: migrations/0009_audit_log.py. Review entries
+through GET /api/admin/audit or from the command line:
+    python audit.py --tail 50
+    python audit.py --action incident.resolve --target incident:42
+    python audit.py --verify
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from serialize import query_rows
+
+GENESIS_HASH = '0' * 64
+MAX_SEARCH_LIMIT = 500
+
+AUDIT_COLUMNS = 'id, created_at, actor, action, target, details, ip, prev_hash, hash'
+
+
+def entry_hash(prev_hash, created_at, actor, action, target, details, ip):
+    """SHA-256 (hex) of an entry's content chained to the previous entry's hash"""
+    payload = json.dumps([prev_hash, created_at, actor, action, target, details, ip],
+                         separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AuditLog:
+    """Queues audit entries on the request path and writes them in batches on a worker thread
+
+    Args:
+        db_path: Database holding audit_log
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.enabled = False
+        self._queue = None
+        self._conn = None
+        self._pending = []
+        self._flush_lock = threading.Lock()
+        self.metrics = {'recorded': 0, 'dropped': 0, 'written': 0, 'batches': 0, 'failures': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('AUDIT_ENABLED', True)
+        self.flush_seconds = app.config.get('AUDIT_FLUSH_SECONDS', 1.0)
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', 500)
+        if self.enabled:
+            self._queue = queue.Queue(maxsize=app.config.get('AUDIT_QUEUE_SIZE', 100000))
+            threading.Thread(target=self._run, name='surakshita-audit', daemon=True).start()
+            atexit.register(self.flush)
+
+    def record(self, actor, action, target=None, details=None, ip=None):
+        """Queue one entry - never blocks and never touches the database"""
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait((time.time(), actor, action, target, details, ip))
+            self.metrics['recorded'] += 1
+        except queue.Full:
+            self.metrics['dropped'] += 1
+            print(f"[AUDIT] Queue full, entry lost: actor={actor} action={action} target={target}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self):
+        """Write every queued entry now; returns the number of rows written"""
+        if self._queue is None:
+            return 0
+        with self._flush_lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                             check_same_thread=False)  # Used under _flush_lock only
+            written = 0
+            while True:
+                batch, self._pending = self._pending, []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                try:
+                    self._write(batch)
+                except sqlite3.Error as e:
+                    self._pending = batch
+                    self.metrics['failures'] += 1
+                    print(f"[AUDIT] Writing {len(batch)} entries failed, will retry: {e}")
+                    return written
+                written += len(batch)
+                self.metrics['written'] += len(batch)
+                self.metrics['batches'] += 1
+
+    def _write(self, batch):
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT hash FROM audit_log ORDER BY id DESC LIMIT 1').fetchone()
+            prev_hash = row[0] if row else GENESIS_HASH
+            rows = []
+            for timestamp, actor, action, target, details, ip in batch:
+                created_at = datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='microseconds')
+                details = json.dumps(details, separators=(',', ':'), sort_keys=True, default=str) if details else None
+                digest = entry_hash(prev_hash, created_at, actor, action, target, details, ip)
+                rows.append((created_at, actor, action, target, details, ip, prev_hash, digest))
+                prev_hash = digest
+            conn.executemany('''
+                INSERT INTO audit_log (created_at, actor, action, target, details, ip, prev_hash, hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def snapshot_metrics(self):
+        return dict(self.metrics, queued=self._queue.qsize() if self._queue else 0, pending=len(self._pending))
+
+
+def search(conn, action=None, actor=None, target=None, since=None, until=None, before_id=None, limit=100):
+    """Newest-first audit entries matching every given filter
+
+    since/until compare against created_at (ISO 8601, UTC). Page backwards by
+    passing the smallest id returned as before_id.
+    """
+    clauses, params = [], []
+    for column, value in (('action', action), ('actor', actor), ('target', target)):
+        if value is not None:
+            clauses.append(f'{column} = ?')
+            params.append(value)
+    if since is not None:
+        clauses.append('created_at >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('created_at < ?')
+        params.append(until)
+    if before_id is not None:
+        clauses.append('id < ?')
+        params.append(before_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    params.append(max(1, min(limit, MAX_SEARCH_LIMIT)))
+    serializer, cursor = query_rows(
+        conn, f'SELECT {AUDIT_COLUMNS} FROM audit_log {where} ORDER BY id DESC LIMIT ?', params,
+        {'details': lambda value: json.loads(value) if value else None})
+    return serializer.rows(cursor.fetchall())
+
+
+def verify_chain(conn, batch_size=10000):
+    """Recompute the whole chain
+
+    Returns:
+        Dict with rows checked, ok, first_bad_id (None when ok) and head (last hash)
+    """
+    expected, checked, last_id = GENESIS_HASH, 0, 0
+    while True:
+        rows = conn.execute(f'SELECT {AUDIT_COLUMNS} FROM audit_log WHERE id > ? ORDER BY id LIMIT ?',
+                            (last_id, batch_size)).fetchall()
+        if not rows:
+            return {'rows': checked, 'ok': True, 'first_bad_id': None, 'head': expected}
+        for entry_id, created_at, actor, action, target, details, ip, prev_hash, digest in rows:
+            if prev_hash != expected or digest != entry_hash(prev_hash, created_at, actor, action, target, details, ip):
+                return {'rows': checked, 'ok': False, 'first_bad_id': entry_id, 'head': expected}
+            expected = digest
+            checked += 1
+            last_id = entry_id
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Review the audit log')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--verify', action='store_true', help='recompute the hash chain')
+    parser.add_argument('--tail', type=int, default=20, help='number of entries to show')
+    parser.add_argument('--action')
+    parser.add_argument('--actor')
+    parser.add_argument('--target')
+    parser.add_argument('--since', help='ISO 8601 UTC, e.g. 2026-10-01')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.verify:
+        started = time.perf_counter()
+        result = verify_chain(conn)
+        print(f"{'OK' if result['ok'] else 'BROKEN'}: {result['rows']} entries checked in "
+              f"{time.perf_counter() - started:.2f} s"
+              + ('' if result['ok'] else f", chain breaks at id {result['first_bad_id']}"))
+        raise SystemExit(0 if result['ok'] else 1)
+    for entry in reversed(search(conn, args.action, args.actor, args.target, args.since, limit=args.tail)):
+        print(f"{entry['id']:>8} {entry['created_at']} {entry['actor']:<14} {entry['action']:<24} "
+              f"{entry['target'] or '-':<14} {json.dumps(entry['details']) if entry['details'] else ''}")
+    conn.close()
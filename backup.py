@@ -0,0 +1,295 @@
+"""Online hot backups and read-only snapshots of surakshita.db
+
+Backups use SQLite's online backup API in page-limited steps with a pause
+between steps. The live database runs in WAL mode (see database.enable_wal),
+so the copy reads from one snapshot held open across all steps: writers are
+never blocked and concurrent SOS inserts do not restart the copy. On a
+database still in rollback-journal mode each step holds a read lock only for
+BACKUP_STEP_PAGES pages, and since every write from another connection
+restarts the copy, the step size is raised after a few restarts.
+
+Each backup is checked with PRAGMA integrity_check before it is gzipped into
+BACKUP_DIR as surakshita-YYYYmmddTHHMMSSZ.db.gz and recorded, with its SHA-256,
+in BACKUP_DIR/manifest.json. Only the newest BACKUP_KEEP backups are kept.
+Every worker runs the scheduler, so taking a backup and rewriting the
+manifest happen under an exclusive lock on BACKUP_DIR/.backup.lock (a small
+side database, as migrate.ensure_schema uses): the first worker backs up,
+the others then find a fresh backup and skip.
+
+The analytics replica (replica.py) is refreshed with the same copy_database().
+
+Run from the app (BACKUP_INTERVAL_MINUTES) or from cron:
+    python backup.py                 # take a backup now
+    python backup.py --list          # list backups in the manifest
+    python backup.py --verify FILE   # re-check a backup's hash and integrity
+    python backup.py --restore FILE --to restored.db
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+BACKUP_STEP_PAGES = 256
+BACKUP_PAUSE = 0.005
+MAX_RESTARTS = 3
+BACKUP_LOCK_TIMEOUT = 3600  # Seconds to wait for another process's backup to finish
+
+
+class _Restarted(Exception):
+    """The source changed too often for the current step size"""
+
+
+def copy_database(source_path, dest_path, pages=BACKUP_STEP_PAGES, pause=BACKUP_PAUSE, max_restarts=MAX_RESTARTS):
+    """Copy a live database with the online backup API in page-limited steps
+
+    Returns:
+        Stats dict: pages, bytes, seconds, steps, restarts, final step size
+        and max_step_ms (the longest single step)
+    """
+    stats = {'steps': 0, 'restarts': 0, 'max_step_ms': 0.0}
+    started = time.perf_counter()
+    while True:
+        state = {'remaining': None, 'restarts': 0, 'step_started': time.perf_counter()}
+
+        def progress(status, remaining, total):
+            now = time.perf_counter()
+            stats['steps'] += 1
+            stats['max_step_ms'] = max(stats['max_step_ms'], (now - state['step_started']) * 1000)
+            stats['pages'] = total
+            if state['remaining'] is not None and remaining > state['remaining']:
+                state['restarts'] += 1
+                stats['restarts'] += 1
+                if state['restarts'] > max_restarts and pages > 0:
+                    raise _Restarted()
+            state['remaining'] = remaining
+            if remaining:
+                time.sleep(pause)  # Let waiting writers in between steps
+            state['step_started'] = time.perf_counter()
+
+        source = sqlite3.connect(source_path, isolation_level=None)
+        target = sqlite3.connect(dest_path)
+        try:
+            if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+                # One read snapshot for the whole copy - WAL readers don't block writers
+                source.execute('BEGIN')
+                source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            source.backup(target, pages=pages, progress=progress)
+            # Copies are single files, readable without -wal/-shm companions
+            target.execute('PRAGMA journal_mode = DELETE')
+            break
+        except _Restarted:
+            # Bigger steps finish before the next write lands; -1 copies everything in one step
+            pages = pages * 8 if pages < 4096 else -1
+        finally:
+            source.close()
+            target.close()
+
+    stats['pages_per_step'] = pages
+    stats['seconds'] = time.perf_counter() - started
+    stats['bytes'] = os.path.getsize(dest_path)
+    return stats
+
+
+def check_integrity(path):
+    """Return 'ok' or the first problem reported by PRAGMA integrity_check"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(backup_dir):
+    try:
+        with open(os.path.join(backup_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _write_manifest(backup_dir, entries):
+    path = os.path.join(backup_dir, 'manifest.json')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(entries, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+def create_backup(db_path='surakshita.db', backup_dir='backups', keep=7, pages=BACKUP_STEP_PAGES, pause=BACKUP_PAUSE,
+                  min_age=None):
+    """Take a verified, compressed backup and rotate old ones
+
+    Holds the backup directory's lock throughout, so concurrent callers never
+    share temporary files or overwrite each other's manifest entries.
+
+    Args:
+        min_age: skip the backup if the newest one is younger than this many seconds
+
+    Returns:
+        Manifest entry for the new backup (with copy stats), or None if skipped
+
+    Raises:
+        RuntimeError if the copy fails its integrity check
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    lock = sqlite3.connect(os.path.join(backup_dir, '.backup.lock'), timeout=BACKUP_LOCK_TIMEOUT,
+                           isolation_level=None)
+    try:
+        lock.execute('BEGIN EXCLUSIVE')
+        try:
+            entries = _read_manifest(backup_dir)
+            if min_age is not None and entries:
+                newest = datetime.strptime(entries[-1]['created_at'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+                if (datetime.now(timezone.utc) - newest).total_seconds() < min_age:
+                    return None
+            return _backup_locked(db_path, backup_dir, entries, keep, pages, pause)
+        finally:
+            lock.execute('ROLLBACK')
+    finally:
+        lock.close()
+
+
+def _backup_locked(db_path, backup_dir, entries, keep, pages, pause):
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    raw_path = os.path.join(backup_dir, f'.surakshita-{stamp}.db.partial-{os.getpid()}')
+    final_path = os.path.join(backup_dir, f'surakshita-{stamp}.db.gz')
+    gz_partial = f'{final_path}.partial-{os.getpid()}'
+
+    try:
+        stats = copy_database(db_path, raw_path, pages, pause)
+        integrity = check_integrity(raw_path)
+        if integrity != 'ok':
+            raise RuntimeError(f"Backup failed integrity check: {integrity}")
+
+        started = time.perf_counter()
+        with open(raw_path, 'rb') as src, gzip.open(gz_partial, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(gz_partial, final_path)
+        stats['compress_seconds'] = time.perf_counter() - started
+    finally:
+        for leftover in (raw_path, gz_partial):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    entry = {
+        'file': os.path.basename(final_path),
+        'created_at': stamp,
+        'db_bytes': stats['bytes'],
+        'gz_bytes': os.path.getsize(final_path),
+        'sha256': _sha256(final_path),
+        'integrity': 'ok',
+    }
+    # A backup taken in the same second replaced the file: keep one entry for it
+    entries = [e for e in entries if e['file'] != entry['file']] + [entry]
+    for old in entries[:-keep] if keep else []:
+        old_path = os.path.join(backup_dir, old['file'])
+        if os.path.exists(old_path):
+            os.remove(old_path)
+    _write_manifest(backup_dir, entries[-keep:] if keep else entries)
+    return dict(entry, stats=stats)
+
+
+def restore_backup(backup_path, dest_path):
+    """Decompress a backup to dest_path (which must not exist) and check it"""
+    if os.path.exists(dest_path):
+        raise FileExistsError(dest_path)
+    with gzip.open(backup_path, 'rb') as src, open(f'{dest_path}.partial', 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    integrity = check_integrity(f'{dest_path}.partial')
+    if integrity != 'ok':
+        os.remove(f'{dest_path}.partial')
+        raise RuntimeError(f"Restored copy failed integrity check: {integrity}")
+    os.replace(f'{dest_path}.partial', dest_path)
+
+
+def verify_backup(backup_path):
+    """Re-check a backup against its manifest hash and with integrity_check
+
+    Returns:
+        (ok, message)
+    """
+    backup_dir, name = os.path.split(os.path.abspath(backup_path))
+    entry = next((e for e in _read_manifest(backup_dir) if e['file'] == name), None)
+    if entry is not None and _sha256(backup_path) != entry['sha256']:
+        return False, "SHA-256 does not match the manifest"
+    scratch = os.path.join(backup_dir, f'.verify-{os.getpid()}.db')
+    try:
+        restore_backup(backup_path, scratch)
+    except (RuntimeError, OSError, EOFError, sqlite3.DatabaseError) as e:
+        return False, str(e)
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+    return True, 'ok' if entry is not None else 'ok (not in manifest)'
+
+
+def start_scheduler(db_path, backup_dir, interval_minutes, keep=7):
+    """Take a backup every interval_minutes on a daemon thread
+
+    With several workers each runs the thread, but a run is skipped when the
+    newest backup is younger than the interval - checked under the backup
+    lock - so one backup is taken per interval.
+    """
+    def run():
+        while True:
+            time.sleep(interval_minutes * 60)
+            try:
+                entry = create_backup(db_path, backup_dir, keep, min_age=interval_minutes * 60 * 0.9)
+                if entry is None:
+                    continue  # Another worker just took it
+                stats = entry['stats']
+                print(f"[BACKUP] {entry['file']}: {stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.2f} s, "
+                      f"max step {stats['max_step_ms']:.1f} ms, {stats['restarts']} restarts")
+            except (sqlite3.Error, OSError, RuntimeError) as e:
+                print(f"[BACKUP] Backup failed: {e}")
+
+    thread = threading.Thread(target=run, name='surakshita-backup', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Online backups of surakshita.db')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--dir', default='backups')
+    parser.add_argument('--keep', type=int, default=7)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--list', action='store_true', help='list backups in the manifest')
+    group.add_argument('--verify', metavar='FILE', help='check a backup against its hash and integrity')
+    group.add_argument('--restore', metavar='FILE', help='decompress a backup (use with --to)')
+    parser.add_argument('--to', help='destination for --restore')
+    args = parser.parse_args()
+
+    if args.list:
+        for entry in _read_manifest(args.dir):
+            print(f"{entry['file']}  {entry['db_bytes'] / 1e6:8.1f} MB -> {entry['gz_bytes'] / 1e6:6.1f} MB  "
+                  f"{entry['integrity']}")
+    elif args.verify:
+        ok, message = verify_backup(args.verify)
+        print(message)
+        raise SystemExit(0 if ok else 1)
+    elif args.restore:
+        if not args.to:
+            parser.error('--restore needs --to')
+        restore_backup(args.restore, args.to)
+        print(f"Restored {args.restore} to {args.to}")
+    else:
+        entry = create_backup(args.db, args.dir, args.keep)
+        stats = entry['stats']
+        print(f"Backed up {stats['bytes'] / 1e6:.1f} MB to {os.path.join(args.dir, entry['file'])} "
+              f"({entry['gz_bytes'] / 1e6:.1f} MB compressed) in {stats['seconds']:.2f} s: "
+              f"{stats['bytes'] / 1e6 / stats['seconds']:.1f} MB/s, max step {stats['max_step_ms']:.1f} ms, "
+              f"{stats['restarts']} restarts")
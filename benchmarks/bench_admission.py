@@ -0,0 +1,96 @@
+"""Load test: SOS latency while background dashboard load triples
+
+Seeds one user with a large incident history, then runs background clients
+hammering the heavy endpoints (/dashboard, /api/incidents, /api/analytics) at
+1x, 2x and 3x concurrency while a probe posts to /api/report. Runs once with
+admission control disabled and once enabled, printing SOS latency percentiles,
+background throughput and the controller's shed/degraded counters.
+
+Usage:
+    python benchmarks/bench_admission.py --base-clients 8 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+from common import (raise_fd_limit, seed_database, session_cookie, csrf_header,
+                    start_server, http_request, percentile)
+
+HEAVY_PATHS = ['/dashboard', '/api/incidents', '/api/analytics']
+
+
+async def background_client(port, cookie, stop, counts):
+    i = 0
+    while not stop.is_set():
+        status, _, _ = await http_request(port, 'GET', HEAVY_PATHS[i % len(HEAVY_PATHS)], {'Cookie': cookie})
+        counts[status] = counts.get(status, 0) + 1
+        i += 1
+
+
+async def sos_probe(port, cookie, token, stop, latencies):
+    body = json.dumps({'latitude': 19.07, 'longitude': 72.87, 'required_help': 'Police'}).encode()
+    headers = {'Cookie': cookie, 'X-CSRFToken': token, 'Content-Type': 'application/json'}
+    while not stop.is_set():
+        status, _, elapsed = await http_request(port, 'POST', '/api/report', headers, body)
+        if status == 200:
+            latencies.append(elapsed)
+        await asyncio.sleep(0.1)
+
+
+async def run_level(port, clients, seconds, user_cookie, token):
+    stop = asyncio.Event()
+    counts, latencies = {}, []
+    tasks = [asyncio.ensure_future(background_client(port, user_cookie, stop, counts))
+             for _ in range(clients)]
+    tasks.append(asyncio.ensure_future(sos_probe(port, user_cookie, token, stop, latencies)))
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return latencies, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    user_cookie = session_cookie({'user_id': 1, 'csrf_token': 'bench-csrf'})
+    admin_cookie = session_cookie({'is_admin_logged_in': True})
+    token = csrf_header('bench-csrf')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_database(workdir, args.rows, status='Pending', is_sos=0)
+        print(f"{'admission':<10} {'load':>5} {'sos n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'bg 200/s':>9} {'bg 503':>7}")
+
+        for enabled, port in ((False, 5821), (True, 5822)):
+            proc = start_server('threaded', port, workdir,
+                                ADMISSION_ENABLED=enabled, ADMISSION_MAX_CONCURRENT=16,
+                                ADMISSION_SOS_RESERVED=4, ADMISSION_HEAVY_MAX=4)
+            try:
+                for multiplier in (1, 2, 3):
+                    latencies, counts = asyncio.run(run_level(
+                        port, args.base_clients * multiplier, args.seconds, user_cookie, token
+                    ))
+                    print(f"{'on' if enabled else 'off':<10} {multiplier:>4}x {len(latencies):>6} "
+                          f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+                          f"{percentile(latencies, 99) * 1000:>8.1f} "
+                          f"{counts.get(200, 0) / args.seconds:>9.1f} {counts.get(503, 0):>7}")
+                if enabled:
+                    _, body, _ = asyncio.run(http_request(
+                        port, 'GET', '/api/admin/metrics/admission', {'Cookie': admin_cookie}
+                    ))
+                    print('\nadmission metrics:', body.decode())
+            finally:
+                proc.terminate()
+                proc.wait()
+            time.sleep(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Bytes on the wire and modelled time-to-interactive, before and after assets.py
+
+Runs the app in-process against a throwaway database (one user with a few
+hundred incidents) and fetches the dashboard and report pages with the
+same-origin CSS and JS they reference, plus the JSON APIs. For each page:
+
+    before   uncompressed HTML with the page script inline (the extracted
+             file's size is added back), styles.css re-validated on repeat
+             visits (no cache headers)
+    after    HTML as sent (uncompressed when it carries a CSRF token, as
+             both these pages do), fingerprinted precompressed assets that
+             repeat visits take from the browser cache without a request
+
+Time to interactive is modelled, not measured (there is no browser here):
+HTML download, then one more round trip for the render-blocking CSS/JS
+sharing the link. CDN scripts and fonts are identical before and after and
+are left out of both.
+
+Usage:
+    python benchmarks/bench_assets.py
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+
+from common import SECRET_KEY
+
+# name: (downlink bytes/s, round-trip seconds) - Lighthouse-style throttling presets
+NETWORKS = {
+    'slow 3G': (400_000 / 8, 0.400),
+    'slow 4G': (1_600_000 / 8, 0.150),
+}
+PAGES = ('/dashboard', '/incidents/new')
+APIS = ('/api/incidents', '/api/analytics')
+TYPES = ('Harassment', 'Stalking', 'Assault', 'SOS Emergency', 'Other')
+
+
+def seed(path, incidents, rng):
+    conn = sqlite3.connect(path)
+    user_id = conn.execute("SELECT id FROM users WHERE username = 'bench'").fetchone()[0]
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, datetime('now', ?))
+    ''', [(user_id, rng.choice(TYPES), 'Reported near the bus stop on the way back from college',
+           rng.uniform(18.9, 19.2), rng.uniform(72.8, 73.0), rng.choice(('Reported', 'Resolved')),
+           f'-{rng.randint(0, 30)} days') for _ in range(incidents)])
+    conn.commit()
+    conn.close()
+
+
+def modelled_tti(html_bytes, asset_bytes, asset_requests, network):
+    """Seconds until the page can run its scripts: HTML, then the blocking assets in parallel"""
+    bandwidth, rtt = NETWORKS[network]
+    seconds = rtt + html_bytes / bandwidth
+    if asset_requests:
+        seconds += rtt + asset_bytes / bandwidth
+    return seconds
+
+
+def local_assets(html):
+    return re.findall(r'(?:src|href)="(/static/[^"]+)"', html)
+
+
+def timed_get(client, path, encoding, runs=5):
+    """(response, best server time in ms) for a GET with the given Accept-Encoding"""
+    best = float('inf')
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(path, headers={'Accept-Encoding': encoding})
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return response, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory(prefix='bench_assets_')  # Removed at exit
+    os.chdir(workdir.name)
+    os.environ.update(SECRET_KEY=SECRET_KEY, FLASK_ENV='development', ARCHIVE_INTERVAL_MINUTES='0',
+                      BACKUP_INTERVAL_MINUTES='0', SLA_INTERVAL_SECONDS='0', REPLICA_REFRESH_SECONDS='0',
+                      NOTIFY_ENABLED='False')
+    from app import app
+    import assets
+    app.config.update(WTF_CSRF_ENABLED=False, RATELIMIT_ENABLED=False, ADMISSION_ENABLED=False)
+    client = app.test_client()
+    client.post('/register', data={'username': 'bench', 'email': 'bench@x.in', 'password': 'Passw0rd!23',
+                                   'confirm_password': 'Passw0rd!23'})
+    client.post('/login', data={'username': 'bench', 'password': 'Passw0rd!23'})
+    seed(os.path.join(workdir.name, 'surakshita.db'), args.incidents, random.Random(5))
+    encoding = 'gzip, deflate, br' if assets.brotli is not None else 'gzip, deflate'
+    print(f"Compression: {'brotli + gzip' if assets.brotli is not None else 'gzip (brotli not installed)'}\n")
+
+    print(f"{'page':<16} {'visit':<7} {'before B':>9} {'after B':>8} {'saved':>6} {'reqs':>9} "
+          + ' '.join(f"{name + ' TTI before/after s':>27}" for name in NETWORKS))
+    for page in PAGES:
+        plain, plain_ms = timed_get(client, page, 'identity')
+        packed, packed_ms = timed_get(client, page, encoding)
+        html = plain.get_data(as_text=True)
+        paths = local_assets(html)
+        css, js = [], []
+        for path in paths:
+            raw = client.get(path, headers={'Accept-Encoding': 'identity'})
+            wire = client.get(path, headers={'Accept-Encoding': encoding})
+            assert 'immutable' in wire.headers['Cache-Control'], path
+            (js if path.split('?')[0].endswith('.js') else css).append((len(raw.data), len(wire.data)))
+
+        # Before: scripts were inline in the HTML, stylesheets were separate files
+        before_html = len(plain.data) + sum(raw for raw, _ in js)
+        before_assets = sum(raw for raw, _ in css)
+        after_html = len(packed.data)
+        after_assets = sum(wire for _, wire in css + js)
+        visits = (
+            ('first', before_html, before_assets, len(css), after_html, after_assets, len(paths)),
+            # Before: the stylesheet is revalidated (a 304 round trip, no body); after: no request at all
+            ('repeat', before_html, 0, len(css), after_html, 0, 0),
+        )
+        for visit, b_html, b_assets, b_reqs, a_html, a_assets, a_reqs in visits:
+            before, after = b_html + b_assets, a_html + a_assets
+            ttis = ' '.join(
+                f"{modelled_tti(b_html, b_assets, b_reqs, name):>13.2f} / {modelled_tti(a_html, a_assets, a_reqs, name):<11.2f}"
+                for name in NETWORKS)
+            print(f"{page:<16} {visit:<7} {before:>9} {after:>8} {1 - after / before:>6.0%} "
+                  f"{f'{1 + b_reqs} / {1 + a_reqs}':>9} {ttis}")
+        print(f"{'':<16} server time identity {plain_ms:.1f} ms, compressed {packed_ms:.1f} ms")
+
+    print(f"\n{'api':<16} {'identity B':>10} {'wire B':>8} {'saved':>6}")
+    for api in APIS:
+        plain, _ = timed_get(client, api, 'identity')
+        packed, _ = timed_get(client, api, encoding)
+        print(f"{api:<16} {len(plain.data):>10} {len(packed.data):>8} {1 - len(packed.data) / len(plain.data):>6.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Audit log benchmark: request-path cost, writer throughput, search and verification
+
+Against a throwaway database migrated to the current schema:
+
+    record      per-call latency of AuditLog.record() (queue only) vs the old
+                print("[AUDIT] ...") to a line-buffered stdout and vs a
+                synchronous INSERT + commit per action (what writing on the
+                request path would cost)
+    writer      rows per second the batched, hash-chained writer appends
+    search      indexed audit.search() by action, actor and target, newest
+                first, once the table holds --rows entries
+    verify      verify_chain() over the whole table
+
+Usage:
+    python benchmarks/bench_audit.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from migrate import migrate
+import audit
+
+ACTIONS = ('incident.dispatch', 'incident.resolve', 'admin.dashboard.view', 'admin.login', 'admin.metrics.view')
+
+
+class FakeApp:
+    def __init__(self, **config):
+        self.config = config
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (statistics.median(samples) * 1e6, samples[int(len(samples) * 0.99)] * 1e6)
+
+
+def entry(rng):
+    incident = rng.randint(1, 50000)
+    return ('admin', rng.choice(ACTIONS), f'incident:{incident}',
+            {'unit': 'Police Patrol', 'previous_status': 'Reported'}, '10.0.0.7')
+
+
+def time_calls(fn, entries):
+    samples = []
+    for args in entries:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def bench_record(db_path, calls, rng):
+    entries = [entry(rng) for _ in range(calls)]
+    log = audit.AuditLog(db_path)
+    log.init_app(FakeApp(AUDIT_FLUSH_SECONDS=3600, AUDIT_QUEUE_SIZE=calls + 1))  # Writer stays idle while timing
+    queued = time_calls(log.record, entries)
+    log.flush()
+
+    # Line-buffered like a terminal or journald pipe: one write() syscall per entry
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w', buffering=1)
+    try:
+        printed = time_calls(lambda actor, action, target, details, ip:
+                             print(f'[AUDIT] {actor} {action} {target} {details} from {ip}'), entries)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+
+    def insert(actor, action, target, details, ip):
+        conn.execute('BEGIN IMMEDIATE')
+        prev = conn.execute('SELECT hash FROM audit_log ORDER BY id DESC LIMIT 1').fetchone()[0]
+        conn.execute('INSERT INTO audit_log (created_at, actor, action, target, details, ip, prev_hash, hash) '
+                     'VALUES (datetime(), ?, ?, ?, ?, ?, ?, ?)', (actor, action, target, str(details), ip, prev, prev))
+        conn.execute('COMMIT')
+    synchronous = time_calls(insert, entries[:min(calls, 2000)])
+    conn.close()
+
+    print(f"{'record':<10} {'variant':<22} {'p50 us':>9} {'p99 us':>9}")
+    for name, (p50, p99) in (('queue (audit.py)', queued), ('print, line-buffered', printed),
+                             ('INSERT + commit', synchronous)):
+        print(f"{'record':<10} {name:<22} {p50:>9.1f} {p99:>9.1f}")
+
+
+def bench_writer(db_path, rows, rng):
+    conn = sqlite3.connect(db_path)
+    conn.execute('DROP TRIGGER audit_log_no_delete')
+    conn.execute('DELETE FROM audit_log')  # Start the chain from the benchmark's own rows
+    conn.commit()
+    conn.close()
+
+    log = audit.AuditLog(db_path)
+    log.init_app(FakeApp(AUDIT_FLUSH_SECONDS=3600, AUDIT_QUEUE_SIZE=rows + 1))
+    written, seconds = 0, 0.0
+    chunk = 100000
+    while written < rows:
+        for _ in range(min(chunk, rows - written)):
+            log.record(*entry(rng))
+        started = time.perf_counter()
+        written += log.flush()
+        seconds += time.perf_counter() - started
+    print(f"\n{'writer':<10} {written} rows in {log.metrics['batches']} batches: "
+          f"{seconds:.2f} s, {written / seconds:,.0f} rows/s")
+
+
+def bench_search(db_path, rng):
+    conn = sqlite3.connect(db_path)
+    queries = (
+        ('latest 100', {}),
+        ('by action', {'action': 'incident.resolve'}),
+        ('by actor', {'actor': 'admin'}),
+        ('by target', {'target': f'incident:{rng.randint(1, 50000)}'}),
+        ('action, 2nd page', {'action': 'incident.dispatch', 'before_id': conn.execute(
+            'SELECT MAX(id) / 2 FROM audit_log').fetchone()[0]}),
+    )
+    print(f"\n{'search':<10} {'query':<18} {'rows':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, filters in queries:
+        samples = []
+        for _ in range(200):
+            started = time.perf_counter()
+            found = audit.search(conn, limit=100, **filters)
+            samples.append(time.perf_counter() - started)
+        p50, p99 = percentiles(samples)
+        print(f"{'search':<10} {name:<18} {len(found):>5} {p50 / 1000:>8.2f} {p99 / 1000:>8.2f}")
+
+    started = time.perf_counter()
+    result = audit.verify_chain(conn)
+    seconds = time.perf_counter() - started
+    print(f"\n{'verify':<10} {result['rows']} rows, ok={result['ok']}: {seconds:.2f} s, "
+          f"{result['rows'] / seconds:,.0f} rows/s")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20000, help='record() calls timed')
+    parser.add_argument('--rows', type=int, default=1000000, help='rows written, then searched and verified')
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'audit.db')
+        migrate(db_path, verbose=False)
+        conn = sqlite3.connect(db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.close()
+        bench_record(db_path, args.calls, rng)
+        bench_writer(db_path, args.rows, rng)
+        bench_search(db_path, rng)
+
+
+if __name__ == '__main__':
+    main()
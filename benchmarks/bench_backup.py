@@ -0,0 +1,124 @@
+"""Hot backup benchmark: backup throughput and writer stall under SOS-style inserts
+
+Seeds a throwaway database to --size-mb, then runs a writer thread that
+inserts and commits one SOS incident every --write-interval seconds (timing
+each insert+commit), and takes backups while it runs:
+
+    stepped     backup.create_backup() - page-limited steps with pauses
+    one-shot    a single backup step copying every page at once (for reference)
+
+Reports copy throughput, compressed size, steps/restarts and the writer's
+p50/p99/max insert latency during each backup versus an idle baseline, with
+the database in WAL mode (as the app runs it) and in rollback-journal mode.
+
+Usage:
+    python benchmarks/bench_backup.py --size-mb 200
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from common import percentile
+import backup
+from migrate import migrate
+
+
+def seed(path, size_mb):
+    migrate(path, verbose=False)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'b@x.in', 'x')")
+    description = 'Reported near the bus stop; caller stayed on the line. ' * 8
+    batch = [(description,)] * 10000
+    while os.path.getsize(path) < size_mb * 1024 * 1024:
+        conn.executemany('''
+            INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status)
+            VALUES (1, 'Harassment', ?, 19.07, 72.87, 'Resolved')
+        ''', batch)
+        conn.commit()
+    conn.close()
+
+
+class Writer(threading.Thread):
+    """Inserts SOS incidents at a fixed rate, recording each insert+commit latency"""
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path, self.interval = path, interval
+        self.latencies = []
+        self.stop = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            conn.execute('''
+                INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status, is_sos)
+                VALUES (1, 'SOS Emergency', 'bench', 19.07, 72.87, 'High Alert', 1)
+            ''')
+            conn.commit()
+            self.latencies.append(time.perf_counter() - started)
+            time.sleep(self.interval)
+        conn.close()
+
+
+def measure(path, interval, action):
+    writer = Writer(path, interval)
+    writer.start()
+    time.sleep(0.5)
+    writer.latencies.clear()
+    result = action()
+    writer.stop.set()
+    writer.join()
+    lat = [value * 1000 for value in writer.latencies]
+    return result, (percentile(lat, 50), percentile(lat, 99), max(lat) if lat else float('nan'), len(lat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--write-interval', type=float, default=0.01)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'surakshita.db')
+        seed(path, args.size_mb)
+        print(f"database: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        for journal in ('wal', 'delete'):
+            conn = sqlite3.connect(path)
+            conn.execute(f'PRAGMA journal_mode = {journal}')
+            conn.close()
+            print(f"\njournal_mode={journal}")
+            print(f"{'mode':<10} {'seconds':>8} {'MB/s':>7} {'gz MB':>7} {'steps':>6} {'restarts':>9} "
+                  f"{'max step ms':>12} {'writes':>7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>8}")
+
+            _, (p50, p99, worst, writes) = measure(path, args.write_interval, lambda: time.sleep(3))
+            print(f"{'idle':<10} {'':>8} {'':>7} {'':>7} {'':>6} {'':>9} {'':>12} "
+                  f"{writes:>7} {p50:>7.2f} {p99:>7.2f} {worst:>8.2f}")
+
+            backup_dir = os.path.join(workdir, f'backups-{journal}')
+            entry, (p50, p99, worst, writes) = measure(
+                path, args.write_interval, lambda: backup.create_backup(path, backup_dir)
+            )
+            stats = entry['stats']
+            print(f"{'stepped':<10} {stats['seconds']:>8.2f} {stats['bytes'] / 1e6 / stats['seconds']:>7.1f} "
+                  f"{entry['gz_bytes'] / 1e6:>7.1f} {stats['steps']:>6} {stats['restarts']:>9} "
+                  f"{stats['max_step_ms']:>12.1f} {writes:>7} {p50:>7.2f} {p99:>7.2f} {worst:>8.2f}")
+
+            ok, message = backup.verify_backup(os.path.join(backup_dir, entry['file']))
+            print(f"{'':<10} verify: {message}")
+
+            oneshot = os.path.join(workdir, f'oneshot-{journal}.db')
+            stats, (p50, p99, worst, writes) = measure(
+                path, args.write_interval, lambda: backup.copy_database(path, oneshot, pages=-1)
+            )
+            print(f"{'one-shot':<10} {stats['seconds']:>8.2f} {stats['bytes'] / 1e6 / stats['seconds']:>7.1f} "
+                  f"{'':>7} {stats['steps']:>6} {stats['restarts']:>9} {stats['max_step_ms']:>12.1f} "
+                  f"{writes:>7} {p50:>7.2f} {p99:>7.2f} {worst:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
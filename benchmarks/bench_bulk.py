@@ -0,0 +1,74 @@
+"""Bulk ingestion throughput: /api/incidents/bulk with JSON arrays and NDJSON
+
+Starts the threaded Flask server against a throwaway database and posts
+batches of synthetic incidents, each with an idempotency key. Every batch is
+then replayed to time the duplicate path. Reports rows/second per format and
+batch size.
+
+Usage:
+    python benchmarks/bench_bulk.py --batch-sizes 1000 10000 50000
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+
+from common import seed_database, session_cookie, csrf_header, start_server, http_request
+
+TYPES = ['Harassment', 'Stalking', 'Theft', 'Suspicious Activity', 'Unsafe Area']
+
+
+def make_batch(size, prefix):
+    return [{
+        'incident_type': random.choice(TYPES),
+        'description': 'Reported through a partner helpline',
+        'latitude': round(random.uniform(8.5, 37.5), 5),
+        'longitude': round(random.uniform(68.2, 97.3), 5),
+        'required_help': 'Immediate Police',
+        'idempotency_key': f'{prefix}-{i}',
+    } for i in range(size)]
+
+
+def encode(batch, fmt):
+    if fmt == 'ndjson':
+        return '\n'.join(json.dumps(row) for row in batch).encode(), 'application/x-ndjson'
+    return json.dumps(batch).encode(), 'application/json'
+
+
+def post(port, headers, body, content_type):
+    status, payload, elapsed = asyncio.run(http_request(
+        port, 'POST', '/api/incidents/bulk', dict(headers, **{'Content-Type': content_type}), body
+    ))
+    return status, json.loads(payload or b'{}'), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    headers = {'Cookie': session_cookie({'user_id': 1, 'csrf_token': 'bench-csrf'}),
+               'X-CSRFToken': csrf_header('bench-csrf')}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_database(workdir, 0)
+        proc = start_server('threaded', 5831, workdir, ADMISSION_ENABLED=False)
+        try:
+            print(f"{'format':<7} {'rows':>7} {'status':>7} {'created':>8} {'rows/s':>9} "
+                  f"{'replay dup':>11} {'replay rows/s':>14}")
+            for fmt in ('json', 'ndjson'):
+                for size in args.batch_sizes:
+                    body, content_type = encode(make_batch(size, f'{fmt}-{size}'), fmt)
+                    status, result, elapsed = post(5831, headers, body, content_type)
+                    _, replay, replay_elapsed = post(5831, headers, body, content_type)
+                    print(f"{fmt:<7} {size:>7} {status:>7} {result.get('created', 0):>8} "
+                          f"{size / elapsed:>9.0f} {replay.get('duplicate', 0):>11} "
+                          f"{size / replay_elapsed:>14.0f}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
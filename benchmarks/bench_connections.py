@@ -0,0 +1,96 @@
+"""Connections-per-process benchmark: threaded Flask server vs async serving mode
+
+Starts both servers against a throwaway seeded database, then:
+  1. fires N concurrent requests at /api/admin/poll/alerts on each server
+  2. holds N push-channel connections open on the async server
+
+and reports successes, latency percentiles, server threads and resident memory.
+
+Usage:
+    python benchmarks/bench_connections.py --connections 2000
+"""
+import argparse
+import asyncio
+import tempfile
+
+from common import (raise_fd_limit, process_stats, seed_database, session_cookie,
+                    start_server, http_request, percentile)
+
+
+async def burst(port, connections, cookie, pid):
+    peak = [0, 0.0]
+
+    async def sample():
+        while True:
+            threads, rss = process_stats(pid)
+            peak[0], peak[1] = max(peak[0], threads), max(peak[1], rss)
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.ensure_future(sample())
+    results = await asyncio.gather(*[
+        http_request(port, 'GET', '/api/admin/poll/alerts', {'Cookie': cookie}) for _ in range(connections)
+    ])
+    sampler.cancel()
+
+    latencies = [elapsed for status, _, elapsed in results if status == 200]
+    return (len(latencies), percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000,
+            peak[0], peak[1])
+
+
+async def hold_streams(port, connections, cookie, pid):
+    """Open push-channel streams and keep them open; return how many connected"""
+    writers = []
+    connected = 0
+    for _ in range(connections):
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"GET /api/admin/stream/alerts HTTP/1.1\r\nHost: localhost\r\n"
+                         f"Cookie: {cookie}\r\n\r\n".encode())
+            await writer.drain()
+            writers.append((reader, writer))
+        except OSError:
+            break
+    for reader, _ in writers:
+        try:
+            data = await asyncio.wait_for(reader.readuntil(b': connected\n\n'), 10)
+            connected += data.startswith(b'HTTP/1.1 200')
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError):
+            pass
+    threads, rss = process_stats(pid)
+    for _, writer in writers:
+        writer.close()
+    return connected, threads, rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=200, help='alert rows seeded into the database')
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    cookie = session_cookie({'is_admin_logged_in': True})
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_database(workdir, args.rows)
+        print(f"{'server':<10} {'ok':>6} {'p50 ms':>9} {'p99 ms':>9} {'threads':>8} {'rss MB':>8}")
+
+        for kind, port in (('threaded', 5811), ('async', 5812)):
+            proc = start_server(kind, port, workdir)
+            try:
+                ok, p50, p99, threads, rss = asyncio.run(burst(port, args.connections, cookie, proc.pid))
+                print(f"{kind:<10} {ok:>6} {p50:>9.1f} {p99:>9.1f} {threads:>8} {rss:>8.1f}")
+
+                if kind == 'async':
+                    connected, threads, rss = asyncio.run(
+                        hold_streams(port, args.connections, cookie, proc.pid)
+                    )
+                    print(f"\nasync push channel: {connected}/{args.connections} streams held open, "
+                          f"{threads} threads, {rss:.1f} MB RSS")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == '__main__':
+    main()
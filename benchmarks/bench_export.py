@@ -0,0 +1,187 @@
+"""Parquet export benchmark: export.py against a full CSV dump
+
+For each history size, seeds a throwaway database with incidents around major
+Indian cities over two years and measures, each step in its own process so
+peak memory is its own:
+
+    export      export.export_incidents(full=True) vs the same rows and
+                columns written with csv.writer (the baseline)
+    load        reading everything back: the Parquet dataset into Arrow vs
+                csv.DictReader into a list of dicts (what row-by-row loading costs)
+    scan        count by month and type: two Parquet columns vs the whole CSV
+    incr        an incremental run after 1% of incidents change and 0.1% are
+                new, vs dumping the CSV again
+
+Usage:
+    python benchmarks/bench_export.py --sizes 100000 1000000
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from migrate import migrate
+import export
+
+CITIES = [
+    (19.076, 72.877), (28.614, 77.209), (12.972, 77.595), (13.083, 80.271), (22.573, 88.364),
+    (17.385, 78.487), (18.520, 73.857), (23.023, 72.571), (26.912, 75.787), (26.847, 80.947),
+    (21.146, 79.088), (22.720, 75.858), (30.733, 76.779), (9.931, 76.267), (25.594, 85.138),
+]
+TYPES = ('Harassment', 'Stalking', 'Assault', 'SOS Emergency', 'Other')
+PLACES = ('the bus stop', 'the metro station', 'the market', 'college', 'the office', 'the park')
+CSV_SQL = '''
+    SELECT id, user_id, incident_type, description, latitude, longitude, status, priority, is_sos,
+           required_help, dispatched_unit, created_at, updated_at
+    FROM incidents_all
+'''
+
+
+def seed(path, count, rng):
+    migrate(path, verbose=False)
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                     [(f'user{i}', f'user{i}@example.in', 'x') for i in range(1, 1001)])
+    rows = []
+    for _ in range(count):
+        lat, lon = rng.choice(CITIES)
+        days = rng.randint(0, 730)
+        rows.append((rng.randint(1, 1000), rng.choice(TYPES),
+                     f'Followed from {rng.choice(PLACES)} to {rng.choice(PLACES)} around {rng.randint(5, 23)}:00',
+                     lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2), rng.choice(('Reported', 'Resolved')),
+                     f'-{days} days', f'-{max(days - 2, 0)} days'))
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, datetime('now', ?), datetime('now', ?))
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def change(path, count, rng):
+    """Resolve 1% of incidents now and add 0.1% new ones"""
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE incidents SET status = 'Resolved', updated_at = CURRENT_TIMESTAMP WHERE id % 100 = 7")
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude)
+        VALUES (1, 'SOS Emergency', 'Emergency SOS alert triggered', ?, ?)
+    ''', [(lat + rng.gauss(0, 0.2), lon + rng.gauss(0, 0.2)) for lat, lon in rng.choices(CITIES, k=count // 1000)])
+    conn.commit()
+    conn.close()
+
+
+def run_parquet(db_path, export_dir, full):
+    export.CUTOFF_LAG_SECONDS = 0  # The benchmark's changes are seconds old
+    return export.export_incidents(db_path, export_dir, full=full)['rows']
+
+
+def run_csv(db_path, csv_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.execute(CSV_SQL)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([column[0] for column in cursor.description])
+        count = 0
+        while True:
+            rows = cursor.fetchmany(export.EXPORT_BATCH_ROWS)
+            if not rows:
+                break
+            writer.writerows(rows)
+            count += len(rows)
+    conn.close()
+    return count
+
+
+def load_parquet(export_dir):
+    import pyarrow.dataset as ds
+    return ds.dataset(os.path.join(export_dir, 'incidents'), partitioning='hive').to_table().num_rows
+
+
+def load_csv(csv_path):
+    with open(csv_path, newline='') as f:
+        return len(list(csv.DictReader(f)))
+
+
+def scan_parquet(export_dir):
+    import pyarrow.dataset as ds
+    table = ds.dataset(os.path.join(export_dir, 'incidents'), partitioning='hive').to_table(
+        columns=['month', 'incident_type'])
+    return table.group_by(['month', 'incident_type']).aggregate([([], 'count_all')]).num_rows
+
+
+def scan_csv(csv_path):
+    with open(csv_path, newline='') as f:
+        return len(Counter((row['created_at'][:7], row['incident_type']) for row in csv.DictReader(f)))
+
+
+def _child(conn, fn, args):
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    # VmHWM, not ru_maxrss: the latter carries over the parent's peak across exec
+    with open('/proc/self/status') as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+    conn.send((result, elapsed, peak_kb / 1024))
+
+
+def measured(fn, *args):
+    """(result, seconds, peak RSS MB) of fn(*args) run in a fresh process"""
+    ctx = multiprocessing.get_context('spawn')
+    parent, child = ctx.Pipe()
+    process = ctx.Process(target=_child, args=(child, fn, args))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    print(f"{'incidents':>10} {'step':<8} {'format':<8} {'rows':>9} {'seconds':>8} {'MB out':>7} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            db_path = os.path.join(workdir, f'export_{size}.db')
+            export_dir = os.path.join(workdir, f'parquet_{size}')
+            csv_path = os.path.join(workdir, f'incidents_{size}.csv')
+            seed(db_path, size, rng)
+
+            steps = [
+                ('export', 'parquet', run_parquet, (db_path, export_dir, True), export_dir),
+                ('export', 'csv', run_csv, (db_path, csv_path), csv_path),
+                ('load', 'parquet', load_parquet, (export_dir,), None),
+                ('load', 'csv', load_csv, (csv_path,), None),
+                ('scan', 'parquet', scan_parquet, (export_dir,), None),
+                ('scan', 'csv', scan_csv, (csv_path,), None),
+            ]
+            for step, fmt, fn, fn_args, output in steps:
+                rows, seconds, peak = measured(fn, *fn_args)
+                out = f'{size_mb(output):>7.1f}' if output else f"{'':>7}"
+                print(f"{size:>10} {step:<8} {fmt:<8} {rows:>9} {seconds:>8.2f} {out} {peak:>12.0f}")
+
+            time.sleep(1)  # Changes must land in a later second than the full export's cutoff
+            change(db_path, size, rng)
+            time.sleep(1)
+            rows, seconds, peak = measured(run_parquet, db_path, export_dir, False)
+            print(f"{size:>10} {'incr':<8} {'parquet':<8} {rows:>9} {seconds:>8.2f} {'':>7} {peak:>12.0f}")
+            rows, seconds, peak = measured(run_csv, db_path, csv_path)
+            print(f"{size:>10} {'incr':<8} {'csv':<8} {rows:>9} {seconds:>8.2f} {'':>7} {peak:>12.0f}  (full re-dump)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Forecast benchmark: training speed and accuracy of forecast.py's seasonal models
+
+    fit         fitting --series hourly series over --years of history with
+                forecast.fit() (hour-major counts, in-place updates) vs the
+                same model over series-major arrays, stepped by hour or
+                solved a week at a time in closed form, and vs a plain
+                Python loop per series (timed on a sample, scaled up)
+    accuracy    error of next-24-hour forecasts over the final
+                --holdout-days (hourly RMSE and the error of each series'
+                daily total), for the model vs an all-history hour-of-week
+                average and vs the same hours a week earlier
+    end to end  Forecaster.train() on a throwaway database with --incidents
+                incidents spread over the same years: full fit, then an
+                incremental run after one more hour of reports, then
+                building the /api/admin/forecast payload
+
+Usage:
+    python benchmarks/bench_forecast.py --series 5000 --years 3 --incidents 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from migrate import migrate
+import forecast
+
+CITIES = [
+    (19.076, 72.877), (28.614, 77.209), (12.972, 77.595), (13.083, 80.271), (22.573, 88.364),
+    (17.385, 78.487), (18.520, 73.857), (23.023, 72.571), (26.912, 75.787), (26.847, 80.947),
+]
+TYPES = ('Harassment', 'Stalking', 'Assault', 'SOS Emergency', 'Theft', 'Other')
+
+
+def hourly_rates(series, rng):
+    """(series, 168) expected counts per hour of the week: a base rate shaped by time of day and weekday"""
+    hours = np.arange(forecast.SEASON_HOURS)
+    hour_of_day = hours % 24
+    evening = 1.0 + 1.5 * np.exp(-(hour_of_day - 20) ** 2 / 8.0)
+    weekend = np.where(hours // 24 >= 5, 1.3, 1.0)
+    base = rng.lognormal(mean=-3.5, sigma=1.0, size=(series, 1))
+    return base * evening * weekend
+
+
+def generate(rates, first_hour, hours, rng):
+    """(hours, series) Poisson counts for consecutive hours with a slow upward trend, a week at a time"""
+    counts = np.empty((hours, rates.shape[0]))
+    for start in range(0, hours, forecast.SEASON_HOURS):
+        width = min(forecast.SEASON_HOURS, hours - start)
+        slots = (first_hour + start + np.arange(width)) % forecast.SEASON_HOURS
+        trend = 1.0 + 0.3 * (start + np.arange(width)) / hours
+        counts[start:start + width] = rng.poisson(rates[:, slots].T * trend[:, None])
+    return counts
+
+
+def fit_by_series(level, season, counts, first_hour, alpha=forecast.ALPHA, gamma=forecast.GAMMA):
+    """The same model over (series, hours) counts and (series, 168) slots, stepping hour by hour"""
+    for j in range(counts.shape[1]):
+        slot = (first_hour + j) % forecast.SEASON_HOURS
+        previous = season[:, slot].copy()
+        level[:] = alpha * (counts[:, j] - previous) + (1 - alpha) * level
+        season[:, slot] = gamma * (counts[:, j] - level) + (1 - gamma) * previous
+
+
+def fit_week_blocks(level, season, counts, first_hour, alpha=forecast.ALPHA, gamma=forecast.GAMMA):
+    """The same model a week at a time: within 168 hours each slot is read once, so the
+    level recursion has known inputs and is a cumulative sum"""
+    beta = 1.0 - alpha
+    for start in range(0, counts.shape[1], forecast.SEASON_HOURS):
+        block = counts[:, start:start + forecast.SEASON_HOURS]
+        slots = (first_hour + start + np.arange(block.shape[1])) % forecast.SEASON_HOURS
+        previous = season[:, slots]
+        decay = beta ** np.arange(block.shape[1])
+        levels = (np.cumsum((block - previous) / decay, axis=1) * alpha + level[:, None] * beta) * decay
+        season[:, slots] = gamma * (block - levels) + (1.0 - gamma) * previous
+        level[:] = levels[:, -1]
+
+
+def fit_python(level, season, counts, first_hour, alpha=forecast.ALPHA, gamma=forecast.GAMMA):
+    """The same model as a plain loop per series and hour"""
+    for s in range(counts.shape[0]):
+        lvl, row, seas = level[s], counts[s].tolist(), season[s].tolist()
+        for j, y in enumerate(row):
+            slot = (first_hour + j) % forecast.SEASON_HOURS
+            lvl = alpha * (y - seas[slot]) + (1 - alpha) * lvl
+            seas[slot] = gamma * (y - lvl) + (1 - gamma) * seas[slot]
+        level[s] = lvl
+        season[s] = seas
+
+
+def bench_fit(series, years, holdout_days, rng):
+    hours = int(years * 365 * 24)
+    first_hour = 480000  # Any hour works; this one is in 2024
+    rates = hourly_rates(series, rng)
+    counts = generate(rates, first_hour, hours, rng)  # (hours, series), as Forecaster lays them out
+
+    level, season = np.zeros(series), np.zeros((forecast.SEASON_HOURS, series))
+    started = time.perf_counter()
+    forecast.fit(level, season, counts, first_hour)
+    timings = [('forecast.fit (hour-major)', time.perf_counter() - started)]
+
+    by_series = np.ascontiguousarray(counts.T)
+    same = True
+    for name, variant in (('by series, hour by hour', fit_by_series), ('by series, week blocks', fit_week_blocks)):
+        other_level, other_season = np.zeros(series), np.zeros((series, forecast.SEASON_HOURS))
+        started = time.perf_counter()
+        variant(other_level, other_season, by_series, first_hour)
+        timings.append((name, time.perf_counter() - started))
+        same = same and np.allclose(other_level, level) and np.allclose(other_season, season.T)
+
+    sample = min(series, 20)
+    python_level, python_season = np.zeros(sample), np.zeros((sample, forecast.SEASON_HOURS))
+    started = time.perf_counter()
+    fit_python(python_level, python_season, by_series[:sample], first_hour)
+    timings.append(('Python loop (scaled)', (time.perf_counter() - started) * series / sample))
+    del by_series
+
+    print(f"{series} series x {hours} hours ({series * hours / 1e6:.0f}M series-hours), "
+          f"same results: {same}\n")
+    print(f"{'fit':<12} {'variant':<30} {'seconds':>9} {'slower':>8}")
+    for name, seconds in timings:
+        print(f"{'fit':<12} {name:<30} {seconds:>9.2f} {seconds / timings[0][1]:>7.1f}x")
+
+    # Walk forward over the holdout: forecast each next day, then fit it
+    train_hours = hours - holdout_days * 24
+    level, season = np.zeros(series), np.zeros((forecast.SEASON_HOURS, series))
+    forecast.fit(level, season, counts[:train_hours], first_hour)
+    # Hourly error (RMSE) and error of the 24-hour total per series (MAE), as the endpoint reports both
+    errors = {name: [0.0, 0.0] for name in ('model', 'hour-of-week mean', 'same hours last week')}
+    for day in range(holdout_days):
+        start = train_hours + day * 24
+        hour = first_hour + start
+        actual = counts[start:start + 24]
+        whole_weeks = start // forecast.SEASON_HOURS * forecast.SEASON_HOURS
+        weekly_mean = counts[start - whole_weeks:start].reshape(-1, forecast.SEASON_HOURS, series).mean(axis=0)
+        predictions = {
+            'model': forecast.predict(level, season, hour),
+            'hour-of-week mean': weekly_mean[:24],  # Its weeks start at this hour of the week
+            'same hours last week': counts[start - forecast.SEASON_HOURS:start - forecast.SEASON_HOURS + 24],
+        }
+        for name, predicted in predictions.items():
+            errors[name][0] += ((predicted - actual) ** 2).sum()
+            errors[name][1] += np.abs(predicted.sum(axis=0) - actual.sum(axis=0)).sum()
+        forecast.fit(level, season, actual, hour)
+    mean_day = counts[train_hours:].sum() / (series * holdout_days)
+    print(f"\n{'accuracy':<12} {'next-24h forecast':<30} {'RMSE/h':>9} {'MAE/day':>8}  ({holdout_days} days, "
+          f"{mean_day:.2f} incidents per series-day)")
+    for name, (squared, daily) in errors.items():
+        print(f"{'accuracy':<12} {name:<30} {np.sqrt(squared / (series * holdout_days * 24)):>9.4f} "
+              f"{daily / (series * holdout_days):>8.3f}")
+
+
+def seed(path, count, years, rng):
+    migrate(path, verbose=False)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@x.in', 'x')")
+    rows = []
+    span = int(years * 365 * 86400)
+    for _ in range(count):
+        lat, lon = rng.choice(CITIES)
+        rows.append((rng.choice(TYPES), lat + rng.gauss(0, 2), lon + rng.gauss(0, 2), f'-{rng.randint(3600, span)} seconds'))
+    rows.sort(key=lambda row: -int(row[3][1:].split()[0]))  # Oldest first, as ids grow with time
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, created_at)
+        VALUES (1, ?, 'x', ?, ?, datetime('now', ?))
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def bench_end_to_end(incidents, years, rng):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'forecast.db')
+        seed(db_path, incidents, years, rng)
+        forecaster = forecast.Forecaster(db_path)
+        now = time.time()
+
+        started = time.perf_counter()
+        hours = forecaster.train(now=now)
+        full = time.perf_counter() - started
+        series = forecaster.snapshot_metrics()['series']
+
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT INTO incidents (user_id, incident_type, description, latitude, longitude) "
+                         "VALUES (1, 'Harassment', 'x', ?, ?)", [rng.choice(CITIES) for _ in range(50)])
+        conn.commit()
+        conn.close()
+        started = time.perf_counter()
+        forecaster.train(now=now + 3600)
+        incremental = time.perf_counter() - started
+
+        started = time.perf_counter()
+        payload = forecaster.forecast()
+        build = time.perf_counter() - started
+
+        print(f"\n{'end to end':<12} {incidents} incidents, {series} series, {hours} hours, "
+              f"state file {os.path.getsize(forecaster.path) / 1e6:.1f} MB")
+        print(f"{'end to end':<12} {'full training':<30} {full:>9.2f} s")
+        print(f"{'end to end':<12} {'incremental (one more hour)':<30} {incremental * 1000:>9.1f} ms")
+        print(f"{'end to end':<12} {'forecast payload':<30} {build * 1000:>9.1f} ms "
+              f"({len(payload['regions'])} regions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--series', type=int, default=5000, help='(region, type) series for the fit benchmark')
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--holdout-days', type=int, default=28)
+    parser.add_argument('--incidents', type=int, default=1000000)
+    args = parser.parse_args()
+    bench_fit(args.series, args.years, args.holdout_days, np.random.default_rng(5))
+    bench_end_to_end(args.incidents, args.years, random.Random(5))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Geofence throughput: grid-accelerated polygon test vs brute-force point-in-polygon
+
+Generates random points over India's bounding box (where the old validator's
+answers diverge from the polygon the most) and clustered points around cities
+and the coastline (realistic traffic). For each set, reports points/second for:
+
+    bbox       the previous rectangle-only check (for reference)
+    brute      even-odd test against every boundary edge + tolerance band
+    grid       Geofence.contains(), one point at a time
+    batch      Geofence.contains_many()
+
+plus the share of points that fall in boundary cells. It also checks that
+grid and brute agree on every point.
+
+Usage:
+    python benchmarks/bench_geofence.py --points 200000
+"""
+import argparse
+import random
+import time
+
+import common  # noqa: F401  (puts the repo on sys.path)
+import geofence
+
+CITIES = [(28.61, 77.21), (19.07, 72.87), (13.08, 80.27), (22.57, 88.36), (12.97, 77.59),
+          (17.38, 78.48), (23.02, 72.57), (26.91, 75.79), (31.63, 74.87), (9.93, 76.26),
+          (8.08, 77.55), (34.08, 74.80), (26.14, 91.74), (11.62, 92.73), (15.49, 73.82)]
+
+
+def bbox_check(lat, lon):
+    return 8.4 <= lat <= 37.6 and 68.1 <= lon <= 97.4
+
+
+def brute_check(fence, lat, lon):
+    inside = False
+    for (x1, y1), (x2, y2) in fence.edges:
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside or any(geofence._distance_km(lat, lon, edge) <= fence.tolerance_km for edge in fence.edges)
+
+
+def rate(count, fn):
+    started = time.perf_counter()
+    result = fn()
+    return count / (time.perf_counter() - started), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=200000)
+    parser.add_argument('--brute-points', type=int, default=5000, help='brute force is slow; sample fewer')
+    args = parser.parse_args()
+
+    random.seed(7)
+    started = time.perf_counter()
+    fence = geofence.india()
+    stats = fence.stats()
+    print(f"grid built in {(time.perf_counter() - started) * 1000:.0f} ms: {stats['rows']}x{stats['cols']} cells, "
+          f"{stats['boundary']} boundary, {stats['edges']} edges\n")
+
+    point_sets = {
+        'bbox-uniform': [(random.uniform(8.4, 37.6), random.uniform(68.1, 97.4)) for _ in range(args.points)],
+        'clustered': [(lat + random.gauss(0, 0.3), lon + random.gauss(0, 0.3))
+                      for lat, lon in random.choices(CITIES, k=args.points)],
+    }
+
+    print(f"{'points':<13} {'bbox/s':>11} {'brute/s':>9} {'grid/s':>11} {'batch/s':>11} {'boundary':>9} {'agree':>6}")
+    for name, points in point_sets.items():
+        lats, lons = [p[0] for p in points], [p[1] for p in points]
+        bbox_rate, _ = rate(len(points), lambda: [bbox_check(lat, lon) for lat, lon in points])
+        sample = points[:args.brute_points]
+        brute_rate, brute = rate(len(sample), lambda: [brute_check(fence, lat, lon) for lat, lon in sample])
+        grid_rate, grid = rate(len(points), lambda: [fence.contains(lat, lon) for lat, lon in points])
+        batch_rate, batch = rate(len(points), lambda: fence.contains_many(lats, lons))
+
+        in_boundary = sum(
+            fence.lat0 <= lat < fence.lat1 and fence.lon0 <= lon < fence.lon1 and
+            fence.grid[int((lat - fence.lat0) / fence.cell) * fence.cols + int((lon - fence.lon0) / fence.cell)]
+            >= geofence.BOUNDARY_OUTSIDE
+            for lat, lon in points
+        )
+        agree = grid[:len(sample)] == brute and grid == batch
+        print(f"{name:<13} {bbox_rate:>11,.0f} {brute_rate:>9,.0f} {grid_rate:>11,.0f} {batch_rate:>11,.0f} "
+              f"{in_boundary / len(points):>8.1%} {'yes' if agree else 'NO':>6}")
+
+
+if __name__ == '__main__':
+    main()
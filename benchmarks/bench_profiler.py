@@ -0,0 +1,129 @@
+"""Profiler benchmark: what profiler.py costs, checked against an overhead budget
+
+    idle        the before/teardown hooks of every request while no session
+                runs, per request, next to a minimal Flask request
+    sampling    latency of a CPU-bound request (rows turned into dicts and
+                JSON, like the admin alert feed) with no session and with
+                every request profiled at --interval-ms
+
+Exits with status 1 when the idle hooks cost more than --idle-budget-us per
+request or sampling slows profiled requests by more than
+--sampling-budget-pct, so it can gate a change to the profiler.
+
+Usage:
+    python benchmarks/bench_profiler.py --requests 300 --interval-ms 5
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from profiler import Profiler
+
+ROWS = [(n, 'SOS Emergency', 'Emergency SOS alert triggered', 19.07 + n * 1e-4, 72.87, 'High Alert', 'Critical', 1)
+        for n in range(3000)]
+COLUMNS = ('id', 'incident_type', 'description', 'latitude', 'longitude', 'status', 'priority', 'is_sos')
+
+
+def build_app(profiles_dir):
+    app = Flask(__name__)
+    app.config['PROFILER_DIR'] = profiles_dir
+    profiler = Profiler()
+    profiler.init_app(app)
+
+    @app.route('/ping')
+    def ping():
+        return 'ok'
+
+    @app.route('/alerts')
+    def alerts():
+        return json.dumps({'alerts': [dict(zip(COLUMNS, row)) for row in ROWS]})
+
+    return app, profiler
+
+
+def bench_idle(app, profiler, calls):
+    """Seconds per request spent in the profiler hooks without a session"""
+    with app.test_request_context('/ping'):
+        started = time.perf_counter()
+        for _ in range(calls):
+            profiler._start()
+            profiler._stop()
+        hooks = (time.perf_counter() - started) / calls
+    client = app.test_client()
+    started = time.perf_counter()
+    for _ in range(calls // 20):
+        client.get('/ping')
+    request = (time.perf_counter() - started) / (calls // 20)
+    return hooks, request
+
+
+def timed_requests(client, count):
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        client.get('/alerts')
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def bench_sampling(app, profiler, requests, interval_ms, rounds=5):
+    """Median latency without and with profiling, alternating so both see the same machine"""
+    client = app.test_client()
+    timed_requests(client, 20)  # Warm up
+    plain, profiled = [], []
+    for _ in range(rounds):
+        profiler.stop_session()
+        plain += timed_requests(client, requests // rounds)
+        profiler.start_session({'endpoint': 'alerts', 'percent': 100, 'seconds': 600,
+                                'interval_ms': interval_ms, 'max_requests': 1000})
+        profiled += timed_requests(client, requests // rounds)
+    profiler.stop_session()
+    client.get('/ping')  # Let the worker see the session end
+    time.sleep(0.2)      # and the sampler write the last profiles
+    return statistics.median(plain), statistics.median(profiled)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300, help='requests per variant in the sampling test')
+    parser.add_argument('--interval-ms', type=float, default=5)
+    parser.add_argument('--idle-budget-us', type=float, default=2.0)
+    parser.add_argument('--sampling-budget-pct', type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as profiles_dir:
+        app, profiler = build_app(profiles_dir)
+        hooks, request = bench_idle(app, profiler, 200000)
+        print(f"{'idle':<10} hooks {hooks * 1e6:.2f} us per request "
+              f"({hooks / request * 100:.2f}% of a minimal request, {request * 1e6:.0f} us)")
+
+        plain, profiled = bench_sampling(app, profiler, args.requests, args.interval_ms)
+        overhead = (profiled / plain - 1) * 100
+        metrics = profiler.snapshot_metrics()
+        print(f"{'sampling':<10} median {plain * 1000:.2f} ms unprofiled, {profiled * 1000:.2f} ms profiled "
+              f"every {args.interval_ms:g} ms ({overhead:+.1f}%)")
+        print(f"{'sampling':<10} {metrics['samples']} samples in {metrics['requests_profiled']} requests, "
+              f"{metrics['sampling_seconds'] / max(metrics['requests_profiled'], 1) * 1e6:.0f} us of sampler CPU "
+              f"per request (sampling and writing its profile), "
+              f"{sum(session['profiles'] for session in profiler.sessions())} profiles written")
+
+    failures = []
+    if hooks * 1e6 > args.idle_budget_us:
+        failures.append(f"idle hooks cost {hooks * 1e6:.2f} us, budget {args.idle_budget_us} us")
+    if overhead > args.sampling_budget_pct:
+        failures.append(f"sampling slowed requests by {overhead:.1f}%, budget {args.sampling_budget_pct}%")
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    if failures:
+        sys.exit(1)
+    print("Within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Replica benchmark: SOS insert latency while admin aggregates run on the primary vs the replica
+
+Seeds a throwaway database with --rows incidents (WAL mode, as the app runs
+it), then runs a writer that inserts and commits one SOS incident every
+--write-interval seconds while --readers processes loop over the admin
+dashboard's history and totals queries:
+
+    idle        no readers
+    primary     readers query surakshita.db
+    replica     readers query a replica.Replica copy, refreshed every --refresh seconds
+
+Reports the writer's p50/p99/max insert latency, reader queries completed,
+WAL file growth (long readers hold back checkpoints) and the replica's
+refresh cost and lag.
+
+Usage:
+    python benchmarks/bench_replica.py --rows 500000 --readers 2
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from common import percentile
+from database import enable_wal
+from migrate import migrate
+from replica import Replica
+from versions import VersionStamps
+
+AGGREGATE_QUERIES = (
+    '''SELECT i.*, u.username, u.email FROM incidents_all i JOIN users u ON i.user_id = u.id
+       WHERE i.status = 'Resolved' ORDER BY i.created_at DESC''',
+    '''SELECT COUNT(*), SUM(CASE WHEN status != 'Resolved' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status = 'Resolved' THEN 1 ELSE 0 END) FROM incidents_all''',
+)
+
+
+def seed(path, rows):
+    migrate(path, verbose=False)
+    enable_wal(path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'b@x.in', 'x')")
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status)
+        VALUES (1, 'Harassment', 'Reported near the bus stop', 19.07, 72.87, ?)
+    ''', [('Resolved' if i % 4 else 'Pending',) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def reader(path, stop, done):
+    uri = f'file:{path}?mode=ro&immutable=1' if path.endswith('-replica') else f'file:{path}?mode=ro'
+    while not stop.is_set():
+        # Reconnect per round, like a request; the replica file may have been replaced
+        conn = sqlite3.connect(uri, uri=True)
+        for sql in AGGREGATE_QUERIES:
+            conn.execute(sql).fetchall()
+        conn.close()
+        with done.get_lock():
+            done.value += 1
+
+
+def run(path, stamps, mode, args, replica=None):
+    if mode == 'replica':
+        replica.refresh()
+    stop = multiprocessing.Event()
+    done = multiprocessing.Value('i', 0)
+    target = replica.path if mode == 'replica' else path
+    readers = [multiprocessing.Process(target=reader, args=(target, stop, done))
+               for _ in range(args.readers if mode != 'idle' else 0)]
+    for process in readers:
+        process.start()
+
+    refresher_stop = threading.Event()
+    refreshes = []
+    max_lag = 0.0
+
+    def refresher():
+        nonlocal max_lag
+        while not refresher_stop.wait(args.refresh):
+            max_lag = max(max_lag, replica.lag() or 0.0)
+            refreshes.append(replica.refresh()['seconds'])
+
+    if mode == 'replica':
+        threading.Thread(target=refresher, daemon=True).start()
+
+    conn = sqlite3.connect(path, timeout=30)
+    wal_start = os.path.getsize(f'{path}-wal') if os.path.exists(f'{path}-wal') else 0
+    latencies = []
+    deadline = time.perf_counter() + args.seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        conn.execute('''
+            INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status, is_sos)
+            VALUES (1, 'SOS Emergency', 'bench', 19.07, 72.87, 'High Alert', 1)
+        ''')
+        conn.commit()
+        stamps.bump(1)
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(args.write_interval)
+    wal_growth = (os.path.getsize(f'{path}-wal') - wal_start) / 1e6
+    conn.close()
+
+    refresher_stop.set()
+    stop.set()
+    for process in readers:
+        process.join()
+    return {
+        'p50': percentile(latencies, 50), 'p99': percentile(latencies, 99), 'max': max(latencies),
+        'writes': len(latencies), 'reads': done.value, 'wal_mb': wal_growth,
+        'refresh_s': sum(refreshes) / len(refreshes) if refreshes else None, 'max_lag': max_lag,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-interval', type=float, default=0.01)
+    parser.add_argument('--refresh', type=float, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'surakshita.db')
+        seed(path, args.rows)
+        stamps = VersionStamps(f'{path}-version')
+        replica = Replica(path, stamps)
+        print(f"database: {os.path.getsize(path) / 1e6:.1f} MB, {args.rows} incidents, {args.readers} readers")
+
+        print(f"{'mode':<8} {'writes':>7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>8} {'reads':>6} "
+              f"{'WAL MB':>7} {'refresh s':>10} {'max lag s':>10}")
+        for mode in ('idle', 'primary', 'replica'):
+            r = run(path, stamps, mode, args, replica)
+            refresh = f"{r['refresh_s']:>10.2f} {r['max_lag']:>10.2f}" if r['refresh_s'] is not None else ''
+            print(f"{mode:<8} {r['writes']:>7} {r['p50']:>7.2f} {r['p99']:>7.2f} {r['max']:>8.2f} {r['reads']:>6} "
+                  f"{r['wal_mb']:>7.1f} {refresh}")
+
+
+if __name__ == '__main__':
+    main()
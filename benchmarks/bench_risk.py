@@ -0,0 +1,142 @@
+"""Route risk benchmark: risk.py's grid against querying incidents per route
+
+Seeds a throwaway database with incidents around major Indian cities over
+two years and measures:
+
+    startup     opening the grid on restart (mapping the file) vs folding the
+                whole history in again (what a restart would cost without it)
+    catch-up    folding in one new incident after a write (the per-insert cost)
+    score       route scoring for a commute, a route across a city and an
+                intercity route: RiskGrid.score_route() vs a baseline
+                that queries incidents in each segment's bounding box and
+                decays them in Python
+
+Usage:
+    python benchmarks/bench_risk.py --incidents 1000000
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from migrate import migrate
+import risk
+
+CITIES = [
+    (19.076, 72.877), (28.614, 77.209), (12.972, 77.595), (13.083, 80.271), (22.573, 88.364),
+    (17.385, 78.487), (18.520, 73.857), (23.023, 72.571), (26.912, 75.787), (26.847, 80.947),
+]
+TYPES = ('Harassment', 'Stalking', 'Assault', 'SOS Emergency', 'Theft', 'Other')
+
+
+class FixedStamp:
+    def current(self, user_id=None):
+        return 0
+
+
+def seed(path, count, rng):
+    migrate(path, verbose=False)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@x.in', 'x')")
+    rows = []
+    for _ in range(count):
+        lat, lon = rng.choice(CITIES)
+        rows.append((rng.choice(TYPES), lat + rng.gauss(0, 0.1), lon + rng.gauss(0, 0.1),
+                     f'-{rng.randint(0, 730)} days'))
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, created_at)
+        VALUES (1, ?, 'x', ?, ?, datetime('now', ?))
+    ''', rows)
+    conn.execute('CREATE INDEX bench_incidents_location ON incidents (latitude, longitude)')
+    conn.commit()
+    conn.close()
+
+
+def polyline(start, end, points, rng):
+    """A wiggly route of points vertices from start to end"""
+    route = []
+    for i in range(points):
+        t = i / (points - 1)
+        route.append((start[0] + t * (end[0] - start[0]) + rng.gauss(0, 0.00003),
+                      start[1] + t * (end[1] - start[1]) + rng.gauss(0, 0.00003)))
+    return route
+
+
+def baseline_score(conn, route, cell, half_life):
+    """Sum of decayed incident weights within half a cell of each segment's bounding box"""
+    now = time.time()
+    total = 0.0
+    for (lat1, lon1), (lat2, lon2) in zip(route, route[1:]):
+        pad = cell / 2
+        for incident_type, created in conn.execute('''
+            SELECT incident_type, CAST(strftime('%s', created_at) AS REAL) FROM incidents
+            WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+        ''', (min(lat1, lat2) - pad, max(lat1, lat2) + pad, min(lon1, lon2) - pad, max(lon1, lon2) + pad)):
+            total += risk.TYPE_WEIGHTS.get(incident_type, risk.DEFAULT_WEIGHT) * math.exp2((created - now) / half_life)
+    return total
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=1000000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'risk.db')
+        seed(db_path, args.incidents, rng)
+        conn = sqlite3.connect(db_path, isolation_level=None)
+
+        grid = risk.RiskGrid(db_path, FixedStamp())
+        started = time.perf_counter()
+        folded = grid.catch_up([conn])
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        reopened = risk.RiskGrid(db_path, FixedStamp())
+        reopened.score_route([(19.0, 72.8), (19.1, 72.9)])  # Maps the file and reads the header
+        restart = time.perf_counter() - started
+        print(f"{'startup':<10} replay {folded} incidents {build:.2f} s, map snapshot {restart * 1000:.1f} ms "
+              f"({os.path.getsize(grid.path) / 1e6:.0f} MB file)")
+
+        samples = []
+        for _ in range(200):
+            lat, lon = rng.choice(CITIES)
+            conn.execute("INSERT INTO incidents (user_id, incident_type, description, latitude, longitude) "
+                         "VALUES (1, 'Assault', 'x', ?, ?)", (lat, lon))
+            started = time.perf_counter()
+            grid.catch_up([conn])
+            samples.append(time.perf_counter() - started)
+        print(f"{'catch-up':<10} one new incident: p50 {statistics.median(samples) * 1000:.2f} ms, "
+              f"max {max(samples) * 1000:.2f} ms (grid lock held)\n")
+
+        routes = (
+            ('commute', polyline((19.076, 72.877), (19.12, 72.84), 150, rng)),
+            ('across city', polyline((28.50, 77.05), (28.75, 77.30), 1500, rng)),
+            ('intercity', polyline((19.076, 72.877), (18.52, 73.857), 5000, rng)),
+        )
+        print(f"{'route':<18} {'points':>6} {'km':>6} {'grid ms':>8} {'query ms':>9} {'speedup':>8}")
+        for name, route in routes:
+            scored = grid.score_route(route)
+            grid_ms = timed(lambda: grid.score_route(route), 50)
+            query_ms = timed(lambda: baseline_score(conn, route, grid.cell, grid.half_life), 3)
+            print(f"{name:<18} {len(route):>6} {scored['length_km']:>6.0f} {grid_ms:>8.2f} {query_ms:>9.1f} "
+                  f"{query_ms / grid_ms:>7.0f}x")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
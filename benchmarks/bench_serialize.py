@@ -0,0 +1,136 @@
+"""JSON serialization microbenchmark: per-row dict building + jsonify vs serialize.py
+
+For 1k/10k/100k rows of the admin alert feed (the widest response), times:
+
+    current     sqlite3.Row rows, dict(row) plus per-field fix-ups, jsonify()
+    tuples      plain tuples through RowSerializer, stdlib encoder
+    orjson      same, with orjson (skipped when not installed)
+    streamed    rows_response() body consumed chunk by chunk (orjson if available)
+
+Query time is included in every column so the numbers are end to end; the
+'query' column is the bare fetch of tuples, for reference.
+
+Usage:
+    python benchmarks/bench_serialize.py --rows 1000 10000 100000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from common import SECRET_KEY
+
+OLD_ALERTS_SQL = '''
+    SELECT i.*, u.username, u.email
+    FROM incidents i
+    JOIN users u ON i.user_id = u.id
+    WHERE (i.status = 'High Alert' OR i.status LIKE 'Dispatched%' OR i.status = 'Dispatched' OR i.is_sos = 1)
+    AND i.id > ?
+    ORDER BY i.created_at DESC
+'''
+
+
+def seed(path, rows):
+    from migrate import migrate
+    migrate(path, verbose=False)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'b@x.in', 'x')")
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status, priority,
+                               is_sos, required_help, dispatched_unit)
+        VALUES (1, 'SOS Emergency', 'Emergency SOS alert triggered', 19.0760, 72.8777, ?, 'Critical', 1, ?, ?)
+    ''', [('Dispatched - Police', 'Immediate Police', 'Police') if i % 2 else ('High Alert', 'Medical/Ambulance', None)
+          for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def query_only(app, path):
+    from app import ADMIN_ALERTS_SQL
+    conn = sqlite3.connect(path)
+    rows = conn.execute(ADMIN_ALERTS_SQL, (0,)).fetchall()
+    conn.close()
+    return rows
+
+
+def current_path(app, path):
+    """The pre-serialize.py fetch_admin_alerts() + jsonify()"""
+    from flask import jsonify
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(OLD_ALERTS_SQL, (0,)).fetchall()
+    serialized_alerts = []
+    for row in rows:
+        alert_dict = dict(row)
+        if 'created_at' in alert_dict and alert_dict['created_at']:
+            alert_dict['created_at'] = str(alert_dict['created_at'])
+        if 'updated_at' in alert_dict and alert_dict['updated_at']:
+            alert_dict['updated_at'] = str(alert_dict['updated_at'])
+        alert_dict['is_dispatched'] = alert_dict.get('status', '').startswith('Dispatched')
+        alert_dict['required_help'] = alert_dict.get('required_help', '')
+        alert_dict['dispatched_unit'] = alert_dict.get('dispatched_unit', '')
+        serialized_alerts.append(alert_dict)
+    conn.close()
+    return jsonify({'alerts': serialized_alerts, 'count': len(serialized_alerts)}).get_data()
+
+
+def tuple_path(app, path):
+    from app import ADMIN_ALERTS_SQL, ADMIN_ALERT_CONVERTERS
+    import serialize
+    conn = sqlite3.connect(path)
+    serializer, cursor = serialize.query_rows(conn, ADMIN_ALERTS_SQL, (0,), ADMIN_ALERT_CONVERTERS)
+    rows = serializer.rows(cursor.fetchall())
+    conn.close()
+    return serialize.json_response({'alerts': rows, 'count': len(rows)}).get_data()
+
+
+def streamed_path(app, path):
+    from app import ADMIN_ALERTS_SQL, ADMIN_ALERT_CONVERTERS
+    import serialize
+    response = serialize.rows_response(sqlite3.connect(path), ADMIN_ALERTS_SQL, (0,), key='alerts',
+                                       converters=ADMIN_ALERT_CONVERTERS)
+    return b''.join(response.response)
+
+
+def best_of(runs, fn, *args):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.update(SECRET_KEY=SECRET_KEY, AUTO_MIGRATE='False', ARCHIVE_INTERVAL_MINUTES='0',
+                      FLASK_ENV='production')
+    from app import app
+    import serialize
+    orjson = serialize.orjson
+
+    print(f"{'rows':>7} {'query ms':>9} {'current ms':>11} {'tuples ms':>10} {'orjson ms':>10} {'streamed ms':>12} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as workdir, app.test_request_context():
+        for rows in args.rows:
+            path = os.path.join(workdir, f'bench_{rows}.db')
+            seed(path, rows)
+
+            query, _ = best_of(args.runs, query_only, app, path)
+            current, _ = best_of(args.runs, current_path, app, path)
+            serialize.orjson = None
+            tuples, _ = best_of(args.runs, tuple_path, app, path)
+            serialize.orjson = orjson
+            fast = best_of(args.runs, tuple_path, app, path)[0] if orjson else float('nan')
+            streamed, _ = best_of(args.runs, streamed_path, app, path)
+            best = min(tuples, fast) if orjson else tuples
+            print(f"{rows:>7} {query:>9.1f} {current:>11.1f} {tuples:>10.1f} {fast:>10.1f} {streamed:>12.1f} "
+                  f"{current / best:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
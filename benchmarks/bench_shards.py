@@ -0,0 +1,240 @@
+"""Sharding benchmark: SOS insert throughput against the number of shard files
+
+Starts --writers processes that insert SOS incidents at random locations
+around major Indian cities as fast as they can for --seconds, the way the
+SOS endpoint does (a connection per report from ShardRouter.connect_at(),
+an id from allocate_ids(), INSERT and commit), and reports inserts per
+second and commit latency for:
+
+    unsharded   every insert goes to the primary database
+    N shards    inserts spread over N shard files by region
+
+Every writer waits on one write lock without sharding; with N shards only
+on the lock of the shard its region maps to. Throughput scales while there
+are cores (and disk bandwidth for the commits) to run the writers in
+parallel. On a single core the writers no longer take turns but compete
+for the CPU, so throughput drops as shards are added and only the lock-wait
+tail (p99) improves. Put --dir on the disk the database lives on: tmpfs
+hides the fsync cost.
+
+Before the runs it checks that pollers miss nothing with 2 shards: SOS
+reports written alternately to the primary (as a worker not yet restarted
+with sharding does) and to the shards, one of them committed after a
+higher id from another shard, must all reach /api/poll/incidents and the
+admin SSE stream (async_server.AlertBroadcaster) exactly once. Exits with
+status 1 if they don't.
+
+Usage:
+    python benchmarks/bench_shards.py --writers 8 --seconds 10 --shards 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import run_in  # Also puts the repo on sys.path
+from database import enable_wal
+from migrate import migrate
+from shards import ShardRouter, allocate_ids
+
+CITIES = [
+    (19.076, 72.877), (28.614, 77.209), (12.972, 77.595), (13.083, 80.271), (22.573, 88.364),
+    (17.385, 78.487), (18.520, 73.857), (23.023, 72.571), (26.912, 75.787), (26.847, 80.947),
+    (21.146, 79.088), (25.594, 85.137), (30.733, 76.779), (9.931, 76.267), (15.299, 74.124),
+]
+
+
+# Runs in a fresh interpreter with the app configured for 2 shards, in a scratch directory
+CHECK_POLLING = """
+import asyncio, json, sqlite3, sys
+from app import app, shards, insert_sos_incident, limiter
+import async_server
+from shards import allocate_ids
+
+limiter.enabled = False
+conn = sqlite3.connect('surakshita.db')
+conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@x.in', 'x')")
+conn.commit()
+conn.close()
+PLACES = [(19.0760, 72.8777), (28.6139, 77.2090), (12.9716, 77.5946), (22.5726, 88.3639)]
+for place in PLACES:
+    async_server.geocoder._cache[round(place[0], 3), round(place[1], 3)] = 'bench'
+
+def report(where, place):
+    conn = shards.connect(0) if where == 'primary' else shards.connect_at(*place)
+    try:
+        return insert_sos_incident(conn, 1, 'SOS Emergency', 'bench', *place, 'Police')
+    finally:
+        conn.close()
+
+client = app.test_client()
+with client.session_transaction() as session:
+    session['user_id'] = 1
+    session['username'] = 'bench'
+last_id, polled = 0, []
+
+def poll():
+    # What static/js/dashboard.js does: ask above the highest id seen, skip ids it has
+    global last_id
+    incidents = client.get(f'/api/poll/incidents?last_id={last_id}').get_json()['incidents']
+    fresh = [row['id'] for row in incidents if row['id'] not in polled]
+    polled.extend(fresh)
+    last_id = max([last_id] + fresh)
+
+async def main():
+    broadcaster = async_server.broadcaster
+    await broadcaster.start()
+    queue = broadcaster.subscribe()
+    streamed, written = [], []
+
+    async def drain():
+        broadcaster.notify()
+        await asyncio.sleep(0.2)
+        while not queue.empty():
+            event = queue.get_nowait().decode()
+            streamed.extend(alert['id'] for alert in json.loads(event.split('data: ', 1)[1])['alerts'])
+
+    for n in range(12):
+        written.append(report('primary' if n % 3 == 0 else 'shard', PLACES[n % len(PLACES)]))
+        poll()
+        await drain()
+
+    # A shard takes an id, another shard commits a higher one and is polled, then the first commits
+    slow = shards.connect_at(*PLACES[0])
+    early_id = allocate_ids(slow)[0]
+    fast = next(place for place in PLACES if shards.shard_for(*place) != shards.shard_for(*PLACES[0]))
+    written.append(report('shard', fast))
+    poll()
+    await drain()
+    slow.execute(\"INSERT INTO incidents (id, user_id, incident_type, description, latitude, longitude, status, is_sos) \"
+                 \"VALUES (?, 1, 'SOS Emergency', 'bench', ?, ?, 'High Alert', 1)\", (early_id, *PLACES[0]))
+    slow.commit()
+    slow.close()
+    async_server.data_version.bump(1)
+    written.append(early_id)
+    poll()
+    await drain()
+    await broadcaster.stop()
+
+    problems = []
+    for name, seen in (('/api/poll/incidents', polled), ('SSE stream', streamed)):
+        if sorted(seen) != sorted(written):
+            problems.append(f"{name} returned {len(seen)} of {len(written)} incidents "
+                            f"(missed {sorted(set(written) - set(seen))}, repeated {len(seen) - len(set(seen))})")
+    for problem in problems:
+        print(f"FAILED: {problem}", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+asyncio.run(main())
+"""
+
+
+def check_polling(workdir):
+    """Run CHECK_POLLING; returns whether every incident was polled and streamed once"""
+    try:
+        run_in(workdir, CHECK_POLLING, SHARDING_ENABLED='True', SHARD_COUNT=2, RISK_ENABLED='False',
+               FORECAST_ENABLED='False', NOTIFY_ENABLED='False', REPLICA_REFRESH_SECONDS=0)
+    except subprocess.CalledProcessError:
+        return False
+    return True
+
+
+def insert_sos(conn, latitude, longitude):
+    """Same statement as app.insert_sos_incident()"""
+    ids = allocate_ids(conn)
+    conn.execute('''
+        INSERT INTO incidents
+        (id, user_id, incident_type, description, latitude, longitude, status, priority, is_sos, required_help)
+        VALUES (?, 1, 'SOS Emergency', 'Emergency SOS alert triggered', ?, ?, 'High Alert', 'Critical', 1, 'Police')
+    ''', (ids[0] if ids else None, latitude, longitude))
+    conn.commit()
+
+
+def writer(db_path, shard_count, shard_dir, start_at, seconds, seed, results):
+    router = ShardRouter(db_path)
+    if shard_count:
+        router.configure(shard_count, shard_dir)
+    rng = random.Random(seed)
+    latencies = []
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        lat, lon = rng.choice(CITIES)
+        lat, lon = round(lat + rng.gauss(0, 0.3), 4), round(lon + rng.gauss(0, 0.3), 4)
+        started = time.perf_counter()
+        conn = sqlite3.connect(router.paths[router.shard_for(lat, lon)], timeout=30)
+        try:
+            insert_sos(conn, lat, lon)
+        finally:
+            conn.close()
+        latencies.append(time.perf_counter() - started)
+    results.put(latencies)
+
+
+def run(workdir, shard_count, writers, seconds):
+    db_path = os.path.join(workdir, f'bench-{shard_count}.db')
+    shard_dir = os.path.join(workdir, f'shards-{shard_count}')
+    migrate(db_path, verbose=False)
+    enable_wal(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@x.in', 'x')")
+    conn.commit()
+    conn.close()
+    if shard_count:
+        router = ShardRouter(db_path)
+        router.configure(shard_count, shard_dir)
+        os.makedirs(shard_dir)
+        for path in router.paths[1:]:
+            migrate(path, verbose=False)  # prepare() would print each migration
+        router.prepare()
+
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0  # Every writer starts together, after imports
+    processes = [multiprocessing.Process(target=writer, args=(db_path, shard_count, shard_dir, start_at,
+                                                              seconds, seed, results))
+                 for seed in range(writers)]
+    for process in processes:
+        process.start()
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get())
+    for process in processes:
+        process.join()
+    latencies.sort()
+    return (len(latencies) / seconds, statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8, help='writer processes')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--dir', default=None, help='where to create the databases (default: a temp dir)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        if not check_polling(workdir):
+            sys.exit(1)
+    print("polling   primary and shard inserts, one committed late, all polled and streamed once\n")
+
+    print(f"{args.writers} writers, {args.seconds:.0f} s per run, {os.cpu_count()} CPUs\n")
+    print(f"{'layout':<10} {'inserts/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        baseline = None
+        for shard_count in [0] + args.shards:
+            rate, p50, p99 = run(workdir, shard_count, args.writers, args.seconds)
+            baseline = baseline or rate
+            name = f'{shard_count} shards' if shard_count else 'unsharded'
+            print(f"{name:<10} {rate:>10,.0f} {rate / baseline:>7.2f}x {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""SLA analytics benchmark: incremental aggregation and report cost vs history size
+
+For each history size, seeds a throwaway database with that many incidents,
+each dispatched and then resolved (two transitions, via the real trigger), and
+times:
+
+    full fold     sla.aggregate() over the whole transition log
+    incremental   folding in 1000 new incidents' transitions
+    report        sla.stored_report(), what /api/admin/sla reads (plus parsing it here)
+    exact         the same percentiles computed with SQL over the whole history
+
+and reports the worst relative error of the sketch percentiles against the
+exact ones.
+
+Usage:
+    python benchmarks/bench_sla.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from common import percentile
+from migrate import migrate
+import sla
+
+UNITS = ('Police Unit 1', 'Police Unit 2', 'SWAT Team', 'Ambulance 1', 'Ambulance 4', 'Fire Brigade Alpha',
+         'Rapid Response Team')
+TYPES = ('Harassment', 'Stalking', 'Assault', 'SOS Emergency', 'Other')
+
+
+def add_incidents(conn, count, rng):
+    """Insert count incidents across India and push each through dispatch and resolve"""
+    first = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM incidents').fetchone()[0]
+    conn.execute('BEGIN')
+    conn.executemany('''
+        INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, status, created_at)
+        VALUES (1, ?, 'bench', ?, ?, 'High Alert', datetime('now', ?))
+    ''', [(rng.choice(TYPES), rng.uniform(9, 30), rng.uniform(70, 90), f'-{rng.randint(3600, 7200)} seconds')
+          for _ in range(count)])
+    ids = range(first, first + count)
+    # The trigger stamps transitions with CURRENT_TIMESTAMP, so spread them by rewriting created_at afterwards
+    conn.executemany("UPDATE incidents SET status = 'Dispatched', dispatched_unit = ? WHERE id = ?",
+                     [(rng.choice(UNITS), i) for i in ids])
+    conn.executemany("UPDATE incidents SET status = 'Resolved' WHERE id = ?", [(i,) for i in ids])
+    conn.execute('''
+        UPDATE incident_transitions
+        SET created_at = datetime((SELECT created_at FROM incidents WHERE id = incident_id),
+                                  '+' || (abs(random()) % (CASE WHEN to_status = 'Resolved' THEN 3000 ELSE 900 END) + 30) || ' seconds')
+        WHERE incident_id >= ?
+    ''', (first,))
+    conn.execute('COMMIT')
+
+
+EXACT_SQL = '''
+    SELECT (julianday(t.created_at) - julianday(i.created_at)) * 86400
+    FROM incident_transitions t JOIN incidents i ON i.id = t.incident_id
+    WHERE t.to_status = ?
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    print(f"{'incidents':>10} {'full fold s':>12} {'trans/s':>9} {'incr ms':>8} {'report ms':>10} "
+          f"{'exact ms':>9} {'max rel err':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            path = os.path.join(workdir, f'sla_{size}.db')
+            migrate(path, verbose=False)
+            conn = sqlite3.connect(path, isolation_level=None)
+            conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'b@x.in', 'x')")
+            add_incidents(conn, size, rng)
+
+            started = time.perf_counter()
+            folded = sla.aggregate(conn)
+            full = time.perf_counter() - started
+
+            add_incidents(conn, 1000, rng)
+            started = time.perf_counter()
+            sla.aggregate(conn)
+            incremental = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            report = json.loads(sla.stored_report(conn)[1])
+            report_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            worst = 0.0
+            for metric, status in (('time_to_dispatch', 'Dispatched'), ('time_to_resolve', 'Resolved')):
+                exact = sorted(row[0] for row in conn.execute(EXACT_SQL, (status,)))
+                overall = report['metrics'][metric]['overall']['all']
+                for q in sla.QUANTILES:
+                    truth = percentile(exact, q * 100)
+                    worst = max(worst, abs(overall[f'p{round(q * 100)}'] - truth) / truth)
+            exact_ms = (time.perf_counter() - started) * 1000
+            conn.close()
+
+            print(f"{size:>10} {full:>12.2f} {folded / full:>9.0f} {incremental:>8.1f} {report_ms:>10.2f} "
+                  f"{exact_ms:>9.0f} {worst:>11.2%}")
+
+
+if __name__ == '__main__':
+    main()
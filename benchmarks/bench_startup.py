@@ -0,0 +1,122 @@
+"""Worker startup benchmark: import time, time to first request, concurrent cold start
+
+Runs in fresh interpreters against a throwaway database:
+  1. `python -X importtime -c "import app"` N times, reporting the median total
+     and the slowest top-level imports
+  2. process start to first served request (/login through the test client)
+  3. W workers importing the app at once against an empty database, checking
+     that exactly one of them applies the migrations
+
+Exits non-zero when the median app import exceeds --budget-ms or a deferred
+dependency (geopy) is imported at startup, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 10 --workers 8 --budget-ms 600
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import server_env, seed_database
+
+DEFERRED_MODULES = ('geopy',)
+
+FIRST_REQUEST = (
+    "import time, sys\n"
+    "started = float(sys.argv[1])\n"
+    "from app import app\n"
+    "assert app.test_client().get('/login').status_code == 200\n"
+    "print(time.time() - started)\n"
+)
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us, depth)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def import_profile(workdir, runs):
+    totals, deferred_loaded, last = [], set(), {}
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                cwd=workdir, env=server_env(), capture_output=True, text=True, check=True)
+        last = parse_importtime(result.stderr)
+        totals.append(last['app'][1] / 1000)
+        deferred_loaded |= {name for name in last if name.split('.')[0] in DEFERRED_MODULES}
+    return totals, deferred_loaded, last
+
+
+def first_request(workdir, runs):
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', FIRST_REQUEST, str(time.time())],
+                                cwd=workdir, env=server_env(), capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+    return timings
+
+
+def cold_start(workers):
+    """Start workers simultaneously on an empty database; return (seconds, migrating workers)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        procs = [subprocess.Popen([sys.executable, '-c', 'import app'], cwd=workdir, env=server_env(),
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+        outputs = [proc.communicate()[0] for proc in procs]
+        elapsed = time.perf_counter() - started
+        if any(proc.returncode for proc in procs):
+            raise SystemExit("a worker failed to start")
+        return elapsed, sum('Applied migration' in output for output in outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--budget-ms', type=float, default=600, help='maximum median import time of app')
+    parser.add_argument('--top', type=int, default=10, help='slowest top-level imports to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_database(workdir, 0)
+        totals, deferred_loaded, last = import_profile(workdir, args.runs)
+        requests = first_request(workdir, args.runs)
+
+    median_import = statistics.median(totals)
+    print(f"import app:      median {median_import:.1f} ms, min {min(totals):.1f} ms ({args.runs} runs)")
+    print(f"first request:   median {statistics.median(requests):.1f} ms from process start")
+
+    print("\nslowest imports under app (cumulative ms, last run):")
+    children = sorted(((cumulative, name) for name, (_, cumulative, depth) in last.items()
+                       if depth == 1 and name != 'app'), reverse=True)
+    for cumulative, name in children[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f}  {name}")
+
+    elapsed, migrators = cold_start(args.workers)
+    print(f"\ncold start:      {args.workers} workers in {elapsed * 1000:.0f} ms, "
+          f"{migrators} applied migrations")
+
+    failures = []
+    if median_import > args.budget_ms:
+        failures.append(f"median import {median_import:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+    if deferred_loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(sorted(deferred_loaded))}")
+    if migrators != 1:
+        failures.append(f"expected exactly one worker to migrate, got {migrators}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
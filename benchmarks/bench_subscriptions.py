@@ -0,0 +1,179 @@
+"""Geofence subscription matching benchmark: per-incident match latency vs subscription count
+
+Seeds a throwaway database with N subscriptions (90% circles of 0.5-5 km, 10%
+small polygons) clustered around major Indian cities, then matches incidents
+drawn from the same distribution and times:
+
+    match       subscriptions.match() - R*Tree candidates + exact test
+    notify      Notifier.notify() - match plus writing the notifications
+    scan        exact test of every subscription held in memory (the baseline)
+
+Before timing it checks that /api/notifications delivers a backlog of 250
+pending notifications - more than one page - exactly once, both polling
+forward with after_id and paging back with before_id. Exits with status 1
+if it doesn't.
+
+Usage:
+    python benchmarks/bench_subscriptions.py --sizes 100000 300000 1000000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import percentile, run_in
+from migrate import migrate
+import subscriptions
+
+CITIES = [
+    (19.076, 72.877), (28.614, 77.209), (12.972, 77.595), (13.083, 80.271), (22.573, 88.364),
+    (17.385, 78.487), (18.520, 73.857), (23.023, 72.571), (26.912, 75.787), (26.847, 80.947),
+    (21.146, 79.088), (22.720, 75.858), (30.733, 76.779), (9.931, 76.267), (25.594, 85.138),
+]
+
+
+# Runs in a fresh interpreter in a scratch directory: pages through 250 pending notifications
+CHECK_PAGING = """
+import sqlite3, sys
+from app import app, limiter
+
+limiter.enabled = False
+conn = sqlite3.connect('surakshita.db')
+conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@x.in', 'x')")
+conn.executemany("INSERT INTO notifications (user_id, incident_id, incident_type, latitude, longitude) "
+                 "VALUES (1, ?, 'SOS Emergency', 19.07, 72.87)", [(n,) for n in range(250)])
+conn.commit()
+conn.close()
+client = app.test_client()
+with client.session_transaction() as session:
+    session['user_id'] = 1
+    session['username'] = 'bench'
+
+def fetch(query):
+    return [row['id'] for row in client.get(f'/api/notifications{query}').get_json()['notifications']]
+
+forward, page = [], fetch('?after_id=0')
+while page and len(forward) < 1000:  # Bounded, in case a cursor is ignored
+    forward += page
+    page = fetch(f'?after_id={max(page)}')
+back, page = [], fetch('')
+while page and len(back) < 1000:
+    back += page
+    page = fetch(f'?before_id={min(page)}')
+expected = list(range(1, 251))
+problems = [f"{name} returned {len(ids)} notifications, {len(set(ids))} distinct, of {len(expected)}"
+            for name, ids in (('after_id', forward), ('before_id', back)) if sorted(ids) != expected]
+for problem in problems:
+    print(f"FAILED: {problem}", file=sys.stderr)
+sys.exit(1 if problems else 0)
+"""
+
+
+def check_paging(workdir):
+    """Run CHECK_PAGING; returns whether every notification was delivered once"""
+    try:
+        run_in(workdir, CHECK_PAGING, RISK_ENABLED='False', FORECAST_ENABLED='False', REPLICA_REFRESH_SECONDS=0)
+    except subprocess.CalledProcessError:
+        return False
+    return True
+
+
+def random_point(rng):
+    lat, lon = rng.choice(CITIES)
+    return lat + rng.gauss(0, 0.15), lon + rng.gauss(0, 0.15)
+
+
+def seed(path, count, rng):
+    """Insert subscriptions straight into the tables (validation is not what is being measured)"""
+    migrate(path, verbose=False)
+    conn = sqlite3.connect(path)
+    rows, boxes, scan = [], [], []
+    for sub_id in range(1, count + 1):
+        lat, lon = random_point(rng)
+        user_id = rng.randint(2, count // 3 + 2)
+        if rng.random() < 0.9:
+            radius = rng.uniform(500, 5000)
+            fields = {'kind': 'circle', 'latitude': lat, 'longitude': lon, 'radius_m': radius, 'polygon': None,
+                      'bbox': subscriptions._bbox_circle(lat, lon, radius)}
+        else:
+            ring = [(lon + 0.02 * math.cos(a), lat + 0.02 * math.sin(a)) for a in (0, 1.3, 2.6, 3.9, 5.2)]
+            fields = {'kind': 'polygon', 'latitude': lat, 'longitude': lon, 'radius_m': None, 'polygon': ring,
+                      'bbox': (lat - 0.02, lat + 0.02, lon - 0.02, lon + 0.02)}
+        rows.append((sub_id, user_id, 'bench', fields['kind'], lat, lon, fields['radius_m'],
+                     json.dumps(fields['polygon']) if fields['polygon'] else None))
+        boxes.append((sub_id, *fields['bbox']))
+        scan.append((sub_id, user_id, fields))
+    conn.executemany('INSERT INTO geofence_subscriptions (id, user_id, name, kind, latitude, longitude, radius_m, polygon) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.executemany('INSERT INTO geofence_subscriptions_rtree VALUES (?, ?, ?, ?, ?)', boxes)
+    conn.commit()
+    conn.close()
+    return scan
+
+
+def scan_match(scan, lat, lon):
+    matches = []
+    for sub_id, user_id, fields in scan:
+        if fields['kind'] == 'circle':
+            hit = subscriptions.distance_m(lat, lon, fields['latitude'], fields['longitude']) <= fields['radius_m']
+        else:
+            hit = subscriptions.point_in_polygon(lat, lon, fields['polygon'])
+        if hit:
+            matches.append((sub_id, user_id))
+    return matches
+
+
+def timed(fn, points):
+    timings, results = [], []
+    for lat, lon in points:
+        started = time.perf_counter()
+        results.append(fn(lat, lon))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 300000, 1000000])
+    parser.add_argument('--incidents', type=int, default=500)
+    parser.add_argument('--scan-incidents', type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if not check_paging(workdir):
+            sys.exit(1)
+    print("paging    250 pending notifications delivered once forward (after_id) and back (before_id)\n")
+
+    print(f"{'subs':>8} {'matches':>8} {'match p50':>10} {'match p99':>10} {'notify p50':>11} {'notify p99':>11} "
+          f"{'scan p50':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            path = os.path.join(workdir, f'subs_{size}.db')
+            scan = seed(path, size, rng)
+            points = [random_point(rng) for _ in range(args.incidents)]
+            conn = sqlite3.connect(path)
+
+            match_ms, matched = timed(lambda lat, lon: subscriptions.match(conn, lat, lon), points)
+            notifier = subscriptions.Notifier(path)
+            notify_ms, _ = timed(lambda lat, lon: notifier.notify(conn, 0, 1, 'SOS Emergency', lat, lon), points)
+            scan_ms, scanned = timed(lambda lat, lon: scan_match(scan, lat, lon), points[:args.scan_incidents])
+            assert all(sorted(a) == sorted(b) for a, b in zip(matched, scanned)), 'index and scan disagree'
+            conn.close()
+
+            p50 = percentile(match_ms, 50)
+            print(f"{size:>8} {sum(map(len, matched)) / len(matched):>8.0f} {p50:>10.2f} "
+                  f"{percentile(match_ms, 99):>10.2f} {percentile(notify_ms, 50):>11.2f} "
+                  f"{percentile(notify_ms, 99):>11.2f} {percentile(scan_ms, 50):>9.1f} "
+                  f"{percentile(scan_ms, 50) / p50:>7.0f}x")
+    print(f"(ms per incident; matches = average subscriptions matched; scan timed over {args.scan_incidents} incidents)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Version stamp benchmark: cost of reading and bumping stamps, and sharing them between workers
+
+    read / bump    VersionStamps.current() and bump() against the
+                   MAX(updated_at) query a stamp replaces, on --rows incidents
+    sharing        a second VersionStamps on the same file - in this process
+                   and in a newly started worker process - must see the
+                   first one's stamps and must not change them
+
+Exits with status 1 if the sharing check fails.
+
+Usage:
+    python benchmarks/bench_versions.py --rows 100000
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from migrate import migrate
+from versions import VersionStamps
+
+
+def per_call(function, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started) / calls
+
+
+def worker_start(path, results):
+    """What a worker process does when it starts: map the file, read a stamp"""
+    stamps = VersionStamps(path)
+    results.put((stamps.current(), stamps.current(7)))
+
+
+def check_sharing(path):
+    first = VersionStamps(path)
+    first.bump(7)
+    before = first.dump()
+
+    second = VersionStamps(path)
+    problems = []
+    if (second.current(), second.current(7)) != (first.current(), first.current(7)):
+        problems.append("a second VersionStamps in the same process read different stamps")
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=worker_start, args=(path, results))
+    process.start()
+    seen = results.get()
+    process.join()
+    if seen != (first.current(), first.current(7)):
+        problems.append("a new worker process read different stamps")
+    if first.dump() != before:
+        problems.append("opening the file again changed the stamps of the running worker")
+
+    second.bump(7)
+    if first.current(7) != second.current(7):
+        problems.append("a bump from the second VersionStamps was not seen by the first")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'versions.db')
+        migrate(db_path, verbose=False)
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@x.in', 'x')")
+        conn.executemany("INSERT INTO incidents (user_id, incident_type, description, latitude, longitude) "
+                         "VALUES (1, 'Harassment', 'x', 19.07, 72.87)", [()] * args.rows)
+        conn.commit()
+
+        stamps = VersionStamps(f'{db_path}-version')
+        query = per_call(lambda: conn.execute('SELECT MAX(updated_at), COUNT(*) FROM incidents').fetchone(), 50)
+        print(f"{'read':<8} stamp {per_call(stamps.current, 200000) * 1e6:.2f} us, "
+              f"MAX(updated_at) query {query * 1e3:.2f} ms ({args.rows} incidents)")
+        print(f"{'bump':<8} {per_call(lambda: stamps.bump(1), 200000) * 1e6:.2f} us")
+        conn.close()
+
+        problems = check_sharing(os.path.join(workdir, 'shared-version'))
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"{'sharing':<8} a second map and a new worker see the same stamps and leave them unchanged")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Shared helpers for the Surakshita benchmark scripts"""
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = 'bench-secret-key'
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def process_stats(pid):
+    """Return (threads, rss_mb) for a process from /proc"""
+    threads, rss_kb = 0, 0
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('Threads:'):
+                threads = int(line.split()[1])
+            elif line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+    return threads, rss_kb / 1024
+
+
+def server_env(**overrides):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT
+    env['SECRET_KEY'] = SECRET_KEY
+    env['FLASK_ENV'] = 'development'
+    env.update({key: str(value) for key, value in overrides.items()})
+    return env
+
+
+def run_in(workdir, script, **env):
+    """Run a Python snippet with the repo importable and workdir as the database directory"""
+    subprocess.run([sys.executable, '-c', script], cwd=workdir, env=server_env(**env),
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def seed_database(workdir, rows, status='High Alert', is_sos=1):
+    run_in(workdir, (
+        "import sqlite3\n"
+        "from database import init_db\n"
+        "init_db()\n"
+        "conn = sqlite3.connect('surakshita.db')\n"
+        "conn.execute(\"INSERT INTO users (username, email, password_hash) VALUES ('bench', 'b@x.in', 'x')\")\n"
+        "conn.executemany(\"INSERT INTO incidents (user_id, incident_type, description, latitude, longitude, "
+        "status, priority, is_sos) VALUES (1, 'SOS Emergency', 'bench', 19.07, 72.87, ?, 'Critical', ?)\", "
+        f"[({status!r}, {is_sos})] * {rows})\n"
+        "conn.commit()\n"
+    ))
+
+
+def session_cookie(data):
+    """Sign a Flask session cookie the benchmark servers will accept"""
+    os.environ['SECRET_KEY'] = SECRET_KEY
+    os.environ['AUTO_MIGRATE'] = 'False'  # Only the key is needed, not a database
+    from app import app
+    serializer = app.session_interface.get_signing_serializer(app)
+    return f"{app.config['SESSION_COOKIE_NAME']}={serializer.dumps(data)}"
+
+
+def csrf_header(raw_token):
+    from itsdangerous import URLSafeTimedSerializer
+    return URLSafeTimedSerializer(SECRET_KEY, salt='wtf-csrf-token').dumps(raw_token)
+
+
+def start_server(kind, port, workdir, **env):
+    """Start the threaded Flask server or the async ASGI server with rate limits off"""
+    if kind == 'threaded':
+        cmd = [sys.executable, '-c',
+               "from app import app, limiter\n"
+               "limiter.enabled = False\n"
+               f"app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"]
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'async_server:asgi_app',
+               '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+               '--backlog', '4096']
+    proc = subprocess.Popen(cmd, cwd=workdir, env=server_env(**env), preexec_fn=raise_fd_limit,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(3)
+    return proc
+
+
+async def http_request(port, method, path, headers=None, body=b''):
+    """Minimal HTTP/1.1 client returning (status, body, elapsed_seconds)"""
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        lines = [f"{method} {path} HTTP/1.1", "Host: localhost", "Connection: close",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{key}: {value}" for key, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), payload, time.perf_counter() - started
+    except (OSError, IndexError, ValueError):
+        return 0, b'', time.perf_counter() - started
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
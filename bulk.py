@@ -0,0 +1,257 @@
+"""Bulk incident ingestion for partner helplines and offline sync
+
+POST /api/incidents/bulk accepts either a JSON array of incidents or NDJSON
+(one incident object per line, Content-Type application/x-ndjson). Each
+incident looks like:
+
+    {"incident_type": "Harassment", "description": "...", "latitude": 19.07,
+     "longitude": 72.87, "required_help": "Immediate Police",
+     "idempotency_key": "device-42-000017", "created_at": "2026-03-01T18:20:00+05:30",
+     "is_sos": false}
+
+The whole batch is validated up front, then valid rows are inserted with
+executemany() in chunks, each chunk in its own short IMMEDIATE transaction so
+SOS reports can take the write lock in between. Rows carrying an
+idempotency_key already stored for the same user are reported as duplicates
+instead of being inserted again, so a client can safely replay a batch after
+a timeout.
+
+Every input row gets a result, in input order:
+
+    {"index": 0, "status": "created", "id": 1234}
+    {"index": 1, "status": "duplicate", "id": 1234}
+    {"index": 2, "status": "invalid", "error": "..."}
+    {"index": 3, "status": "failed", "error": "..."}   # retry with the same keys
+"""
+import json
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from shards import allocate_ids
+from validators import INCIDENT_TYPES, validate_coordinates_batch, validate_description
+
+NDJSON_TYPES = {'application/x-ndjson', 'application/ndjson', 'application/jsonl'}
+MAX_KEY_LENGTH = 128
+MAX_HELP_LENGTH = 100
+KEY_LOOKUP_BATCH = 500  # Well below SQLite's bound-parameter limit
+
+
+class BulkPayloadError(ValueError):
+    """The request body could not be read as a batch of incidents"""
+
+
+def parse_payload(body, mimetype):
+    """Decode a JSON array or NDJSON body
+
+    Returns:
+        (records, parse_errors) where parse_errors maps the index of each
+        unreadable NDJSON line to its error message
+    """
+    if mimetype in NDJSON_TYPES:
+        records, parse_errors = [], {}
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                parse_errors[len(records)] = f"Invalid JSON: {e}"
+                records.append(None)
+        return records, parse_errors
+
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise BulkPayloadError(f"Invalid JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get('incidents')
+    if not isinstance(data, list):
+        raise BulkPayloadError("Expected a JSON array of incidents or an object with an 'incidents' array")
+    return data, {}
+
+
+def _parse_timestamp(value):
+    """Normalize a client timestamp to the 'YYYY-MM-DD HH:MM:SS' UTC format SQLite uses"""
+    moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if moment > datetime.now(timezone.utc).replace(tzinfo=None):
+        raise ValueError("created_at is in the future")
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _validate_record(record):
+    """Return (idempotency_key, row values) for one incident, raising ValueError if invalid"""
+    incident_type = record.get('incident_type')
+    if incident_type not in INCIDENT_TYPES:
+        raise ValueError("Invalid incident type")
+
+    description = record.get('description')
+    if not isinstance(description, str):
+        raise ValueError("Description cannot be empty")
+    is_valid, error_msg = validate_description(description)
+    if not is_valid:
+        raise ValueError(error_msg)
+
+    required_help = record.get('required_help')
+    if not isinstance(required_help, str) or not required_help.strip():
+        raise ValueError("Required help type must be specified")
+    if len(required_help) > MAX_HELP_LENGTH:
+        raise ValueError(f"required_help must be {MAX_HELP_LENGTH} characters or less")
+
+    key = record.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH):
+        raise ValueError(f"idempotency_key must be a string of 1-{MAX_KEY_LENGTH} characters")
+
+    created_at = record.get('created_at')
+    if created_at is not None:
+        created_at = _parse_timestamp(created_at)
+
+    if record.get('is_sos'):
+        status, priority, is_sos = 'High Alert', 'Critical', 1
+    else:
+        status, priority, is_sos = 'Pending', 'Normal', 0
+
+    # Privacy: Round to 4 decimal places (~11m accuracy)
+    latitude = round(float(record['latitude']), 4)
+    longitude = round(float(record['longitude']), 4)
+    return key, (incident_type, description, latitude, longitude, status, priority, is_sos,
+                 required_help, created_at, created_at)
+
+
+def validate_batch(records, parse_errors=None):
+    """Validate every record of a batch
+
+    Returns:
+        (rows, results, duplicates): rows is [(index, key, values)] for the
+        valid, first-seen records; results holds an 'invalid' entry for each
+        rejected record and None elsewhere; duplicates is [(index, first_index)]
+        for repeats of an idempotency key within the batch
+    """
+    parse_errors = parse_errors or {}
+    results = [None] * len(records)
+    coordinates = [(r.get('latitude'), r.get('longitude')) if isinstance(r, dict) else (None, None)
+                   for r in records]
+    coordinate_errors = validate_coordinates_batch([c[0] for c in coordinates], [c[1] for c in coordinates])
+
+    rows, duplicates, first_seen = [], [], {}
+    for index, record in enumerate(records):
+        if index in parse_errors:
+            error = parse_errors[index]
+        elif not isinstance(record, dict):
+            error = "Each incident must be a JSON object"
+        elif coordinate_errors[index]:
+            error = coordinate_errors[index]
+        else:
+            try:
+                key, values = _validate_record(record)
+            except ValueError as e:
+                error = str(e)
+            else:
+                if key is not None and key in first_seen:
+                    duplicates.append((index, first_seen[key]))
+                    continue
+                if key is not None:
+                    first_seen[key] = index
+                rows.append((index, key, values))
+                continue
+        results[index] = {'index': index, 'status': 'invalid', 'error': error}
+    return rows, results, duplicates
+
+
+def _existing_keys(conn, user_id, keys):
+    existing = {}
+    for start in range(0, len(keys), KEY_LOOKUP_BATCH):
+        batch = keys[start:start + KEY_LOOKUP_BATCH]
+        placeholders = ','.join('?' * len(batch))
+        existing.update(conn.execute(f'''
+            SELECT idempotency_key, incident_id FROM incident_idempotency
+            WHERE user_id = ? AND idempotency_key IN ({placeholders})
+        ''', (user_id, *batch)).fetchall())
+    return existing
+
+
+def _insert_chunk(conn, user_id, chunk, results):
+    """Insert one chunk inside an IMMEDIATE transaction; fills in results"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        existing = _existing_keys(conn, user_id, [key for _, key, _ in chunk if key is not None])
+        new = []
+        for index, key, values in chunk:
+            if key in existing:
+                results[index] = {'index': index, 'status': 'duplicate', 'id': existing[key]}
+            else:
+                new.append((index, key, values))
+
+        ids = None
+        if new:
+            ids = allocate_ids(conn, len(new))  # None outside shard files
+            conn.executemany('''
+                INSERT INTO incidents
+                (id, user_id, incident_type, description, latitude, longitude, status, priority, is_sos,
+                 required_help, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP))
+            ''', [(ids[offset] if ids else None, user_id, *values) for offset, (_, _, values) in enumerate(new)])
+            if ids is None:
+                # AUTOINCREMENT ids are consecutive while we hold the write lock
+                last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'incidents'").fetchone()[0]
+                ids = range(last_id - len(new) + 1, last_id + 1)
+            conn.executemany('''
+                INSERT INTO incident_idempotency (user_id, idempotency_key, incident_id) VALUES (?, ?, ?)
+            ''', [(user_id, key, ids[offset]) for offset, (_, key, _) in enumerate(new) if key is not None])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for offset, (index, _, _) in enumerate(new):
+        results[index] = {'index': index, 'status': 'created', 'id': ids[offset]}
+    return len(new)
+
+
+def ingest(conn, user_id, rows, results, duplicates=(), chunk_size=1000, pause=0.002, stamps=None):
+    """Insert validated rows in chunked transactions and complete the per-row results
+
+    A chunk that fails (e.g. the database stays locked) marks its rows and all
+    later rows as 'failed'; chunks already committed stay committed.
+
+    Returns:
+        Number of incidents created
+    """
+    created = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            inserted = _insert_chunk(conn, user_id, chunk, results)
+        except sqlite3.Error as e:
+            for index, _, _ in rows[start:]:
+                results[index] = {'index': index, 'status': 'failed',
+                                  'error': f"Not stored ({e}), retry with the same idempotency keys"}
+            break
+        created += inserted
+        if inserted and stamps is not None:
+            stamps.bump(user_id)
+        if start + chunk_size < len(rows):
+            time.sleep(pause)  # Let waiting writers (SOS reports) take the lock
+
+    resolve_duplicates(results, duplicates)
+    return created
+
+
+def resolve_duplicates(results, duplicates):
+    """Give repeats of an idempotency key within the batch the result of its first row"""
+    for index, first_index in duplicates:
+        first = results[first_index]
+        if first['status'] in ('created', 'duplicate'):
+            results[index] = {'index': index, 'status': 'duplicate', 'id': first['id']}
+        else:
+            results[index] = dict(first, index=index)
+
+
+def summarize(results):
+    """Count results by status"""
+    counts = {'created': 0, 'duplicate': 0, 'invalid': 0, 'failed': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return counts
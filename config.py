@@ -1,17 +1,22 @@
 """Configuration management for Surakshita"""
 import os
 import secrets
-from dotenv import load_dotenv
+import time
 
-load_dotenv()
+# python-dotenv is only imported when there is a .env file to read
+if os.path.exists('.env'):
+    from dotenv import load_dotenv
+    load_dotenv('.env')
+
+# Generated SECRET_KEY shared by all workers when none is configured - kept in
+# the app's instance folder, outside version control
+GENERATED_KEY_FILE = 'surakshita-secret-key'
+LEGACY_KEY_FILE = '.surakshita-secret-key'  # Earlier location, in the working directory
 
 class Config:
     """Base configuration"""
-    # Security: Load from environment or generate warning
+    # Security: Load from environment or generate on first start (see init_app)
     SECRET_KEY = os.getenv('SECRET_KEY')
-    if not SECRET_KEY:
-        print("WARNING: SECRET_KEY not set in environment! Using generated key (not recommended for production)")
-        SECRET_KEY = secrets.token_hex(32)
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
@@ -24,8 +29,113 @@ class Config:
     # Rate limiting
     RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
     
+    # Admission control - reserved capacity for SOS traffic, shedding of heavy pages
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True') == 'True'
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 32))
+    ADMISSION_SOS_RESERVED = int(os.getenv('ADMISSION_SOS_RESERVED', 8))
+    ADMISSION_HEAVY_MAX = int(os.getenv('ADMISSION_HEAVY_MAX', 8))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 64))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 2.0))
+    ADMISSION_DB_WAIT_THRESHOLD = float(os.getenv('ADMISSION_DB_WAIT_THRESHOLD', 0.25))
+    ADMISSION_STALE_SECONDS = int(os.getenv('ADMISSION_STALE_SECONDS', 300))
+    
+    # Bulk incident ingestion (/api/incidents/bulk)
+    BULK_MAX_ROWS = int(os.getenv('BULK_MAX_ROWS', 50000))
+    BULK_MAX_BYTES = int(os.getenv('BULK_MAX_BYTES', 32 * 1024 * 1024))
+    BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+    # Largest request body any route reads (413 above it) - the bulk batch limit
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', BULK_MAX_BYTES))
+    
+    # Archival of resolved incidents (0 disables the in-app schedule)
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30))
+    ARCHIVE_INTERVAL_MINUTES = int(os.getenv('ARCHIVE_INTERVAL_MINUTES', 60))
+    
+    # Online hot backups (0 disables the in-app schedule; see backup.py)
+    BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+    BACKUP_INTERVAL_MINUTES = int(os.getenv('BACKUP_INTERVAL_MINUTES', 360))
+    BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', 7))
+    
+    # Dispatch SLA aggregation (0 disables the in-app schedule; see sla.py)
+    SLA_INTERVAL_SECONDS = int(os.getenv('SLA_INTERVAL_SECONDS', 60))
+    
+    # Geofence subscription notifications (see subscriptions.py)
+    NOTIFY_ENABLED = os.getenv('NOTIFY_ENABLED', 'True') == 'True'
+    NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', 10000))
+    
+    # Read-only analytics replica (0 disables it; reads then all go to the primary)
+    REPLICA_REFRESH_SECONDS = int(os.getenv('REPLICA_REFRESH_SECONDS', 30))
+    REPLICA_MAX_LAG_SECONDS = int(os.getenv('REPLICA_MAX_LAG_SECONDS', 120))
+    
+    # Audit log writer (see audit.py)
+    AUDIT_ENABLED = os.getenv('AUDIT_ENABLED', 'True') == 'True'
+    AUDIT_FLUSH_SECONDS = float(os.getenv('AUDIT_FLUSH_SECONDS', 1.0))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 100000))
+    
+    # Route risk grid (see risk.py) - changing the cell size or half-life rebuilds it
+    RISK_ENABLED = os.getenv('RISK_ENABLED', 'True') == 'True'
+    RISK_CELL_DEGREES = float(os.getenv('RISK_CELL_DEGREES', 0.01))
+    RISK_HALF_LIFE_DAYS = float(os.getenv('RISK_HALF_LIFE_DAYS', 60))
+    RISK_REFRESH_SECONDS = float(os.getenv('RISK_REFRESH_SECONDS', 2.0))
+    
+    # Incident forecasts (see forecast.py) - checked every refresh, retrained once per hour
+    FORECAST_ENABLED = os.getenv('FORECAST_ENABLED', 'True') == 'True'
+    FORECAST_REFRESH_SECONDS = float(os.getenv('FORECAST_REFRESH_SECONDS', 300))
+    
+    # Incident shard files (see shards.py) - up to 10; keep the count once incidents are sharded
+    SHARDING_ENABLED = os.getenv('SHARDING_ENABLED', 'False') == 'True'
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', 4))
+    SHARD_DIR = os.getenv('SHARD_DIR', 'shards')
+    SHARD_MAP_REFRESH_SECONDS = float(os.getenv('SHARD_MAP_REFRESH_SECONDS', 10))
+    
+    # On-demand sampling profiler (see profiler.py) - sessions are started by admins
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'True') == 'True'
+    PROFILER_DIR = os.getenv('PROFILER_DIR', 'profiles')
+    PROFILER_CHECK_SECONDS = float(os.getenv('PROFILER_CHECK_SECONDS', 1.0))
+    
+    # Response compression and precompressed static files (see assets.py)
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'True') == 'True'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    
     # WTF CSRF
     WTF_CSRF_TIME_LIMIT = None  # No timeout for CSRF tokens
+    
+    # Apply pending schema migrations when the app is created
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', 'True') == 'True'
+    
+    @staticmethod
+    def init_app(app):
+        """Resolve settings that need work beyond reading the environment"""
+        if not app.config.get('SECRET_KEY'):
+            print("WARNING: SECRET_KEY not set in environment! Using generated key (not recommended for production)")
+            os.makedirs(app.instance_path, exist_ok=True)
+            path = os.path.join(app.instance_path, GENERATED_KEY_FILE)
+            if os.path.exists(LEGACY_KEY_FILE) and not os.path.exists(path):
+                os.replace(LEGACY_KEY_FILE, path)  # Keep signed-in sessions valid across the move
+            app.config['SECRET_KEY'] = load_generated_key(path)
+
+
+def load_generated_key(path):
+    """Return the generated secret key, creating it if this is the first worker
+
+    The key is written once with O_EXCL, so every worker process signs
+    sessions with the same key instead of each generating its own.
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(path) as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.01)  # Another worker is still writing it
+        raise RuntimeError(f"Generated secret key file {path} is empty")
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+    return key
 
 
 class DevelopmentConfig(Config):
@@ -1,21 +1,16 @@
 import sqlite3
+from migrate import migrate
 
 def upgrade_database():
     """Add admin role support to existing database"""
-    conn = sqlite3.connect('surakshita.db')
-    cursor = conn.cursor()
-    
     print("🔧 Starting database upgrade for security enhancements...")
     
-    # Add is_admin column to users table
-    try:
-        cursor.execute('ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT 0')
-        print("✅ Added is_admin column to users table")
-    except sqlite3.OperationalError as e:
-        if "duplicate column name" in str(e).lower():
-            print("ℹ️  is_admin column already exists")
-        else:
-            raise
+    # Schema changes (including users.is_admin) are applied by the migration engine
+    applied = migrate('surakshita.db')
+    print(f"✅ Applied {len(applied)} migration(s)" if applied else "ℹ️  Schema already up to date")
+    
+    conn = sqlite3.connect('surakshita.db')
+    cursor = conn.cursor()
     
     # Prompt to create first admin user
     print("\n👤 Admin User Setup")
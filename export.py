@@ -0,0 +1,232 @@
+"""Columnar export of the incident history to partitioned Parquet for offline analysis
+
+Writes every incident (hot and archived, via the incidents_all view) to
+Hive-style partitions that pyarrow, pandas, DuckDB and Spark read directly:
+
+    EXPORT_DIR/incidents/month=2026-10/region=19N072E/part-00003.parquet
+
+month is taken from created_at; region is the geofence.region_of() grid cell
+(no state boundaries ship with the app, so a 1-degree cell stands in for the
+state). Users appear only as user_id - no usernames or emails.
+
+With sharded incidents (see shards.py) the rows are read through
+ShardRouter.connect_all(), so every shard file is exported.
+
+Rows are read from one SQLite read snapshot, sorted by partition, and written
+in record batches of EXPORT_BATCH_ROWS, so at most one batch and one open
+file are held in memory however large the history is.
+
+Runs are incremental. The watermark in EXPORT_DIR/_export_state.json holds the
+highest incident id exported and a cutoff time; the next run writes new
+incidents (id above the watermark) and incidents updated since the cutoff as
+new part files with a higher export_run. A changed incident can therefore
+appear in several parts - keep the row with the highest export_run per id.
+The cutoff trails the clock by CUTOFF_LAG_SECONDS, so an update committed
+just after the snapshot is still picked up by the next run. Deleted incidents
+are not removed from earlier parts.
+
+Needs pyarrow (pip install pyarrow); the app itself does not. Run from cron:
+    python export.py                # export what changed since the last run
+    python export.py --full         # start over with a complete export
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from geofence import REGION_DEGREES, region_of
+from shards import ShardRouter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_BATCH_ROWS = 50000
+CUTOFF_LAG_SECONDS = 60
+STATE_FILE = '_export_state.json'
+
+# Rows of one snapshot in partition order; cells are floor(degrees) offset to stay positive for CAST
+EXPORT_SQL = '''
+    SELECT id, user_id, incident_type, description, latitude, longitude, status, priority, is_sos,
+           required_help, dispatched_unit,
+           CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', updated_at) AS INTEGER),
+           strftime('%Y-%m', created_at) AS month,
+           CAST(latitude / :degrees + 1000 AS INTEGER) AS lat_cell,
+           CAST(longitude / :degrees + 1000 AS INTEGER) AS lon_cell
+    FROM incidents_all
+    WHERE (id > :last_id AND id <= :max_id)
+       OR (id <= :last_id AND updated_at >= :since AND updated_at < :cutoff)
+    ORDER BY month, lat_cell, lon_cell, id
+'''
+
+
+def _schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('incident_type', pa.string()),
+        ('description', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('status', pa.string()),
+        ('priority', pa.string()),
+        ('is_sos', pa.bool_()),
+        ('required_help', pa.string()),
+        ('dispatched_unit', pa.string()),
+        ('created_at', pa.timestamp('s', tz='UTC')),
+        ('updated_at', pa.timestamp('s', tz='UTC')),
+        ('export_run', pa.int32()),
+    ])
+
+
+def _record_batch(schema, rows, run):
+    """Arrow record batch from exported rows (the trailing partition columns are dropped)"""
+    columns = list(zip(*rows))
+    arrays = []
+    for index, field in enumerate(schema):
+        if field.name == 'export_run':
+            arrays.append(pa.array([run] * len(rows), field.type))
+        elif field.name == 'is_sos':
+            arrays.append(pa.array(columns[index], pa.int8()).cast(pa.bool_()))
+        else:
+            arrays.append(pa.array(columns[index], field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def read_state(export_dir):
+    """The watermark of the last completed run, or a fresh one"""
+    try:
+        with open(os.path.join(export_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'run': 0, 'last_id': 0, 'cutoff': ''}
+
+
+def _write_state(export_dir, state):
+    path = os.path.join(export_dir, STATE_FILE)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+def export_incidents(db_path='surakshita.db', export_dir='exports', full=False, batch_rows=EXPORT_BATCH_ROWS,
+                     compression='zstd', router=None):
+    """Write incidents new or changed since the last run to partitioned Parquet
+
+    Args:
+        db_path: SQLite database to read
+        export_dir: Root of the export (holds incidents/ and the watermark)
+        full: Discard earlier output and export everything
+        batch_rows: Rows fetched, and written as one record batch, at a time
+        compression: Parquet codec
+        router: ShardRouter, when incidents may be spread over shard files
+
+    Returns:
+        Summary dict of the run: run, rows, files (one per partition written), bytes, seconds, watermark
+    """
+    if pa is None:
+        raise RuntimeError('Parquet export needs pyarrow: pip install pyarrow')
+
+    started = time.perf_counter()
+    table_dir = os.path.join(export_dir, 'incidents')
+    if full:
+        shutil.rmtree(table_dir, ignore_errors=True)
+        state = {'run': 0, 'last_id': 0, 'cutoff': ''}
+    else:
+        state = read_state(export_dir)
+    run = state['run'] + 1
+    schema = _schema()
+    summary = {'run': run, 'rows': 0, 'files': 0, 'bytes': 0}
+
+    if router is not None:
+        conn = router.connect_all()
+        conn.row_factory = None
+        conn.isolation_level = None
+    else:
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        # One read snapshot for the watermark and the rows, so nothing falls between them
+        conn.execute('BEGIN')
+        max_id, cutoff = conn.execute('SELECT (SELECT MAX(id) FROM incidents_all), datetime(\'now\', ?)',
+                                      (f'-{CUTOFF_LAG_SECONDS} seconds',)).fetchone()
+        max_id = max_id or 0
+        cursor = conn.execute(EXPORT_SQL, {
+            'degrees': REGION_DEGREES, 'last_id': state['last_id'], 'max_id': max_id,
+            'since': state['cutoff'], 'cutoff': cutoff,
+        })
+
+        key, writer, pending, paths = None, None, [], None
+
+        def flush():
+            if pending:
+                writer.write_batch(_record_batch(schema, pending, run))
+                summary['rows'] += len(pending)
+                pending.clear()
+
+        def close():
+            if writer is not None:
+                flush()
+                writer.close()
+                os.replace(*paths)
+                summary['files'] += 1
+                summary['bytes'] += os.path.getsize(paths[1])
+
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            for row in rows:
+                row_key = row[-3:]
+                if row_key != key:
+                    close()
+                    key = row_key
+                    month, lat_cell, lon_cell = key
+                    region = region_of((lat_cell - 1000 + 0.5) * REGION_DEGREES,
+                                       (lon_cell - 1000 + 0.5) * REGION_DEGREES)
+                    directory = os.path.join(table_dir, f'month={month or "unknown"}', f'region={region}')
+                    os.makedirs(directory, exist_ok=True)
+                    # Written under a dot-name that dataset readers skip, renamed once complete
+                    paths = (os.path.join(directory, f'.part-{run:05d}.parquet.tmp'),
+                             os.path.join(directory, f'part-{run:05d}.parquet'))
+                    writer = pq.ParquetWriter(paths[0], schema, compression=compression)
+                elif len(pending) >= batch_rows:
+                    flush()
+                pending.append(row)
+        close()
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    summary['watermark'] = {'last_id': max_id, 'cutoff': cutoff}
+    _write_state(export_dir, {
+        'run': run, 'last_id': max_id, 'cutoff': cutoff,
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'last_run': summary,
+    })
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export incidents to partitioned Parquet')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--dir', default='exports')
+    parser.add_argument('--full', action='store_true', help='discard earlier output and export everything')
+    parser.add_argument('--batch-rows', type=int, default=EXPORT_BATCH_ROWS)
+    parser.add_argument('--compression', default='zstd', help='Parquet codec (zstd, snappy, gzip, none)')
+    parser.add_argument('--shards', type=int, default=0, help='number of incident shard files (0: not sharded)')
+    parser.add_argument('--shard-dir', default='shards')
+    args = parser.parse_args()
+
+    router = None
+    if args.shards:
+        router = ShardRouter(args.db)
+        router.configure(args.shards, args.shard_dir)
+    summary = export_incidents(args.db, args.dir, args.full, args.batch_rows, args.compression, router)
+    print(f"Run {summary['run']}: {summary['rows']} rows in {summary['files']} files "
+          f"({summary['bytes'] / 1e6:.1f} MB) in {summary['seconds']:.2f} s, "
+          f"watermark id {summary['watermark']['last_id']}, cutoff {summary['watermark']['cutoff']}")
@@ -0,0 +1,366 @@
+"""Next-24h incident forecasts per region and incident type
+
+Incidents are counted per hour for every (region, incident type) series -
+regions are geofence.region_of's 1-degree cells, as in the SLA report and
+the Parquet export. Each series has an additive seasonal exponential
+smoothing model (Holt-Winters without trend) with a 168-hour, hour-of-week
+season:
+
+    level   l_t = ALPHA * (y_t - s_{t-168}) + (1 - ALPHA) * l_{t-1}
+    season  s_t = GAMMA * (y_t - l_t) + (1 - GAMMA) * s_{t-168}
+    forecast for hour t + k: max(l_t + s_{t+k-168}, 0)
+
+All series are fitted together, one hour at a time: counts are laid out
+hour-major and the season slots slot-major, so each hour is a handful of
+in-place NumPy operations on contiguous vectors of every series. Years of
+history for thousands of series fit in seconds on one core.
+
+Training is incremental: the state (levels, season slots, the hour trained
+up to and, per shard file, the id watermark) is kept in
+surakshita.db-forecast.npz, and each run only reads incidents newer than
+the watermark and fits the complete hours since the last run. A report
+that arrives after its hour was fitted (a backdated bulk upload, say) is
+not counted. One worker trains at a time, under a lock on a side file;
+the others load the new state when the file changes.
+
+Needs numpy (pip install numpy); without it forecasting is switched off.
+    python forecast.py              # fit new hours and print the busiest regions
+    python forecast.py --rebuild    # refit from the full history
+"""
+import argparse
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from geofence import REGION_DEGREES, region_of
+from shards import ID_STRIDE, ShardRouter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+SEASON_HOURS = 168
+HORIZON_HOURS = 24
+ALPHA = 0.01  # Level: half-life of about 3 days
+GAMMA = 0.05  # Season slots: half-life of about 13 weeks of their own hour
+FORMAT_VERSION = 1
+
+# Incident counts per hour, cell and type - cells are floor(degrees) offset to stay positive for CAST
+NEW_COUNTS_SQL = '''
+    SELECT CAST(strftime('%s', created_at) AS INTEGER) / 3600 AS hour,
+           CAST(latitude / :degrees + 1000 AS INTEGER) - 1000 AS lat_cell,
+           CAST(longitude / :degrees + 1000 AS INTEGER) - 1000 AS lon_cell,
+           incident_type, COUNT(*), MIN(id), MAX(id)
+    FROM incidents_all
+    WHERE id > :after AND created_at IS NOT NULL
+    GROUP BY hour, lat_cell, lon_cell, incident_type
+    ORDER BY hour
+'''
+
+
+def fit(level, season, counts, first_hour, alpha=ALPHA, gamma=GAMMA):
+    """Advance every series through consecutive hours of counts, in place
+
+    Args:
+        level: (series,) float64 levels after the hour before first_hour
+        season: (168, series) float64 season slots, indexed by hour % 168
+        counts: (hours, series) incident counts from first_hour on
+    """
+    scratch = np.empty_like(level)
+    for offset, observed in enumerate(counts):
+        slot = season[(first_hour + offset) % SEASON_HOURS]  # s_{t-168}, updated below to s_t
+        np.subtract(observed, slot, out=scratch)
+        scratch *= alpha
+        level *= 1.0 - alpha
+        level += scratch
+        np.subtract(observed, level, out=scratch)
+        scratch *= gamma
+        slot *= 1.0 - gamma
+        slot += scratch
+
+
+def predict(level, season, next_hour, horizon=HORIZON_HOURS):
+    """(horizon, series) expected counts for the hours from next_hour on"""
+    slots = (next_hour + np.arange(horizon)) % SEASON_HOURS
+    return np.maximum(season[slots] + level, 0.0)
+
+
+class Forecaster:
+    """Incrementally trained seasonal forecasts, shared by all workers through a state file
+
+    Args:
+        db_path: Database whose incidents are counted
+        router: ShardRouter, when incidents may be spread over shard files
+    """
+
+    def __init__(self, db_path, router=None):
+        self.db_path = db_path
+        self.path = f'{db_path}-forecast.npz'
+        self.lock_path = f'{self.path}.lock'
+        self.router = router
+        self.enabled = False
+        self._state = None
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+        self.metrics = {'trainings': 0, 'hours_fitted': 0, 'rows_read': 0, 'last_training_seconds': None,
+                        'failures': 0}
+
+    def init_app(self, app):
+        if not app.config.get('FORECAST_ENABLED', True):
+            return
+        if np is None:
+            print("[FORECAST] numpy is not installed - forecasting is disabled (pip install numpy)")
+            return
+        self.enabled = True
+        threading.Thread(target=self._run, args=(app.config.get('FORECAST_REFRESH_SECONDS', 300),),
+                         name='surakshita-forecast', daemon=True).start()
+
+    def _paths(self):
+        return self.router.paths if self.router is not None else [self.db_path]
+
+    def _run(self, interval_seconds):
+        while True:
+            try:
+                if self.trained_until() != int(time.time()) // 3600:
+                    self.train()
+            except Exception:
+                # Anything, so a bad row or a NumPy error cannot stop the thread for good
+                self.metrics['failures'] += 1
+                logger.exception("[FORECAST] Training failed")
+            time.sleep(interval_seconds)
+
+    # State
+
+    @staticmethod
+    def _empty():
+        return {'lat_cells': np.zeros(0, np.int64), 'lon_cells': np.zeros(0, np.int64),
+                'types': np.zeros(0, dtype='<U64'), 'level': np.zeros(0), 'season': np.zeros((SEASON_HOURS, 0)),
+                'trained_until': None, 'watermarks': np.zeros(ID_STRIDE, np.int64), 'version': 0}
+
+    def _load(self):
+        """Read the state file if it changed since it was last read; returns the state"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return self._state
+        if mtime != self._loaded_mtime:
+            with np.load(self.path) as stored:
+                if int(stored['format']) == FORMAT_VERSION and stored['alpha'] == ALPHA and stored['gamma'] == GAMMA:
+                    trained = int(stored['trained_until'])
+                    self._state = {'lat_cells': stored['lat_cells'], 'lon_cells': stored['lon_cells'],
+                                   'types': stored['types'], 'level': stored['level'], 'season': stored['season'],
+                                   'trained_until': trained if trained >= 0 else None,
+                                   'watermarks': stored['watermarks'], 'version': int(stored['version'])}
+                else:
+                    self._state = None  # Another model or layout: refit from scratch
+            self._loaded_mtime = mtime
+        return self._state
+
+    def _save(self, state):
+        buffer = io.BytesIO()
+        np.savez(buffer, format=FORMAT_VERSION, alpha=ALPHA, gamma=GAMMA,
+                 lat_cells=state['lat_cells'], lon_cells=state['lon_cells'], types=state['types'],
+                 level=state['level'], season=state['season'], watermarks=state['watermarks'],
+                 trained_until=state['trained_until'] if state['trained_until'] is not None else -1,
+                 version=state['version'])
+        with open(f'{self.path}.tmp', 'wb') as f:
+            f.write(buffer.getbuffer())
+        os.replace(f'{self.path}.tmp', self.path)
+        self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def trained_until(self):
+        """Hour (since the Unix epoch) the forecasts start from, None before the first training"""
+        with self._lock:
+            state = self._load()
+        return state['trained_until'] if state else None
+
+    def version(self):
+        """Changes whenever the model is retrained - for caches and ETags"""
+        with self._lock:
+            state = self._load()
+        return state['version'] if state else 0
+
+    # Training
+
+    def train(self, rebuild=False, now=None):
+        """Fit the complete hours since the last training; returns how many hours were fitted"""
+        end_hour = int(now if now is not None else time.time()) // 3600
+        started = time.perf_counter()
+        lock = sqlite3.connect(self.lock_path, timeout=600, isolation_level=None)
+        try:
+            lock.execute('BEGIN EXCLUSIVE')
+            try:
+                with self._lock:
+                    state = None if rebuild else self._load()
+                if state and state['trained_until'] == end_hour:
+                    return 0  # Another worker trained while this one waited for the lock
+                state = dict(state) if state else self._empty()
+                rows, pending = self._read(state, end_hour)
+                fitted = self._fit_rows(state, rows, end_hour)
+                for shard_no, watermark in pending.items():
+                    state['watermarks'][shard_no] = watermark
+                state['version'] = time.time_ns() // 1000  # Unique across rebuilds too
+                with self._lock:
+                    self._save(state)
+                    self._state = state
+            finally:
+                lock.execute('COMMIT')
+        finally:
+            lock.close()
+        self.metrics['trainings'] += 1
+        self.metrics['hours_fitted'] += fitted
+        self.metrics['rows_read'] += len(rows)
+        self.metrics['last_training_seconds'] = round(time.perf_counter() - started, 3)
+        return fitted
+
+    def _read(self, state, end_hour):
+        """Counts newer than the watermarks, and each shard's next watermark
+
+        Counts in the current, incomplete hour are read again next time: the
+        watermark stops just below the first of them.
+        """
+        rows = []
+        watermarks = {}
+        state['watermarks'] = np.array(state['watermarks'], dtype=np.int64)
+        for shard_no, path in enumerate(self._paths()):
+            conn = sqlite3.connect(path, timeout=30)
+            try:
+                after = int(state['watermarks'][shard_no])
+                highest, first_pending = after, None
+                for row in conn.execute(NEW_COUNTS_SQL, {'degrees': REGION_DEGREES, 'after': after}):
+                    highest = max(highest, row[6])
+                    if row[0] >= end_hour:
+                        first_pending = row[5] if first_pending is None else min(first_pending, row[5])
+                    else:
+                        rows.append(row[:5])
+            finally:
+                conn.close()
+            watermarks[shard_no] = first_pending - 1 if first_pending is not None else highest
+        rows.sort(key=lambda row: row[0])
+        return rows, watermarks
+
+    def _fit_rows(self, state, rows, end_hour):
+        start_hour = state['trained_until']
+        if start_hour is None:
+            if not rows:
+                return 0
+            start_hour = rows[0][0]
+        rows = [row for row in rows if row[0] >= start_hour]  # Earlier hours are fitted already
+
+        # New series start at zero level and season
+        index = {(int(lat), int(lon), str(t)): n for n, (lat, lon, t) in
+                 enumerate(zip(state['lat_cells'], state['lon_cells'], state['types']))}
+        new = sorted({(lat, lon, t) for _, lat, lon, t, _ in rows if (lat, lon, t) not in index})
+        if new:
+            for key in new:
+                index[key] = len(index)
+            lat_new, lon_new, type_new = zip(*new)
+            state['lat_cells'] = np.concatenate([state['lat_cells'], np.array(lat_new, np.int64)])
+            state['lon_cells'] = np.concatenate([state['lon_cells'], np.array(lon_new, np.int64)])
+            state['types'] = np.concatenate([state['types'], np.array(type_new, dtype='<U64')])
+            state['level'] = np.concatenate([state['level'], np.zeros(len(new))])
+            state['season'] = np.concatenate([state['season'], np.zeros((SEASON_HOURS, len(new)))], axis=1)
+        else:
+            state['level'] = state['level'].copy()
+            state['season'] = state['season'].copy()
+
+        # Fit a week at a time, so memory stays at one week of counts however long the gap
+        position = 0
+        for block_start in range(start_hour, end_hour, SEASON_HOURS):
+            block_end = min(block_start + SEASON_HOURS, end_hour)
+            counts = np.zeros((block_end - block_start, len(index)))
+            while position < len(rows) and rows[position][0] < block_end:
+                hour, lat, lon, incident_type, count = rows[position]
+                counts[hour - block_start, index[lat, lon, incident_type]] += count
+                position += 1
+            fit(state['level'], state['season'], counts, block_start)
+        state['trained_until'] = max(end_hour, start_hour)
+        return max(end_hour - start_hour, 0)
+
+    # Serving
+
+    def forecast(self, horizon=HORIZON_HOURS):
+        """Expected incidents for the next horizon hours, per region and incident type
+
+        Returns:
+            Dict with the hours covered, the hourly total and the regions,
+            busiest first - each with its expected total, per type and per hour
+        """
+        with self._lock:
+            state = self._load()
+        if not state or state['trained_until'] is None:
+            return {'trained_until': None, 'horizon_hours': horizon, 'hours': [], 'total': [], 'regions': []}
+        first = state['trained_until']
+        expected = predict(state['level'], state['season'], first, horizon)
+
+        # Series -> regions: one bincount per hour over the region of each series
+        cells = (state['lat_cells'] + 1000) * 10000 + (state['lon_cells'] + 1000)
+        region_cells, region_of_series = np.unique(cells, return_inverse=True)
+        hourly = np.zeros((len(region_cells), horizon))
+        np.add.at(hourly, region_of_series, expected.T)
+        totals = hourly.sum(axis=1)
+
+        regions = []
+        for r in np.argsort(-totals, kind='stable'):
+            members = np.flatnonzero(region_of_series == r)
+            by_type = {str(state['types'][n]): round(float(expected[:, n].sum()), 3) for n in members}
+            lat_cell, lon_cell = (cell - 1000 for cell in divmod(int(region_cells[r]), 10000))
+            regions.append({
+                'region': region_of((lat_cell + 0.5) * REGION_DEGREES, (lon_cell + 0.5) * REGION_DEGREES),
+                'expected': round(float(totals[r]), 3),
+                'by_type': dict(sorted(by_type.items(), key=lambda item: -item[1])),
+                'hourly': np.round(hourly[r], 3).tolist(),
+            })
+        return {
+            'trained_until': _iso_hour(first),
+            'horizon_hours': horizon,
+            'hours': [_iso_hour(first + k) for k in range(horizon)],
+            'total': np.round(hourly.sum(axis=0), 3).tolist(),
+            'regions': regions,
+        }
+
+    def snapshot_metrics(self):
+        with self._lock:
+            state = self._load()
+        return dict(self.metrics, enabled=self.enabled, series=len(state['level']) if state else 0,
+                    trained_until=_iso_hour(state['trained_until']) if state and state['trained_until'] else None)
+
+
+def _iso_hour(hour):
+    return datetime.fromtimestamp(hour * 3600, timezone.utc).strftime('%Y-%m-%dT%H:00:00Z')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incident forecasts per region and incident type')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--rebuild', action='store_true', help='discard the model and refit the full history')
+    parser.add_argument('--top', type=int, default=10, help='regions to print')
+    parser.add_argument('--shards', type=int, default=0, help='number of incident shard files (0: not sharded)')
+    parser.add_argument('--shard-dir', default='shards')
+    args = parser.parse_args()
+    if np is None:
+        raise SystemExit('Forecasting needs numpy: pip install numpy')
+
+    router = None
+    if args.shards:
+        router = ShardRouter(args.db)
+        router.configure(args.shards, args.shard_dir)
+    forecaster = Forecaster(args.db, router)
+    started = time.perf_counter()
+    hours = forecaster.train(rebuild=args.rebuild)
+    metrics = forecaster.snapshot_metrics()
+    print(f"Fitted {hours} hours ({metrics['rows_read']} hourly counts, {metrics['series']} series) "
+          f"in {time.perf_counter() - started:.2f} s")
+    result = forecaster.forecast()
+    print(f"Next {result['horizon_hours']} h from {result['trained_until']}: "
+          f"{sum(result['total']):.1f} incidents expected")
+    for region in result['regions'][:args.top]:
+        types = ', '.join(f"{name} {count:.1f}" for name, count in list(region['by_type'].items())[:3])
+        print(f"  {region['region']}  {region['expected']:>7.2f}  ({types})")
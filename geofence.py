@@ -0,0 +1,237 @@
+"""India geofence: point-in-polygon against a shipped boundary, accelerated by a grid
+
+The boundary (data/india_boundary.geojson) is rasterized once into a grid of
+CELL_DEGREES cells, each marked:
+
+    OUTSIDE / INSIDE      - every point of the cell has the same answer
+    BOUNDARY_*            - a boundary edge passes within TOLERANCE_KM
+
+Most points resolve with one bytearray lookup. Points in a boundary cell are
+tested exactly, using only the edges that touch that cell: the answer for the
+cell centre is known from the rasterization, and every edge crossed on the
+way from the centre to the point flips it. Points outside the polygon but
+within TOLERANCE_KM of the boundary are accepted. The shipped outline is
+generalized, and GPS fixes on the coast or at a border post jitter; rejecting
+a genuine SOS report would be worse than accepting one from just over the line.
+
+contains_many() does the bounds check and grid lookup for a whole batch in
+NumPy when it is installed; only points in boundary cells are then tested
+one by one.
+"""
+import json
+import math
+import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BOUNDARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'india_boundary.geojson')
+CELL_DEGREES = 0.05
+TOLERANCE_KM = 10.0
+
+OUTSIDE = 0
+INSIDE = 1
+BOUNDARY_OUTSIDE = 2  # Boundary cell whose centre is outside
+BOUNDARY_INSIDE = 3   # Boundary cell whose centre is inside
+
+REGION_DEGREES = 1.0  # Side of the grid cells used as reporting regions
+
+KM_PER_DEGREE_LAT = 110.57
+KM_PER_DEGREE_LON = 111.32  # At the equator, scaled by cos(latitude)
+
+
+def load_rings(path=BOUNDARY_FILE):
+    """Read the outer rings of every (Multi)Polygon in a GeoJSON file as [(lon, lat)] lists"""
+    with open(path) as f:
+        data = json.load(f)
+    features = data['features'] if data.get('type') == 'FeatureCollection' else [data]
+    rings = []
+    for feature in features:
+        geometry = feature.get('geometry', feature)
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        for polygon in polygons:
+            ring = [(float(lon), float(lat)) for lon, lat in polygon[0]]
+            if ring[0] != ring[-1]:
+                ring.append(ring[0])
+            rings.append(ring)
+    return rings
+
+
+def _crosses(ax, ay, bx, by, cx, cy, dx, dy):
+    """True if segment a-b properly crosses segment c-d"""
+    d1 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    d2 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+    if (d1 > 0) == (d2 > 0):
+        return False
+    d3 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    d4 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    return (d3 > 0) != (d4 > 0)
+
+
+def _distance_km(lat, lon, edge):
+    """Approximate distance from a point to an edge (equirectangular, fine at these scales)"""
+    scale = KM_PER_DEGREE_LON * math.cos(math.radians(lat))
+    (x1, y1), (x2, y2) = edge
+    ax, ay = (x1 - lon) * scale, (y1 - lat) * KM_PER_DEGREE_LAT
+    bx, by = (x2 - lon) * scale, (y2 - lat) * KM_PER_DEGREE_LAT
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / length))
+    return math.hypot(ax + t * dx, ay + t * dy)
+
+
+class Geofence:
+    """Grid-accelerated point-in-polygon test with a distance tolerance"""
+
+    def __init__(self, rings, cell_degrees=CELL_DEGREES, tolerance_km=TOLERANCE_KM):
+        self.cell = cell_degrees
+        self.tolerance_km = tolerance_km
+        self.edges = [(ring[i], ring[i + 1]) for ring in rings for i in range(len(ring) - 1)]
+
+        # Grid covers the boundary plus the tolerance band
+        margin_lat = tolerance_km / KM_PER_DEGREE_LAT
+        max_abs_lat = max(abs(lat) for ring in rings for _, lat in ring) + margin_lat
+        margin_lon = tolerance_km / (KM_PER_DEGREE_LON * math.cos(math.radians(min(max_abs_lat, 89))))
+        self.lat0 = min(lat for ring in rings for _, lat in ring) - margin_lat - cell_degrees
+        self.lon0 = min(lon for ring in rings for lon, _ in ring) - margin_lon - cell_degrees
+        self.lat1 = max(lat for ring in rings for _, lat in ring) + margin_lat + cell_degrees
+        self.lon1 = max(lon for ring in rings for lon, _ in ring) + margin_lon + cell_degrees
+        self.rows = int(math.ceil((self.lat1 - self.lat0) / cell_degrees))
+        self.cols = int(math.ceil((self.lon1 - self.lon0) / cell_degrees))
+
+        self.grid = bytearray(self.rows * self.cols)
+        self.cell_edges = {}
+        self._fill_interior()
+        self._mark_boundary(margin_lat, margin_lon)
+        self.states = np.frombuffer(self.grid, dtype=np.uint8) if np is not None else None  # Shares grid's memory
+
+    def _fill_interior(self):
+        """Scanline fill: mark cells whose centre is inside (even-odd rule)"""
+        cell, grid, cols = self.cell, self.grid, self.cols
+        for row in range(self.rows):
+            lat = self.lat0 + (row + 0.5) * cell
+            crossings = sorted(
+                x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+                for (x1, y1), (x2, y2) in self.edges
+                if (y1 > lat) != (y2 > lat)
+            )
+            for start, end in zip(crossings[::2], crossings[1::2]):
+                first = max(0, int(math.ceil((start - self.lon0) / cell - 0.5)))
+                last = min(cols - 1, int(math.floor((end - self.lon0) / cell - 0.5)))
+                offset = row * cols
+                for col in range(first, last + 1):
+                    grid[offset + col] = INSIDE
+
+    def _mark_boundary(self, margin_lat, margin_lon):
+        """Flag every cell within the tolerance band of an edge and remember its nearby edges"""
+        cell = self.cell
+        pad_rows = int(math.ceil(margin_lat / cell)) + 1
+        pad_cols = int(math.ceil(margin_lon / cell)) + 1
+        for index, ((x1, y1), (x2, y2)) in enumerate(self.edges):
+            steps = max(1, int(math.ceil(max(abs(x2 - x1), abs(y2 - y1)) / (cell / 2))))
+            cells, visited = set(), set()
+            for step in range(steps + 1):
+                t = step / steps
+                row = int((y1 + t * (y2 - y1) - self.lat0) / cell)
+                col = int((x1 + t * (x2 - x1) - self.lon0) / cell)
+                if (row, col) in visited:
+                    continue
+                visited.add((row, col))
+                for r in range(max(0, row - pad_rows), min(self.rows, row + pad_rows + 1)):
+                    for c in range(max(0, col - pad_cols), min(self.cols, col + pad_cols + 1)):
+                        cells.add(r * self.cols + c)
+            for key in cells:
+                self.cell_edges.setdefault(key, []).append(index)
+        for key in self.cell_edges:
+            self.grid[key] = BOUNDARY_INSIDE if self.grid[key] == INSIDE else BOUNDARY_OUTSIDE
+
+    def _exact(self, key, lat, lon, state):
+        """Resolve a point in a boundary cell using only that cell's edges"""
+        row, col = divmod(key, self.cols)
+        cy = self.lat0 + (row + 0.5) * self.cell
+        cx = self.lon0 + (col + 0.5) * self.cell
+        inside = state == BOUNDARY_INSIDE
+        edges = [self.edges[i] for i in self.cell_edges[key]]
+        for (x1, y1), (x2, y2) in edges:
+            if _crosses(cx, cy, lon, lat, x1, y1, x2, y2):
+                inside = not inside
+        if inside:
+            return True
+        return any(_distance_km(lat, lon, edge) <= self.tolerance_km for edge in edges)
+
+    def contains(self, lat, lon):
+        """True if (lat, lon) is inside the boundary or within the tolerance band"""
+        if not (self.lat0 <= lat < self.lat1 and self.lon0 <= lon < self.lon1):
+            return False
+        key = int((lat - self.lat0) / self.cell) * self.cols + int((lon - self.lon0) / self.cell)
+        state = self.grid[key]
+        if state < BOUNDARY_OUTSIDE:
+            return state == INSIDE
+        return self._exact(key, lat, lon, state)
+
+    def contains_many(self, latitudes, longitudes):
+        """Batch form of contains() - returns a list of booleans"""
+        if self.states is not None:
+            return self._contains_array(np.asarray(latitudes, dtype=np.float64),
+                                        np.asarray(longitudes, dtype=np.float64))
+        lat0, lon0, lat1, lon1 = self.lat0, self.lon0, self.lat1, self.lon1
+        cell, cols, grid, exact = self.cell, self.cols, self.grid, self._exact
+        results = []
+        append = results.append
+        for lat, lon in zip(latitudes, longitudes):
+            if not (lat0 <= lat < lat1 and lon0 <= lon < lon1):
+                append(False)
+                continue
+            key = int((lat - lat0) / cell) * cols + int((lon - lon0) / cell)
+            state = grid[key]
+            append(state == INSIDE if state < BOUNDARY_OUTSIDE else exact(key, lat, lon, state))
+        return results
+
+    def _contains_array(self, lats, lons):
+        """contains_many() in NumPy: grid lookups for all points, exact tests for boundary cells only"""
+        in_box = (lats >= self.lat0) & (lats < self.lat1) & (lons >= self.lon0) & (lons < self.lon1)
+        keys = np.zeros(lats.shape, dtype=np.int64)
+        # Truncation as in contains(): both offsets are non-negative inside the box
+        keys[in_box] = (((lats[in_box] - self.lat0) / self.cell).astype(np.int64) * self.cols
+                        + ((lons[in_box] - self.lon0) / self.cell).astype(np.int64))
+        states = np.where(in_box, self.states[keys], OUTSIDE)
+        results = states == INSIDE
+        for i in np.flatnonzero(states >= BOUNDARY_OUTSIDE).tolist():
+            results[i] = self._exact(int(keys[i]), float(lats[i]), float(lons[i]), int(states[i]))
+        return results.tolist()
+
+    def stats(self):
+        """Cell counts by state - how much of the grid needs an exact test"""
+        counts = [0, 0, 0, 0]
+        for state in self.grid:
+            counts[state] += 1
+        return {'rows': self.rows, 'cols': self.cols, 'outside': counts[OUTSIDE], 'inside': counts[INSIDE],
+                'boundary': counts[BOUNDARY_OUTSIDE] + counts[BOUNDARY_INSIDE], 'edges': len(self.edges)}
+
+
+def region_of(lat, lon, degrees=REGION_DEGREES):
+    """Reporting region of a point: the grid cell it falls in, labelled by its south-west corner
+
+    No state or district boundaries ship with the app, so regions are fixed
+    cells ('19N072E' covers 19-20N, 72-73E at the default 1 degree).
+    """
+    south = math.floor(lat / degrees) * degrees
+    west = math.floor(lon / degrees) * degrees
+    return f"{abs(south):02.0f}{'N' if south >= 0 else 'S'}{abs(west):03.0f}{'E' if west >= 0 else 'W'}"
+
+
+_india = None
+_india_lock = threading.Lock()
+
+
+def india():
+    """The India geofence, built from BOUNDARY_FILE on first use"""
+    global _india
+    if _india is None:
+        with _india_lock:
+            if _india is None:
+                _india = Geofence(load_rings())
+    return _india
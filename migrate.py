@@ -0,0 +1,234 @@
+"""Versioned schema migrations for Surakshita
+
+Migrations live in migrations/NNNN_description.py and are applied in order.
+Each file defines:
+
+    upgrade(cursor)  - schema changes, run in one IMMEDIATE transaction
+    backfill(conn)   - optional data backfill, run afterwards in small batches
+
+upgrade() must be idempotent (use add_column() / IF NOT EXISTS) and backfill()
+must only touch rows that still need it, so a migration interrupted halfway -
+or run by two workers at once - is simply finished by the next run.
+
+Applied versions are recorded in the schema_version table and mirrored in
+PRAGMA user_version, which lives in the database header: checking that the
+schema is current is a single header read, with no table scans and no locks.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied and pending migrations
+    python migrate.py --dry-run  # time pending migrations on a throwaway copy
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def load_migrations():
+    """Return [(version, name, module)] for every migration file, in order"""
+    migrations = []
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, '[0-9][0-9][0-9][0-9]_*.py'))):
+        filename = os.path.basename(path)[:-3]
+        version = int(filename[:4])
+        spec = importlib.util.spec_from_file_location(f'surakshita_migration_{filename}', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((version, filename[5:], module))
+    return migrations
+
+
+def latest_version():
+    """Highest migration number shipped with the code"""
+    files = glob.glob(os.path.join(MIGRATIONS_DIR, '[0-9][0-9][0-9][0-9]_*.py'))
+    return max((int(os.path.basename(path)[:4]) for path in files), default=0)
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def is_current(db_path='surakshita.db'):
+    """Fast startup check: True when the database needs no migrations"""
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        return current_version(conn) >= latest_version()
+    finally:
+        conn.close()
+
+
+# Helpers for migration files
+def column_exists(cursor, table, column):
+    return any(row[1] == column for row in cursor.execute(f'PRAGMA table_info({table})'))
+
+
+def add_column(cursor, table, column, declaration):
+    """ALTER TABLE ... ADD COLUMN, skipped when the column already exists"""
+    if not column_exists(cursor, table, column):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+
+
+# Engine
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL
+        )
+    ''')
+    conn.commit()
+
+
+def _applied_versions(conn):
+    return {row[0] for row in conn.execute('SELECT version FROM schema_version')}
+
+
+def _apply(conn, version, name, module):
+    """Run one migration and record it; returns the elapsed seconds"""
+    started = time.perf_counter()
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        module.upgrade(conn.cursor())
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+    if hasattr(module, 'backfill'):
+        module.backfill(conn)
+
+    elapsed = time.perf_counter() - started
+    conn.execute('INSERT OR IGNORE INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)',
+                 (version, name, elapsed * 1000))
+    conn.commit()
+    return elapsed
+
+
+def migrate(db_path='surakshita.db', verbose=True):
+    """Apply all pending migrations; returns the list of versions applied"""
+    if is_current(db_path):
+        return []
+
+    conn = sqlite3.connect(db_path)
+    applied_now = []
+    try:
+        _ensure_version_table(conn)
+        applied = _applied_versions(conn)
+        for version, name, module in load_migrations():
+            if version in applied:
+                continue
+            elapsed = _apply(conn, version, name, module)
+            applied_now.append(version)
+            if verbose:
+                print(f"Applied migration {version:04d}_{name} in {elapsed * 1000:.1f} ms")
+
+        # Mirror the schema level in the header for the fast startup check
+        conn.execute(f'PRAGMA user_version = {max(_applied_versions(conn), default=0)}')
+        conn.commit()
+    finally:
+        conn.close()
+    return applied_now
+
+
+def ensure_schema(db_path='surakshita.db', timeout=600):
+    """Make sure the schema is current before a worker starts serving
+
+    The common case is the single header read in is_current(). Otherwise the
+    workers serialize on an exclusive lock on a small side database: the first
+    one migrates, the rest find the schema current once they get the lock.
+
+    Returns:
+        List of versions applied by this process
+    """
+    if is_current(db_path):
+        return []
+
+    lock = sqlite3.connect(f'{db_path}-migrate.lock', timeout=timeout, isolation_level=None)
+    try:
+        lock.execute('BEGIN EXCLUSIVE')
+        try:
+            return migrate(db_path)
+        finally:
+            lock.execute('ROLLBACK')
+    finally:
+        lock.close()
+
+
+def status(db_path='surakshita.db'):
+    """Return [(version, name, applied)] for every known migration"""
+    conn = sqlite3.connect(db_path)
+    try:
+        _ensure_version_table(conn)
+        applied = _applied_versions(conn)
+    finally:
+        conn.close()
+    return [(version, name, version in applied) for version, name, _ in load_migrations()]
+
+
+def dry_run(db_path='surakshita.db'):
+    """Time pending migrations against a throwaway copy of the database
+
+    The copy is taken with SQLite's online backup API, so the live database
+    keeps serving while it is made.
+
+    Returns:
+        (copy_seconds, [(version, name, seconds)])
+    """
+    workdir = tempfile.mkdtemp(prefix='surakshita-migrate-')
+    copy_path = os.path.join(workdir, 'dry_run.db')
+    try:
+        started = time.perf_counter()
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(copy_path)
+        source.backup(target, pages=1024)
+        source.close()
+        target.close()
+        copy_seconds = time.perf_counter() - started
+
+        conn = sqlite3.connect(copy_path)
+        timings = []
+        try:
+            _ensure_version_table(conn)
+            applied = _applied_versions(conn)
+            for version, name, module in load_migrations():
+                if version not in applied:
+                    timings.append((version, name, _apply(conn, version, name, module)))
+        finally:
+            conn.close()
+        return copy_seconds, timings
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Surakshita schema migrations')
+    parser.add_argument('--db', default='surakshita.db')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    group.add_argument('--dry-run', action='store_true', help='time pending migrations on a copy')
+    args = parser.parse_args()
+
+    if args.status:
+        for version, name, applied in status(args.db):
+            print(f"{'applied' if applied else 'pending':<8} {version:04d}_{name}")
+    elif args.dry_run:
+        copy_seconds, timings = dry_run(args.db)
+        print(f"Copied database in {copy_seconds:.2f} s")
+        for version, name, seconds in timings:
+            print(f"{version:04d}_{name}: ~{seconds * 1000:.1f} ms")
+        if not timings:
+            print("Schema is current - nothing to apply")
+    else:
+        applied = migrate(args.db)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is current")
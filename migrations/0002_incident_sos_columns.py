@@ -0,0 +1,9 @@
+"""SOS priority, required help and dispatched unit columns on incidents"""
+from migrate import add_column
+
+
+def upgrade(cursor):
+    add_column(cursor, 'incidents', 'priority', "TEXT DEFAULT 'Normal'")
+    add_column(cursor, 'incidents', 'is_sos', 'BOOLEAN DEFAULT 0')
+    add_column(cursor, 'incidents', 'required_help', 'TEXT')
+    add_column(cursor, 'incidents', 'dispatched_unit', 'TEXT')
@@ -0,0 +1,6 @@
+"""Admin role flag on users (previously added by database_upgrade.py)"""
+from migrate import add_column
+
+
+def upgrade(cursor):
+    add_column(cursor, 'users', 'is_admin', 'BOOLEAN DEFAULT 0')
@@ -0,0 +1,38 @@
+"""Archive table for long-resolved incidents, the incidents_all view and supporting indexes"""
+
+# Column list shared by both tables and the union view
+INCIDENT_COLUMNS = (
+    'id, user_id, incident_type, description, latitude, longitude, status, priority, '
+    'is_sos, required_help, dispatched_unit, created_at, updated_at'
+)
+
+
+def upgrade(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS incidents_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            incident_type TEXT NOT NULL,
+            description TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            status TEXT,
+            priority TEXT,
+            is_sos BOOLEAN,
+            required_help TEXT,
+            dispatched_unit TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE VIEW IF NOT EXISTS incidents_all AS
+        SELECT {INCIDENT_COLUMNS} FROM incidents
+        UNION ALL
+        SELECT {INCIDENT_COLUMNS} FROM incidents_archive
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_incidents_user ON incidents (user_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_incidents_status_updated ON incidents (status, updated_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_user ON incidents_archive (user_id, created_at)')
@@ -0,0 +1,13 @@
+"""Client idempotency keys for bulk-ingested incidents (see bulk.py)"""
+
+
+def upgrade(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS incident_idempotency (
+            user_id INTEGER NOT NULL,
+            idempotency_key TEXT NOT NULL,
+            incident_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, idempotency_key)
+        ) WITHOUT ROWID
+    ''')
@@ -0,0 +1,67 @@
+"""Status transition log for incidents and the SLA aggregator's state (see sla.py)
+
+A trigger records every status change, whichever code path makes it. Incidents
+that were already dispatched or resolved get one reconstructed transition at
+their updated_at (from_status NULL), the only evidence there is for them.
+"""
+import time
+
+
+def upgrade(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS incident_transitions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            incident_id INTEGER NOT NULL,
+            from_status TEXT,
+            to_status TEXT NOT NULL,
+            unit TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transitions_incident ON incident_transitions (incident_id, id)')
+    # Legacy dispatches carry the unit in the status ('Dispatched: Police Patrol')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS incidents_status_transition
+        AFTER UPDATE OF status ON incidents
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            INSERT INTO incident_transitions (incident_id, from_status, to_status, unit)
+            VALUES (NEW.id, OLD.status, NEW.status,
+                    CASE WHEN NEW.status GLOB 'Dispatched: *' THEN substr(NEW.status, 13) ELSE NEW.dispatched_unit END);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sla_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            watermark INTEGER NOT NULL,
+            sketches TEXT NOT NULL,
+            report TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def backfill(conn, batch_size=1000, pause=0.01):
+    for table in ('incidents', 'incidents_archive'):
+        last_id = 0
+        while True:
+            ids = [row[0] for row in conn.execute(f'''
+                SELECT id FROM {table}
+                WHERE id > ? AND (status GLOB 'Dispatched*' OR status = 'Resolved')
+                ORDER BY id LIMIT ?
+            ''', (last_id, batch_size))]
+            if not ids:
+                break
+            conn.execute(f'''
+                INSERT INTO incident_transitions (incident_id, from_status, to_status, unit, created_at)
+                SELECT i.id, NULL, i.status,
+                       CASE WHEN i.status GLOB 'Dispatched: *' THEN substr(i.status, 13) ELSE i.dispatched_unit END,
+                       COALESCE(i.updated_at, i.created_at)
+                FROM {table} i
+                WHERE i.id BETWEEN ? AND ?
+                AND (i.status GLOB 'Dispatched*' OR i.status = 'Resolved')
+                AND NOT EXISTS (SELECT 1 FROM incident_transitions t WHERE t.incident_id = i.id)
+            ''', (ids[0], ids[-1]))
+            conn.commit()
+            last_id = ids[-1]
+            time.sleep(pause)
@@ -0,0 +1,37 @@
+"""User geofence subscriptions, their R*Tree index and the notifications they produce (see subscriptions.py)"""
+
+
+def upgrade(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS geofence_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('circle', 'polygon')),
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            radius_m REAL,
+            polygon TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON geofence_subscriptions (user_id)')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS geofence_subscriptions_rtree
+        USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            incident_id INTEGER NOT NULL,
+            subscription_id INTEGER,
+            incident_type TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (user_id, id)')
@@ -0,0 +1,6 @@
+"""Indexes on updated_at for incremental exports of changed incidents (see export.py)"""
+
+
+def upgrade(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_incidents_updated ON incidents (updated_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_updated ON incidents_archive (updated_at)')
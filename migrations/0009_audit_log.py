@@ -0,0 +1,30 @@
+"""Append-only, hash-chained audit log of admin and dispatch actions (see audit.py)"""
+
+
+def upgrade(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            actor TEXT NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT,
+            details TEXT,
+            ip TEXT,
+            prev_hash TEXT NOT NULL,
+            hash TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log (action, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_actor ON audit_log (actor, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_target ON audit_log (target, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_created ON audit_log (created_at)')
+    # Rows can be added, never changed or removed (short of rebuilding the table)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON audit_log
+        BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON audit_log
+        BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END
+    ''')
@@ -0,0 +1,25 @@
+"""Incident id ranges and region placement for sharded storage (see shards.py)
+
+Every database gets both tables, but each is only used in one place:
+shard_ids holds a shard file's number and the last incident id it handed
+out (one row), and shard_regions, in the primary, pins regions to shards
+in place of the default hash placement.
+"""
+
+
+def upgrade(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shard_ids (
+            shard_no INTEGER PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shard_regions (
+            region TEXT PRIMARY KEY,
+            shard_no INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Moving a region's incidents between shards finds their idempotency keys by incident
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_incident ON incident_idempotency (incident_id)')
@@ -0,0 +1,14 @@
+"""SLA aggregation over shard files (see sla.py and shards.py)
+
+sla_state.watermarks holds the last transition folded in per shard file, as
+JSON ({"0": id, "1": id, ...}), and watermark their sum - the primary's
+alone without shards. incident_transitions.counted marks a transition copied
+from another shard by a region move whose SLA sketch already includes it,
+so the shard it moved to does not count it again.
+"""
+from migrate import add_column
+
+
+def upgrade(cursor):
+    add_column(cursor, 'sla_state', 'watermarks', 'TEXT')
+    add_column(cursor, 'incident_transitions', 'counted', 'BOOLEAN DEFAULT 0')
@@ -0,0 +1,296 @@
+"""On-demand sampling profiler for slow pages, with collapsed-stack output
+
+An admin starts a profiling session for one endpoint (or all of them) and a
+percentage of its requests:
+
+    POST /api/admin/profiler  {"endpoint": "admin_dashboard", "percent": 20,
+                               "seconds": 300, "interval_ms": 5, "max_requests": 200}
+
+The session is written to PROFILER_DIR/control.json, which every worker
+checks at most once per PROFILER_CHECK_SECONDS, so all workers take part.
+While a worker has a session, a sampler thread wakes every interval_ms,
+reads the stacks of the request threads chosen for profiling from
+sys._current_frames() and counts them per request. Nothing is traced, so a
+profiled request runs at full speed apart from the sampler's share of the
+GIL; without a session the only cost is a clock read in a before_request
+hook. The sampler needs the GIL too, so while a request keeps the CPU busy
+samples come every interval_ms or every switch interval
+(sys.getswitchinterval(), 5 ms by default), whichever is longer: a short
+request gets a few samples, and the session's summed profile is the one to
+read.
+
+Each profiled request is written by the sampler thread to
+PROFILER_DIR/<session>/<endpoint>-<duration>ms-<pid>-<n>.folded in the
+collapsed-stack format ("outer;inner;leaf count" per line) that
+flamegraph.pl, speedscope and inferno read. GET /api/admin/profiler/<session>
+sums them into one flame graph for the session.
+
+    python profiler.py profiles/20261019-101500 > dashboard.folded
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import request
+
+MAX_SECONDS = 3600
+MAX_REQUESTS = 1000
+MIN_INTERVAL_MS = 1
+MAX_STACK_DEPTH = 200
+
+
+def validate_session(data):
+    """Return (session fields, error) for a POST /api/admin/profiler body"""
+    if not isinstance(data, dict):
+        return None, "Expected a JSON object"
+    endpoint = data.get('endpoint')
+    if endpoint is not None and (not isinstance(endpoint, str) or not endpoint or len(endpoint) > 200):
+        return None, "endpoint must be an endpoint name or a path"
+    try:
+        percent = float(data.get('percent', 10))
+        seconds = int(data.get('seconds', 300))
+        interval_ms = float(data.get('interval_ms', 5))
+        max_requests = int(data.get('max_requests', 200))
+    except (TypeError, ValueError):
+        return None, "percent, seconds, interval_ms and max_requests must be numbers"
+    if not 0 < percent <= 100:
+        return None, "percent must be above 0 and at most 100"
+    if not 0 < seconds <= MAX_SECONDS:
+        return None, f"seconds must be 1-{MAX_SECONDS}"
+    if interval_ms < MIN_INTERVAL_MS:
+        return None, f"interval_ms must be at least {MIN_INTERVAL_MS}"
+    if not 0 < max_requests <= MAX_REQUESTS:
+        return None, f"max_requests must be 1-{MAX_REQUESTS}"
+    return {'endpoint': endpoint, 'percent': percent, 'seconds': seconds,
+            'interval_ms': interval_ms, 'max_requests': max_requests}, None
+
+
+def fold(frame, labels):
+    """Collapsed stack of a frame, outermost call first; labels caches one label per code object"""
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        label = labels.get(code)
+        if label is None:
+            label = labels[code] = f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+        parts.append(label)
+        frame = frame.f_back
+    parts.reverse()
+    return ';'.join(parts)
+
+
+def merge(directory, endpoint=None):
+    """Sum the .folded files of a session directory into one Counter of stacks"""
+    stacks = Counter()
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.folded') or (endpoint and not name.startswith(f'{endpoint}-')):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    stacks[stack] += int(count)
+    return stacks
+
+
+def format_folded(stacks):
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class Profiler:
+    """Flask extension that samples the stacks of a chosen share of requests
+
+    Args:
+        directory: Where control.json and the session directories live
+    """
+
+    def __init__(self, directory='profiles'):
+        self.directory = directory
+        self.enabled = False
+        self.check_seconds = 1.0
+        self._session = None
+        self._control_mtime = None
+        self._next_check = 0.0
+        self._active = {}    # thread id -> (session id, endpoint, started, Counter of stacks)
+        self._finished = []  # (session id, endpoint, seconds, stacks) for the sampler to write
+        self._profiled = 0
+        self._wakeup = threading.Event()
+        self._sampler = None
+        self._lock = threading.Lock()
+        self.metrics = {'requests_profiled': 0, 'samples': 0, 'files_written': 0, 'sampling_seconds': 0.0}
+
+    def init_app(self, app):
+        if not app.config.get('PROFILER_ENABLED', True):
+            return
+        self.directory = app.config.get('PROFILER_DIR', self.directory)
+        self.check_seconds = app.config.get('PROFILER_CHECK_SECONDS', 1.0)
+        self.enabled = True
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+
+    @property
+    def control_path(self):
+        return os.path.join(self.directory, 'control.json')
+
+    # Session control (any worker; the others pick it up from control.json)
+
+    def start_session(self, fields):
+        """Write a new session to control.json; returns it"""
+        now = time.time()
+        session = dict(fields, id=datetime.now().strftime('%Y%m%d-%H%M%S'), started=now,
+                       until=now + fields['seconds'])
+        os.makedirs(os.path.join(self.directory, session['id']), exist_ok=True)
+        self._write_control(session)
+        return session
+
+    def stop_session(self):
+        """End the current session in every worker; returns whether there was one"""
+        session = self.current_session()
+        if session is None:
+            return False
+        self._write_control(dict(session, until=time.time()))
+        return True
+
+    def current_session(self):
+        """The session in control.json while it runs, else None"""
+        try:
+            with open(self.control_path) as f:
+                session = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return session if session.get('until', 0) > time.time() else None
+
+    def _write_control(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f'{self.control_path}.tmp', 'w') as f:
+            json.dump(session, f)
+        os.replace(f'{self.control_path}.tmp', self.control_path)
+        self._next_check = 0.0  # This worker switches at once
+
+    def _refresh(self, now):
+        """Reload control.json if it changed; start or stop this worker's session"""
+        self._next_check = now + self.check_seconds
+        try:
+            mtime = os.stat(self.control_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._control_mtime:
+            self._control_mtime = mtime
+            session = self.current_session() if mtime is not None else None
+            if session is None or session['id'] != (self._session or {}).get('id'):
+                self._profiled = 0
+            self._session = session
+            if session is not None:
+                self._wakeup.set()
+                with self._lock:
+                    if self._sampler is None or not self._sampler.is_alive():
+                        self._sampler = threading.Thread(target=self._run, name='surakshita-profiler', daemon=True)
+                        self._sampler.start()
+        elif self._session is not None and self._session['until'] <= time.time():
+            self._session = None
+
+    # Request hooks
+
+    def _start(self):
+        """before_request: pick this request for profiling per the session's endpoint and percentage"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._refresh(now)
+        session = self._session
+        if session is None:
+            return
+        endpoint = (request.endpoint or 'unknown').rpartition('.')[2]
+        if session['endpoint'] and session['endpoint'] not in (endpoint, request.path):
+            return
+        if self._profiled >= session['max_requests'] or random.random() * 100 >= session['percent']:
+            return
+        self._profiled += 1
+        self._active[threading.get_ident()] = (session['id'], endpoint, time.perf_counter(), Counter())
+
+    def _stop(self, exc=None):
+        """teardown_request: hand a profiled request's stacks to the sampler thread to write"""
+        entry = self._active.pop(threading.get_ident(), None)
+        if entry is None:
+            return
+        session_id, endpoint, started, stacks = entry
+        self._finished.append((session_id, endpoint, time.perf_counter() - started, stacks))
+        self.metrics['requests_profiled'] += 1
+        self._wakeup.set()  # The sampler may be idle if the session just ended
+
+    # Sampler thread
+
+    def _run(self):
+        labels = {}
+        written = 0
+        while True:
+            session = self._session
+            if session is None and not self._active and not self._finished:
+                self._wakeup.clear()
+                self._wakeup.wait()
+                continue
+            time.sleep(session['interval_ms'] / 1000 if session else 0.01)
+
+            started = time.thread_time()  # CPU time: waits for the GIL are not the sampler's cost
+            if self._active:
+                # Frames are dropped straight away: one kept past a request would keep its
+                # locals alive, and they would be finalized on this thread instead of theirs
+                frames = sys._current_frames()
+                for thread_id, entry in list(self._active.items()):
+                    if thread_id in frames:
+                        entry[3][fold(frames[thread_id], labels)] += 1
+                        self.metrics['samples'] += 1
+                del frames
+            while self._finished:
+                session_id, endpoint, seconds, stacks = self._finished.pop(0)
+                if stacks:  # Requests shorter than the interval may have no samples
+                    written += 1
+                    self._write_profile(session_id, endpoint, seconds, stacks, written)
+            self.metrics['sampling_seconds'] += time.thread_time() - started
+
+    def _write_profile(self, session_id, endpoint, seconds, stacks, number):
+        directory = os.path.join(self.directory, session_id)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{endpoint}-{seconds * 1000:.0f}ms-{os.getpid()}-{number:04d}.folded')
+            with open(path, 'w') as f:
+                f.write(format_folded(stacks))
+            self.metrics['files_written'] += 1
+        except OSError as e:
+            print(f"[PROFILER] Could not write a profile: {e}")
+
+    # Reading profiles
+
+    def sessions(self):
+        """Session directories, newest first, with their profile counts"""
+        try:
+            names = sorted((name for name in os.listdir(self.directory)
+                            if os.path.isdir(os.path.join(self.directory, name))), reverse=True)
+        except FileNotFoundError:
+            return []
+        return [{'id': name, 'profiles': sum(1 for file in os.listdir(os.path.join(self.directory, name))
+                                             if file.endswith('.folded'))} for name in names]
+
+    def session_stacks(self, session_id, endpoint=None):
+        """Summed collapsed stacks of a session, or None if there is no such session"""
+        directory = os.path.join(self.directory, session_id)
+        if not session_id.replace('-', '').isdigit() or not os.path.isdir(directory):
+            return None
+        return merge(directory, endpoint)
+
+    def snapshot_metrics(self):
+        return dict(self.metrics, enabled=self.enabled, session=self._session,
+                    sampling_seconds=round(self.metrics['sampling_seconds'], 3))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merge the profiles of a session into one collapsed-stack file')
+    parser.add_argument('session_dir', help='e.g. profiles/20261019-101500')
+    parser.add_argument('--endpoint', help='only requests to this endpoint')
+    args = parser.parse_args()
+    sys.stdout.write(format_folded(merge(args.session_dir, args.endpoint)))
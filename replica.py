@@ -0,0 +1,217 @@
+"""Read-only analytics replica of surakshita.db
+
+A copy of the database (surakshita.db-replica) is refreshed from the primary
+every REPLICA_REFRESH_SECONDS with the online backup API (backup.copy_database),
+which in WAL mode never blocks writers. Dashboards, listings and admin
+aggregates read the copy, so their long scans never compete with SOS inserts
+for the primary; writes and must-be-fresh reads (alert polling, dispatch)
+always go to the primary.
+
+Each copy records the data version stamps (see versions.py) taken just before
+it was made. That decides routing and keeps ETags honest:
+
+    per-user reads   replica only if the user's stamp is unchanged since the
+                     copy - users always see their own writes
+    global reads     replica while its lag is under REPLICA_MAX_LAG_SECONDS,
+                     tagged with the replica's stamp, not the primary's
+
+Lag is 0 while no write has happened since the copy, otherwise the time since
+the copy was started. It is served to admins at /api/admin/metrics/replica.
+
+With sharded incidents (see shards.py) every shard file is copied too, next
+to itself (shards/surakshita-shard-01.db-replica, ...), and replica
+connections fan out over the copies as ShardRouter.connect_all() does over
+the live files. Shard copies are renamed into place before the primary's,
+which holds the stamps, so a reader never sees data older than its stamp.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from backup import copy_database
+from shards import fan_out
+
+
+class Replica:
+    """Periodically refreshed read-only copy of the database, with read routing
+
+    Args:
+        db_path: Primary database file
+        stamps: VersionStamps bumped by every write to the primary
+        router: ShardRouter, when incidents may be spread over shard files
+    """
+
+    def __init__(self, db_path, stamps, router=None):
+        self.db_path = db_path
+        self.path = f'{db_path}-replica'
+        self.stamps = stamps
+        self.router = router
+        self.enabled = False
+        self.refresh_seconds = 0
+        self.max_lag = 120
+        self._meta_key = None
+        self._meta = None
+        self._meta_lock = threading.Lock()
+        self.metrics = {'refreshes': 0, 'skipped': 0, 'failures': 0, 'last_refresh': None,
+                        'reads': {'replica': 0, 'primary': 0}}
+
+    def init_app(self, app):
+        self.refresh_seconds = app.config.get('REPLICA_REFRESH_SECONDS', 30)
+        self.max_lag = app.config.get('REPLICA_MAX_LAG_SECONDS', 120)
+        self.enabled = self.refresh_seconds > 0
+        if self.enabled:
+            threading.Thread(target=self._run, name='surakshita-replica', daemon=True).start()
+
+    @property
+    def shard_paths(self):
+        """Live shard files copied alongside the primary (none without sharding)"""
+        return self.router.paths[1:] if self.router is not None and self.router.enabled else []
+
+    # Refreshing
+    def refresh(self):
+        """Copy the primary (and every shard file) to the replica and return the copy stats
+
+        Each copy is written next to its replica and renamed over it, so open
+        replica connections keep reading the previous copy.
+        """
+        refreshed_at = time.time()
+        stamps = self.stamps.dump()  # Before copying: a racing write only makes the copy look older
+        stats = {'seconds': 0.0, 'bytes': 0, 'restarts': 0}
+        for path in self.shard_paths:
+            self._copy(path, f'{path}-replica', stats)
+        partial = f'{self.path}.partial-{os.getpid()}'
+        try:
+            self._add_stats(stats, copy_database(self.db_path, partial))
+            conn = sqlite3.connect(partial)
+            try:
+                conn.execute('CREATE TABLE replica_meta (refreshed_at REAL, copy_seconds REAL, stamps BLOB, shards INTEGER)')
+                conn.execute('INSERT INTO replica_meta VALUES (?, ?, ?, ?)',
+                             (refreshed_at, stats['seconds'], stamps, len(self.shard_paths)))
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(partial, self.path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        self.metrics['refreshes'] += 1
+        self.metrics['last_refresh'] = {'seconds': round(stats['seconds'], 3), 'bytes': stats['bytes'],
+                                        'restarts': stats['restarts']}
+        return stats
+
+    @classmethod
+    def _copy(cls, source, target, stats):
+        partial = f'{target}.partial-{os.getpid()}'
+        try:
+            cls._add_stats(stats, copy_database(source, partial))
+            os.replace(partial, target)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    @staticmethod
+    def _add_stats(stats, copied):
+        for key in ('seconds', 'bytes', 'restarts'):
+            stats[key] += copied[key]
+
+    def _run(self):
+        while True:
+            meta = self._read_meta()
+            if meta is not None and (
+                self.stamps.stamp_in(meta[2]) == self.stamps.current()
+                or time.time() - meta[0] < self.refresh_seconds * 0.9  # Another worker just refreshed it
+            ):
+                self.metrics['skipped'] += 1
+            else:
+                try:
+                    self.refresh()
+                except (sqlite3.Error, OSError) as e:
+                    self.metrics['failures'] += 1
+                    print(f"[REPLICA] Refresh failed: {e}")
+            time.sleep(self.refresh_seconds)
+
+    def _read_meta(self):
+        """(refreshed_at, copy_seconds, stamps, shard files copied) of the current copy, or None if there is none"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        key = (st.st_ino, st.st_mtime_ns)
+        if key != self._meta_key:
+            with self._meta_lock:
+                if key != self._meta_key:
+                    conn = self._connect_raw()
+                    try:
+                        self._meta = conn.execute(
+                            'SELECT refreshed_at, copy_seconds, stamps, shards FROM replica_meta').fetchone()
+                    except sqlite3.Error:
+                        self._meta = None
+                    finally:
+                        conn.close()
+                    self._meta_key = key
+        return self._meta
+
+    # Routing
+    def serving_stamp(self, user_id=None):
+        """Stamp of the data a read would see on the replica, or None if it must go to the primary
+
+        Pass user_id for reads of one user's incidents, None for global aggregates.
+        """
+        meta = self._read_meta() if self.enabled else None
+        stamp = None
+        if meta is not None and meta[3] == len(self.shard_paths):  # Not a copy from before sharding
+            copied = self.stamps.stamp_in(meta[2], user_id)
+            if user_id is not None:
+                stamp = copied if copied == self.stamps.current(user_id) else None
+            elif copied == self.stamps.current() or time.time() - meta[0] <= self.max_lag:
+                stamp = copied
+        return stamp
+
+    def count_read(self, stamp):
+        """Record where a routed read went (stamp from serving_stamp())"""
+        self.metrics['reads']['primary' if stamp is None else 'replica'] += 1
+
+    @staticmethod
+    def _uri(path):
+        # immutable: the file is only ever replaced, never written in place, so no locking is needed
+        return f'file:{path}?mode=ro&immutable=1'
+
+    def _connect_raw(self):
+        return sqlite3.connect(self._uri(self.path), uri=True)
+
+    def connect(self):
+        """Read-only connection to the current copy, spanning the shard copies when sharded"""
+        conn = self._connect_raw()
+        conn.row_factory = sqlite3.Row
+        shard_paths = self.shard_paths
+        if shard_paths:
+            fan_out(conn, [self._uri(f'{path}-replica') for path in shard_paths])
+        return conn
+
+    def lag(self):
+        """Seconds of writes the replica may be missing (0 if it is current), or None if there is no copy"""
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        if self.stamps.stamp_in(meta[2]) == self.stamps.current():
+            return 0.0
+        return time.time() - meta[0]
+
+    def snapshot_metrics(self):
+        """Lag, refresh and routing figures as a JSON-serializable dict (per worker process)"""
+        meta = self._read_meta()
+        lag = self.lag()
+        return {
+            'enabled': self.enabled,
+            'lag_seconds': None if lag is None else round(lag, 3),
+            'max_lag_seconds': self.max_lag,
+            'refreshed_at': None if meta is None else datetime.fromtimestamp(meta[0], timezone.utc).isoformat(),
+            'refresh_interval_seconds': self.refresh_seconds,
+            'refreshes': self.metrics['refreshes'],
+            'skipped_refreshes': self.metrics['skipped'],
+            'refresh_failures': self.metrics['failures'],
+            'last_refresh': self.metrics['last_refresh'],
+            'reads': dict(self.metrics['reads']),
+        }
@@ -0,0 +1,415 @@
+"""Route safety scores from a time-decayed incident risk grid
+
+India is covered by a grid of RISK_CELL_DEGREES cells (0.01 degrees, about
+1.1 km, by default). Each cell holds the incidents reported in it, weighted
+by type (TYPE_WEIGHTS) and decayed with a half-life of RISK_HALF_LIFE_DAYS,
+so a recent assault counts for more than an old theft report.
+
+Decay costs nothing per update: each incident is added as
+weight * 2 ** ((created_at - epoch) / half_life) and readers multiply by
+2 ** ((epoch - now) / half_life), so the stored cells never need rewriting
+as time passes. The epoch is moved forward (one pass over the grid) only
+when those factors would grow too large for float32 - about once a decade.
+
+The grid lives in a memory-mapped file next to the database
+(surakshita.db-risk): every worker process maps the same pages, and a
+restart maps the file instead of replaying the history. A header in the
+file holds the layout, the epoch and, per shard file (just the database
+when incidents are not sharded, see shards.py), the id of the last incident
+folded in (the watermark). Whenever the data version stamp changes, a
+worker thread folds in incidents newer than the watermarks under an
+exclusive lock on a side file (surakshita.db-risk.lock), so concurrent
+workers never add an incident twice and SOS inserts never wait for the
+grid. Scores are read without any lock. Deleting an incident subtracts its
+weight again (remove()).
+
+score_route() rasterizes a polyline over the grid: each segment is sampled
+every half cell and the cells it passes through are summed, all in NumPy -
+a few milliseconds even for routes thousands of points long.
+
+Needs numpy (pip install numpy); without it route scoring is switched off.
+Rebuild the grid from the full history, e.g. after changing the cell size
+or half-life, with:
+    python risk.py --rebuild
+"""
+import argparse
+import logging
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+from geofence import KM_PER_DEGREE_LAT, KM_PER_DEGREE_LON
+from shards import ID_STRIDE, ShardRouter, shard_of
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Grid bounds: the India boundary plus a margin, fixed so the file layout only depends on the cell size
+LAT_MIN, LAT_MAX = 6.0, 37.5
+LON_MIN, LON_MAX = 68.0, 97.5
+
+RISK_CELL_DEGREES = 0.01
+RISK_HALF_LIFE_DAYS = 60
+RISK_BATCH_ROWS = 20000
+MAX_ROUTE_POINTS = 5000
+MAX_ROUTE_SAMPLES = 500000  # Half-cell samples per route - bounds score_route()'s memory (tens of MB)
+REBASE_HALF_LIVES = 64  # 2 ** 64 is far below float32's limit of 2 ** 128
+HOTSPOTS = 3
+
+TYPE_WEIGHTS = {
+    'SOS Emergency': 3.0, 'Assault': 3.0, 'Emergency': 3.0,
+    'Harassment': 2.0, 'Stalking': 2.0, 'Threat': 2.0,
+}
+DEFAULT_WEIGHT = 1.0
+
+MAGIC = b'SKRISK02'
+WATERMARKS = ID_STRIDE  # One per shard number an incident id can carry
+# magic, rows, cols, cell degrees, half-life seconds, epoch (unix seconds), watermarks (incident ids)
+_HEADER = struct.Struct(f'<8sIIddd{WATERMARKS}q')
+HEADER_BYTES = 4096  # The grid starts on its own page
+
+logger = logging.getLogger(__name__)
+
+# Columns of an incident as the grid reads them - also returned by the delete route's DELETE
+RISK_COLUMNS = "id, latitude, longitude, incident_type, CAST(strftime('%s', created_at) AS REAL)"
+
+NEW_INCIDENTS_SQL = '''
+    SELECT ''' + RISK_COLUMNS + '''
+    FROM incidents_all
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+'''
+
+
+class RiskGrid:
+    """Memory-mapped, time-decayed incident risk per grid cell, shared by all workers
+
+    Args:
+        db_path: Database whose incidents are folded in
+        stamps: VersionStamps bumped by every incident write
+        router: ShardRouter, when incidents may be spread over shard files
+    """
+
+    def __init__(self, db_path, stamps, cell_degrees=RISK_CELL_DEGREES, half_life_days=RISK_HALF_LIFE_DAYS,
+                 router=None):
+        self.db_path = db_path
+        self.path = f'{db_path}-risk'
+        self.lock_path = f'{self.path}.lock'
+        self.stamps = stamps
+        self.router = router
+        self.enabled = False
+        self._configure(cell_degrees, half_life_days)
+        self._mapped = None
+        self._grid = None
+        self._open_lock = threading.Lock()
+        self.metrics = {'folded': 0, 'removed': 0, 'catch_ups': 0, 'rebases': 0, 'failures': 0, 'routes': 0}
+
+    def init_app(self, app):
+        if not app.config.get('RISK_ENABLED', True):
+            return
+        if np is None:
+            print("[RISK] numpy is not installed - route scoring is disabled (pip install numpy)")
+            return
+        self._configure(app.config.get('RISK_CELL_DEGREES', RISK_CELL_DEGREES),
+                        app.config.get('RISK_HALF_LIFE_DAYS', RISK_HALF_LIFE_DAYS))
+        self.enabled = True
+        threading.Thread(target=self._run, args=(app.config.get('RISK_REFRESH_SECONDS', 2.0),),
+                         name='surakshita-risk', daemon=True).start()
+
+    def _configure(self, cell_degrees, half_life_days):
+        self.cell = cell_degrees
+        self.half_life = half_life_days * 86400.0
+        self.rows = int(round((LAT_MAX - LAT_MIN) / cell_degrees))
+        self.cols = int(round((LON_MAX - LON_MIN) / cell_degrees))
+
+    @property
+    def grid(self):
+        """The cells as a float32 (rows, cols) array over the shared mapping, opened on first use"""
+        if self._grid is None:
+            with self._open_lock:
+                if self._grid is None:
+                    self._open()
+        return self._grid
+
+    def _open(self):
+        size = HEADER_BYTES + self.rows * self.cols * 4
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            mapped = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._mapped = mapped
+        self._grid = np.frombuffer(mapped, dtype=np.float32, count=self.rows * self.cols,
+                                   offset=HEADER_BYTES).reshape(self.rows, self.cols)
+
+    def _header(self):
+        magic, rows, cols, cell, half_life, epoch, *watermarks = _HEADER.unpack_from(self._mapped, 0)
+        if (magic, rows, cols, cell, half_life) != (MAGIC, self.rows, self.cols, self.cell, self.half_life):
+            return None  # New file, or written with another layout
+        return epoch, watermarks
+
+    def _write_header(self, epoch, watermarks):
+        _HEADER.pack_into(self._mapped, 0, MAGIC, self.rows, self.cols, self.cell, self.half_life, epoch, *watermarks)
+
+    def _run(self, interval_seconds):
+        paths = self.router.paths if self.router is not None else [self.db_path]
+        conns = [sqlite3.connect(path, timeout=30) for path in paths]
+        seen = None
+        while True:
+            stamp = self.stamps.current()
+            if stamp != seen:
+                try:
+                    self.catch_up(conns)
+                    seen = stamp
+                except Exception:
+                    # Anything, so a bad row or a NumPy error cannot stop the thread for good
+                    self.metrics['failures'] += 1
+                    logger.exception("[RISK] Folding in new incidents failed")
+            time.sleep(interval_seconds)
+
+    def catch_up(self, conns, batch_rows=RISK_BATCH_ROWS, rebuild=False):
+        """Fold incidents newer than the watermarks into the grid; returns how many were added
+
+        conns holds a connection per shard file, in shard order (just the
+        database's when unsharded). Each batch is added under the side-file
+        lock, which is held for one batch at a time. A shard commits its ids
+        in order, so its watermark never skips an incident. Incidents the
+        rebalancer moved into a shard were already folded in where they were
+        written and are skipped - except when the grid is (re)built.
+        """
+        grid = self.grid.reshape(-1)
+        lock = sqlite3.connect(self.lock_path, timeout=30, isolation_level=None)
+        folded = 0
+        try:
+            lock.execute('BEGIN EXCLUSIVE')
+            try:
+                if rebuild or self._header() is None:
+                    grid.fill(0)
+                    self._write_header(time.time(), [0] * WATERMARKS)
+                    rebuild = True
+            finally:
+                lock.execute('COMMIT')
+
+            for shard_no, conn in enumerate(conns):
+                while True:
+                    lock.execute('BEGIN EXCLUSIVE')
+                    try:
+                        epoch, watermarks = self._header()
+                        rows = conn.execute(NEW_INCIDENTS_SQL, (watermarks[shard_no], batch_rows)).fetchall()
+                        if rows:
+                            watermarks[shard_no] = rows[-1][0]
+                            written = [row for row in rows if rebuild or shard_of(row[0]) == shard_no]
+                            epoch = self._rebase(grid, epoch)
+                            if written:
+                                self._add(grid, written, epoch)
+                            self._write_header(epoch, watermarks)
+                            folded += len(written)
+                    finally:
+                        lock.execute('COMMIT')  # Nothing was written to the lock file - this only releases it
+                    if len(rows) < batch_rows:
+                        break
+        finally:
+            lock.close()
+        self.metrics['folded'] += folded
+        self.metrics['catch_ups'] += 1
+        return folded
+
+    def remove(self, rows):
+        """Take deleted incidents back out of the grid; returns how many had been folded in
+
+        rows are (id, latitude, longitude, incident_type, created) as selected
+        by RISK_COLUMNS. Incidents above their shard's watermark were never
+        added and are left alone. Archived incidents stay in the grid: they
+        still happened, and a rebuild from incidents_all counts them too.
+        """
+        if not self.enabled or not rows:
+            return 0
+        grid = self.grid.reshape(-1)
+        try:
+            lock = sqlite3.connect(self.lock_path, timeout=30, isolation_level=None)
+            try:
+                lock.execute('BEGIN EXCLUSIVE')
+                try:
+                    header = self._header()
+                    if header is None:
+                        return 0
+                    epoch, watermarks = header
+                    folded = [row for row in rows if row[0] <= watermarks[shard_of(row[0])]]
+                    if folded:
+                        self._add(grid, folded, epoch, sign=-1.0)
+                finally:
+                    lock.execute('COMMIT')
+            finally:
+                lock.close()
+        except sqlite3.Error:
+            self.metrics['failures'] += 1
+            logger.exception("[RISK] Removing deleted incidents failed")
+            return 0
+        self.metrics['removed'] += len(folded)
+        return len(folded)
+
+    def _rebase(self, grid, epoch):
+        """Move the epoch to now once the growth factor for new incidents nears float32's range"""
+        now = time.time()
+        if (now - epoch) / self.half_life < REBASE_HALF_LIVES:
+            return epoch
+        grid *= np.float32(np.exp2((epoch - now) / self.half_life))
+        self.metrics['rebases'] += 1
+        return now
+
+    def _add(self, grid, rows, epoch, sign=1.0):
+        _, lats, lons, types, created = zip(*rows)
+        lats = np.array(lats, dtype=np.float64)
+        lons = np.array(lons, dtype=np.float64)
+        created = np.array([t if t is not None else np.nan for t in created], dtype=np.float64)
+        created = np.minimum(np.nan_to_num(created, nan=epoch), time.time())  # No credit for clock skew
+        weights = np.array([TYPE_WEIGHTS.get(t, DEFAULT_WEIGHT) for t in types], dtype=np.float64)
+        weights *= sign * np.exp2((created - epoch) / self.half_life)
+        cells, valid = self._cells(lats, lons)
+        # add.at, not +=: several incidents in one cell must all count
+        np.add.at(grid, cells[valid], weights[valid].astype(np.float32))
+        if sign < 0:
+            touched = cells[valid]
+            grid[touched] = np.maximum(grid[touched], 0)  # float32 rounding must not leave negative risk
+
+    def _cells(self, lats, lons):
+        """Flat cell index of each point, and which points fall inside the grid"""
+        rows = np.floor((lats - LAT_MIN) / self.cell).astype(np.int64)
+        cols = np.floor((lons - LON_MIN) / self.cell).astype(np.int64)
+        valid = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return rows * self.cols + cols, valid
+
+    def _decay(self):
+        """Factor that turns stored cell values into scores as of now (0 until the grid is initialized)"""
+        header = self._header()
+        if header is None:
+            return 0.0
+        return np.exp2((header[0] - time.time()) / self.half_life)
+
+    def score_route(self, points):
+        """Risk along a polyline of (lat, lon) points
+
+        Returns:
+            Dict with total risk (each cell counted once), length, risk per km,
+            per-segment lengths and risks, and the riskiest cells passed
+        """
+        flat = self.grid.reshape(-1)
+        pts = np.asarray(points, dtype=np.float64)
+        start, end = pts[:-1], pts[1:]
+        delta = end - start
+
+        # Samples every half cell along each segment, all segments at once
+        steps = np.ceil(np.abs(delta).max(axis=1) / (self.cell / 2)).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(steps)), steps)
+        offsets = np.repeat(np.cumsum(steps) - steps, steps)
+        t = (np.arange(segment.size) - offsets) / np.maximum(steps - 1, 1)[segment]
+        lats = start[segment, 0] + t * delta[segment, 0]
+        lons = start[segment, 1] + t * delta[segment, 1]
+        cells, valid = self._cells(lats, lons)
+        segment, cells = segment[valid], cells[valid]
+
+        decay = self._decay()
+        # Each cell once per segment, and once for the whole route
+        seg_cells = np.unique(segment * flat.size + cells)
+        seg_index, seg_cell = np.divmod(seg_cells, flat.size)
+        seg_risk = np.bincount(seg_index, weights=flat[seg_cell] * decay, minlength=len(steps))
+        route_cells = np.unique(cells)
+        route_risk = flat[route_cells].astype(np.float64) * decay
+
+        km_lat = delta[:, 0] * KM_PER_DEGREE_LAT
+        km_lon = delta[:, 1] * KM_PER_DEGREE_LON * np.cos(np.radians((start[:, 0] + end[:, 0]) / 2))
+        seg_km = np.hypot(km_lat, km_lon)
+        length_km = float(seg_km.sum())
+        total = float(route_risk.sum())
+
+        hotspots = []
+        for index in route_cells[np.argsort(route_risk)[::-1][:HOTSPOTS]]:
+            if flat[index] <= 0:
+                break
+            row, col = divmod(int(index), self.cols)
+            hotspots.append({
+                'latitude': round(LAT_MIN + (row + 0.5) * self.cell, 4),
+                'longitude': round(LON_MIN + (col + 0.5) * self.cell, 4),
+                'risk': round(float(flat[index] * decay), 3),
+            })
+        self.metrics['routes'] += 1
+        return {
+            'total_risk': round(total, 3),
+            'length_km': round(length_km, 3),
+            'risk_per_km': round(total / length_km, 3) if length_km > 0 else None,
+            # Columns, one value per segment (point i to point i + 1) - long routes have thousands
+            'segments': {'length_km': np.round(seg_km, 3).tolist(), 'risk': np.round(seg_risk, 3).tolist()},
+            'hotspots': hotspots,
+            'cell_degrees': self.cell,
+            'half_life_days': self.half_life / 86400,
+        }
+
+    def snapshot_metrics(self):
+        header = self._header() if self._mapped is not None else None
+        watermarks = {n: last_id for n, last_id in enumerate(header[1]) if last_id} if header else None
+        return dict(self.metrics, enabled=self.enabled, watermarks=watermarks)
+
+
+def validate_route(data, cell=RISK_CELL_DEGREES, max_points=MAX_ROUTE_POINTS, max_samples=MAX_ROUTE_SAMPLES):
+    """Check a /api/route/score body; returns (points as (lat, lon) floats, error message)
+
+    Points must lie inside the grid, and the route may not need more than
+    max_samples half-cell samples (what score_route() allocates for).
+    """
+    points = data.get('points') if isinstance(data, dict) else None
+    if not isinstance(points, list) or len(points) < 2:
+        return None, 'points must be a list of at least two [latitude, longitude] pairs'
+    if len(points) > max_points:
+        return None, f'At most {max_points} points per route'
+    route = []
+    for point in points:
+        if (not isinstance(point, (list, tuple)) or len(point) != 2
+                or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in point)):
+            return None, 'Each point must be a [latitude, longitude] pair of numbers'
+        lat, lon = float(point[0]), float(point[1])
+        if not (LAT_MIN <= lat <= LAT_MAX and LON_MIN <= lon <= LON_MAX):
+            return None, (f'Coordinates out of range: latitude must be {LAT_MIN}..{LAT_MAX} '
+                          f'and longitude {LON_MIN}..{LON_MAX}')
+        route.append((lat, lon))
+    # Same count as score_route(): a sample every half cell along each segment, plus its end
+    samples = sum(math.ceil(max(abs(lat2 - lat1), abs(lon2 - lon1)) / (cell / 2)) + 1
+                  for (lat1, lon1), (lat2, lon2) in zip(route, route[1:]))
+    if samples > max_samples:
+        return None, 'Route is too long to score - split it into shorter routes'
+    return route, None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incident risk grid for route scoring')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--rebuild', action='store_true', help='discard the grid and fold in the full history')
+    parser.add_argument('--cell-degrees', type=float, default=RISK_CELL_DEGREES)
+    parser.add_argument('--half-life-days', type=float, default=RISK_HALF_LIFE_DAYS)
+    parser.add_argument('--shards', type=int, default=0, help='number of incident shard files (0: not sharded)')
+    parser.add_argument('--shard-dir', default='shards')
+    args = parser.parse_args()
+    if np is None:
+        raise SystemExit('The risk grid needs numpy: pip install numpy')
+
+    router = None
+    if args.shards:
+        router = ShardRouter(args.db)
+        router.configure(args.shards, args.shard_dir)
+    risk = RiskGrid(args.db, None, args.cell_degrees, args.half_life_days, router)
+    conns = [sqlite3.connect(path, timeout=30) for path in (router.paths if router else [args.db])]
+    started = time.perf_counter()
+    folded = risk.catch_up(conns, rebuild=args.rebuild)
+    for conn in conns:
+        conn.close()
+    scores = risk.grid * risk._decay()
+    print(f"Folded in {folded} incidents in {time.perf_counter() - started:.2f} s; "
+          f"{int(np.count_nonzero(scores))} of {scores.size} cells have risk, "
+          f"watermarks {risk.snapshot_metrics()['watermarks']}")
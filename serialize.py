@@ -0,0 +1,103 @@
+"""Fast JSON serialization for API responses built from query results
+
+Rows are read as plain tuples (no sqlite3.Row) and turned into JSON objects
+through a column mapping computed once per query, instead of converting each
+row with dict(row) and fixing up fields one by one. Derived fields are
+computed in SQL wherever possible; the rest go through per-column converters.
+
+orjson is used when installed (pip install orjson), otherwise the stdlib
+encoder with compact separators. Results larger than STREAM_THRESHOLD rows
+are streamed to the client in chunks instead of being built in memory.
+"""
+import json
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+STREAM_THRESHOLD = 2000  # Rows; smaller results are sent in one body
+STREAM_CHUNK_ROWS = 1000
+
+
+def dumps(obj):
+    """Encode obj as compact UTF-8 JSON bytes; unknown types are converted with str()"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Flask response with a pre-encoded JSON body (compact, unlike debug-mode jsonify)"""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+class RowSerializer:
+    """Turns result tuples into dicts with keys and converters precomputed from cursor.description
+
+    Args:
+        description: cursor.description of the query
+        converters: optional {column name: function} applied to that column's value
+    """
+
+    def __init__(self, description, converters=None):
+        self.keys = tuple(column[0] for column in description)
+        converters = converters or {}
+        self.converters = tuple((self.keys.index(name), fn) for name, fn in converters.items())
+
+    def rows(self, tuples):
+        """List of dicts for an iterable of result tuples"""
+        keys = self.keys
+        if not self.converters:
+            return [dict(zip(keys, row)) for row in tuples]
+        converted = []
+        for row in tuples:
+            row = list(row)
+            for index, fn in self.converters:
+                row[index] = fn(row[index])
+            converted.append(dict(zip(keys, row)))
+        return converted
+
+
+def query_rows(conn, sql, params=(), converters=None):
+    """Run a query and return (RowSerializer, cursor) with plain-tuple rows"""
+    cursor = conn.cursor()
+    cursor.row_factory = None  # Tuples, not sqlite3.Row
+    cursor.execute(sql, params)
+    return RowSerializer(cursor.description, converters), cursor
+
+
+def rows_response(conn, sql, params=(), key=None, converters=None, stream_threshold=STREAM_THRESHOLD):
+    """JSON response for a query: a bare array, or {key: [...], "count": n} when key is given
+
+    The connection is closed once the rows are sent. Results with more than
+    stream_threshold rows are streamed in chunks of STREAM_CHUNK_ROWS; the
+    body is produced after the request's teardown, so their connection is
+    closed when the server closes the response - sent in full or not.
+    """
+    serializer, cursor = query_rows(conn, sql, params, converters)
+    head = cursor.fetchmany(stream_threshold + 1)
+
+    if len(head) <= stream_threshold:
+        conn.close()
+        rows = serializer.rows(head)
+        return json_response({key: rows, 'count': len(rows)} if key else rows)
+
+    def generate():
+        try:
+            yield b'{"%s":[' % key.encode() if key else b'['
+            count, batch = 0, head
+            while batch:
+                body = dumps(serializer.rows(batch))[1:-1]
+                yield (b',' if count else b'') + body
+                count += len(batch)
+                batch = cursor.fetchmany(STREAM_CHUNK_ROWS)
+            yield b'],"count":%d}' % count if key else b']'
+        finally:
+            conn.close()
+
+    response = current_app.response_class(generate(), mimetype='application/json')
+    response.call_on_close(conn.close)  # Also when the body is never iterated
+    return response
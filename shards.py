@@ -0,0 +1,468 @@
+"""Optional sharded incident storage: one SQLite file per group of regions
+
+With SHARDING_ENABLED, incidents are written to SHARD_COUNT shard files
+(SHARD_DIR/surakshita-shard-01.db, ...) instead of surakshita.db, so SOS
+reports from different parts of the country no longer queue behind one
+write lock. Users, sessions, subscriptions and the audit log stay in
+surakshita.db (the primary, shard 0), which also keeps incidents reported
+before sharding was switched on until the rebalancer moves them out.
+
+    placement   An incident goes to the shard of its region (geofence.region_of,
+                1-degree cells - no state boundaries ship with the app). Regions
+                are spread over the shards by a hash of their name unless
+                shard_regions in the primary pins them; the rebalancer writes
+                those pins. Workers reload the pins every SHARD_MAP_REFRESH_SECONDS.
+    ids         Incident ids are unique across shards and keep growing over
+                time: a shard hands out (milliseconds since 2020 << 8) plus its
+                number, and at least 16 more than its previous id (shard_ids,
+                inside the insert transaction). Shard n's ids are n modulo 16
+                and stay the same when an incident moves. Ids issued before
+                sharding (all below 2 ** 40) are the primary's; once sharding
+                is on the primary is shard 0 and hands out time ids too, so
+                an incident still written there (by a worker not yet
+                restarted with sharding, say) sorts after every earlier one.
+    polling     A shard commits its ids in order, but across shards a lower id
+                can commit a moment after a higher one. Pollers asking for
+                "id > last seen" ask for ids above poll_floor(last seen)
+                instead, COMMIT_SKEW_SECONDS of ids earlier, and skip the
+                ones they already have.
+    reads       connect_all() attaches every shard to a connection on the
+                primary and shadows incidents, incidents_archive and
+                incidents_all with TEMP views over all of them. Per-user
+                pages and admin views run their usual SQL, joins with users
+                included, and SQLite fans it out - each shard answering from
+                its own indexes. Such connections are read-only.
+    by id       connect_for_incident() tries the shard the id was issued by,
+                then the others (the incident may have been moved).
+
+Moving a region copies its incidents (with their status transitions and
+idempotency keys) to the new shard and then deletes them from the old one,
+in batches and as two separate transactions: a crash leaves a duplicate
+rather than losing a row, and running the move again finishes it. While a
+batch is in flight its rows are visible in both shards.
+
+Background jobs cover every file: archival and backups run per shard (see
+create_app); the SLA aggregator folds each shard's transitions with its own
+watermark (sla.py); the Parquet export reads through connect_all() and the
+read replica copies every file and fans out the same way (export.py,
+replica.py).
+
+Status and rebalancing (pins every region to a shard, then moves rows):
+    python shards.py --status
+    python shards.py --rebalance --days 30
+    python shards.py --move 19N072E 3
+"""
+import argparse
+import os
+import sqlite3
+import time
+import zlib
+
+from database import enable_wal
+from geofence import REGION_DEGREES, region_of
+from migrate import ensure_schema
+from versions import VersionStamps
+
+MAX_SHARDS = 10  # SQLite attaches at most 10 databases to one connection by default
+ID_STRIDE = 16  # Shard n's ids are n modulo 16
+ID_TICK_BITS = 8  # 16 ids per shard and millisecond before a shard's ids run ahead of the clock
+ID_EPOCH_MS = 1577836800000  # 2020-01-01: ids stay below 2 ** 53, exact in JavaScript, for centuries
+TIME_IDS_START = 1 << 40  # Lower ids were issued by AUTOINCREMENT in the primary
+COMMIT_SKEW_SECONDS = 30  # Longest a shard's insert may take to commit after taking its id
+SHARD_MAP_REFRESH_SECONDS = 10
+MOVE_BATCH_ROWS = 500
+REBALANCE_TOLERANCE = 0.1  # A region stays put while its shard is at most 10% over the average
+
+FANOUT_TABLES = ('incidents', 'incidents_archive', 'incidents_all')
+
+# Incidents per region and shard - cells are floor(degrees) offset to stay positive for CAST
+REGION_COUNTS_SQL = '''
+    SELECT CAST(latitude / :degrees + 1000 AS INTEGER) - 1000 AS lat_cell,
+           CAST(longitude / :degrees + 1000 AS INTEGER) - 1000 AS lon_cell,
+           COUNT(*), SUM(created_at >= datetime('now', :since))
+    FROM incidents_all
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    GROUP BY lat_cell, lon_cell
+'''
+
+
+def shard_of(incident_id):
+    """Shard that issued an incident id (0, the primary, for ids from before sharding)"""
+    return incident_id % ID_STRIDE if incident_id >= TIME_IDS_START else 0
+
+
+def allocate_ids(conn, count=1):
+    """Reserve count incident ids in this shard file; returns them as a range
+
+    Call inside the insert's transaction: it takes the write lock, so a
+    shard's ids are committed in the order they are issued. Returns None
+    for a primary that was never sharded, whose inserts fall back to
+    AUTOINCREMENT.
+    """
+    floor = (int(time.time() * 1000) - ID_EPOCH_MS) << ID_TICK_BITS
+    rows = conn.execute(
+        'UPDATE shard_ids SET last_id = MAX(last_id + :stride * :count, :floor + shard_no + :stride * (:count - 1)) '
+        'RETURNING last_id', {'stride': ID_STRIDE, 'count': count, 'floor': floor}).fetchall()
+    if not rows:
+        return None
+    return range(rows[0][0] - ID_STRIDE * (count - 1), rows[0][0] + 1, ID_STRIDE)
+
+
+def poll_floor(last_id, seconds=COMMIT_SKEW_SECONDS):
+    """Id to poll above after seeing every id up to last_id; the caller skips ids it already has
+
+    Time ids from different shards may commit out of order, so the poll
+    looks back seconds' worth of ids. AUTOINCREMENT ids commit in order.
+    """
+    if last_id < TIME_IDS_START:
+        return last_id
+    return last_id - ((seconds * 1000) << ID_TICK_BITS)
+
+
+def claim_shard(conn, shard_no):
+    """Mark a shard file as shard_no, refusing a file that belongs to another shard"""
+    owners = [row[0] for row in conn.execute('SELECT shard_no FROM shard_ids')]
+    if owners and owners != [shard_no]:
+        raise RuntimeError(f"Database is shard {owners[0]}, not shard {shard_no}")
+    conn.execute('INSERT OR IGNORE INTO shard_ids (shard_no, last_id) VALUES (?, ?)', (shard_no, shard_no))
+    conn.commit()
+
+
+def fan_out(conn, shard_paths):
+    """Attach shard files to a connection on the primary and shadow the incident tables with TEMP views over all of them"""
+    for shard_no, path in enumerate(shard_paths, 1):
+        conn.execute(f'ATTACH DATABASE ? AS shard_{shard_no}', (path,))
+    for table in FANOUT_TABLES:
+        arms = [f'SELECT * FROM main.{table}'] + [f'SELECT * FROM shard_{n}.{table}'
+                                                   for n in range(1, len(shard_paths) + 1)]
+        conn.execute(f"CREATE TEMP VIEW {table} AS {' UNION ALL '.join(arms)}")
+    return conn
+
+
+def region_bounds(region, degrees=REGION_DEGREES):
+    """(south, west, north, east) of a region label such as '19N072E'"""
+    south = float(region[:2]) * (1 if region[2] == 'N' else -1)
+    west = float(region[3:6]) * (1 if region[6] == 'E' else -1)
+    return south, west, south + degrees, west + degrees
+
+
+class ShardRouter:
+    """Picks the database for each incident read and write
+
+    Args:
+        db_path: The primary database (shard 0)
+        factory: sqlite3.Connection subclass for the connections handed out
+    """
+
+    def __init__(self, db_path, factory=sqlite3.Connection):
+        self.db_path = db_path
+        self.factory = factory
+        self.enabled = False
+        self.paths = [db_path]
+        self.refresh_seconds = SHARD_MAP_REFRESH_SECONDS
+        self._pins = {}
+        self._pins_loaded = 0.0
+        self.metrics = {'writes': {}, 'fanout_reads': 0, 'lookups': 0, 'lookup_probes': 0}
+
+    def init_app(self, app):
+        if not app.config.get('SHARDING_ENABLED', False):
+            return
+        self.configure(app.config.get('SHARD_COUNT', 4), app.config.get('SHARD_DIR', 'shards'))
+        self.refresh_seconds = app.config.get('SHARD_MAP_REFRESH_SECONDS', SHARD_MAP_REFRESH_SECONDS)
+        self.prepare()
+
+    def configure(self, count, directory):
+        if not 1 <= count <= MAX_SHARDS:
+            raise ValueError(f"SHARD_COUNT must be between 1 and {MAX_SHARDS}")
+        self.enabled = True
+        self.paths = [self.db_path] + [os.path.join(directory, f'surakshita-shard-{n:02d}.db')
+                                       for n in range(1, count + 1)]
+        self.metrics['writes'] = {n: 0 for n in range(len(self.paths))}
+
+    @property
+    def count(self):
+        """Number of shard files (the primary not included)"""
+        return len(self.paths) - 1
+
+    def prepare(self):
+        """Create missing shard files, bring their schemas up to date and make the primary shard 0"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            claim_shard(conn, 0)  # From now on the primary's inserts get time ids too
+        finally:
+            conn.close()
+        for shard_no, path in enumerate(self.paths[1:], 1):
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            ensure_schema(path)
+            enable_wal(path)
+            conn = sqlite3.connect(path, timeout=30)
+            try:
+                claim_shard(conn, shard_no)
+            finally:
+                conn.close()
+
+    def connect(self, shard_no=0):
+        conn = sqlite3.connect(self.paths[shard_no], factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # Placement
+
+    def pins(self):
+        """Region -> shard pins from the primary, reloaded every refresh_seconds"""
+        if time.monotonic() - self._pins_loaded > self.refresh_seconds:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                self._pins = dict(conn.execute('SELECT region, shard_no FROM shard_regions').fetchall())
+            finally:
+                conn.close()
+            self._pins_loaded = time.monotonic()
+        return self._pins
+
+    def placement(self, region):
+        """Shard for new incidents in a region: its pin, else a hash of its name"""
+        pinned = self.pins().get(region)
+        if pinned is not None and 1 <= pinned <= self.count:
+            return pinned
+        return 1 + zlib.crc32(region.encode()) % self.count
+
+    def shard_for(self, latitude, longitude):
+        if not self.enabled:
+            return 0
+        return self.placement(region_of(float(latitude), float(longitude)))
+
+    def connect_at(self, latitude, longitude):
+        """Connection for writing a new incident at this location (the primary when unsharded)"""
+        shard_no = self.shard_for(latitude, longitude)
+        if self.enabled:
+            self.metrics['writes'][shard_no] += 1
+        return self.connect(shard_no)
+
+    def connect_for_incident(self, incident_id):
+        """Connection to the database holding an incident
+
+        Tries the shard that issued the id first, then the others. When no
+        shard has it, returns the issuing shard, where the caller's own
+        lookup then finds nothing.
+        """
+        if not self.enabled:
+            return self.connect(0)
+        try:
+            home = shard_of(int(incident_id))
+        except (TypeError, ValueError):
+            home = 0
+        home = home if home < len(self.paths) else 0
+        self.metrics['lookups'] += 1
+        for shard_no in [home] + [n for n in range(len(self.paths)) if n != home]:
+            conn = self.connect(shard_no)
+            self.metrics['lookup_probes'] += 1
+            if conn.execute('SELECT 1 FROM incidents_all WHERE id = ?', (incident_id,)).fetchone():
+                return conn
+            conn.close()
+        return self.connect(home)
+
+    def connect_all(self):
+        """Read-only connection on the primary whose incident tables span every shard"""
+        conn = self.connect(0)
+        if not self.enabled:
+            return conn
+        self.metrics['fanout_reads'] += 1
+        return fan_out(conn, self.paths[1:])
+
+    def max_incident_id(self):
+        """Highest incident id in any shard (one indexed lookup per file)"""
+        highest = 0
+        for shard_no in range(len(self.paths)):
+            conn = self.connect(shard_no)
+            try:
+                highest = max(highest, conn.execute('SELECT COALESCE(MAX(id), 0) FROM incidents').fetchone()[0])
+            finally:
+                conn.close()
+        return highest
+
+    def snapshot_metrics(self):
+        shards = []
+        for shard_no, path in enumerate(self.paths):
+            conn = sqlite3.connect(path, timeout=30)
+            try:
+                row = conn.execute('SELECT last_id FROM shard_ids').fetchone()
+            finally:
+                conn.close()
+            shards.append({'shard': shard_no, 'path': path, 'last_id': row[0] if row else None,
+                           'writes': self.metrics['writes'].get(shard_no, 0)})
+        return {'enabled': self.enabled, 'shards': shards, 'pinned_regions': len(self.pins()),
+                'fanout_reads': self.metrics['fanout_reads'], 'lookups': self.metrics['lookups'],
+                'lookup_probes': self.metrics['lookup_probes']}
+
+    # Rebalancing
+
+    def region_counts(self, days=30):
+        """{(shard, region): (incidents, incidents in the last days)} over every shard"""
+        counts = {}
+        for shard_no, path in enumerate(self.paths):
+            conn = sqlite3.connect(path, timeout=30)
+            try:
+                for lat_cell, lon_cell, total, recent in conn.execute(
+                        REGION_COUNTS_SQL, {'degrees': REGION_DEGREES, 'since': f'-{days} days'}):
+                    region = region_of((lat_cell + 0.5) * REGION_DEGREES, (lon_cell + 0.5) * REGION_DEGREES)
+                    counts[shard_no, region] = (total, recent or 0)
+            finally:
+                conn.close()
+        return counts
+
+    def plan(self, counts):
+        """Assign every region to a shard file, evening out recent incidents per shard
+
+        Largest regions first; a region keeps its current shard while that
+        shard stays within REBALANCE_TOLERANCE of the average, otherwise it goes
+        to the least loaded shard. Returns {region: shard}.
+        """
+        loads = {}
+        for (_, region), (_, recent) in counts.items():
+            loads[region] = loads.get(region, 0) + recent
+        target = sum(loads.values()) / self.count
+        totals = {n: 0 for n in range(1, self.count + 1)}
+        placement = {}
+        for region, load in sorted(loads.items(), key=lambda item: (-item[1], item[0])):
+            current = self.placement(region)
+            if totals[current] + load > target * (1 + REBALANCE_TOLERANCE):
+                current = min(totals, key=lambda n: (totals[n], n))
+            placement[region] = current
+            totals[current] += load
+        return placement
+
+    def pin(self, placement):
+        """Store region -> shard pins in the primary; workers pick them up within refresh_seconds"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.executemany('''
+                INSERT INTO shard_regions (region, shard_no) VALUES (?, ?)
+                ON CONFLICT (region) DO UPDATE SET shard_no = excluded.shard_no, updated_at = CURRENT_TIMESTAMP
+            ''', sorted(placement.items()))
+            conn.commit()
+        finally:
+            conn.close()
+        self._pins_loaded = 0.0
+
+    def move_region(self, region, target, batch_rows=MOVE_BATCH_ROWS, pause=0.01):
+        """Move a region's incidents from every other shard into target; returns how many moved"""
+        from sla import folded_watermarks  # sla imports this module
+        south, west, north, east = region_bounds(region)
+        where = 'latitude >= ? AND latitude < ? AND longitude >= ? AND longitude < ?'
+        box = (south, north, west, east)
+        moved = 0
+        conn = sqlite3.connect(self.paths[target], timeout=30, isolation_level=None)
+        try:
+            for source, path in enumerate(self.paths):
+                if source == target:
+                    continue
+                conn.execute('ATTACH DATABASE ? AS src', (path,))
+                try:
+                    for table in ('incidents', 'incidents_archive'):
+                        while True:
+                            ids = [row[0] for row in conn.execute(
+                                f'SELECT id FROM src.{table} WHERE {where} ORDER BY id LIMIT ?', (*box, batch_rows))]
+                            if not ids:
+                                break
+                            # Transitions the SLA sketches already hold from the old shard stay counted once
+                            self._move_batch(conn, table, ids, folded_watermarks(self.db_path).get(source, 0))
+                            moved += len(ids)
+                            time.sleep(pause)  # Let SOS inserts into either shard take the lock
+                finally:
+                    conn.execute('DETACH DATABASE src')
+        finally:
+            conn.close()
+        return moved
+
+    @staticmethod
+    def _move_batch(conn, table, ids, sla_watermark=0):
+        placeholders = ','.join('?' * len(ids))
+        # Copy first and commit, then delete: a crash in between leaves a duplicate, never a loss
+        conn.execute('BEGIN')
+        try:
+            present = {row[0] for row in conn.execute(
+                f'SELECT id FROM main.incidents_all WHERE id IN ({placeholders})', ids)}
+            fresh = [incident_id for incident_id in ids if incident_id not in present]
+            conn.execute(f'INSERT OR IGNORE INTO main.{table} SELECT * FROM src.{table} WHERE id IN ({placeholders})', ids)
+            if fresh:
+                # Transitions get new ids in the target's log, in their original order
+                conn.execute(f'''
+                    INSERT INTO main.incident_transitions (incident_id, from_status, to_status, unit, created_at, counted)
+                    SELECT incident_id, from_status, to_status, unit, created_at, counted OR id <= ?
+                    FROM src.incident_transitions
+                    WHERE incident_id IN ({','.join('?' * len(fresh))}) ORDER BY id
+                ''', (sla_watermark, *fresh))
+            conn.execute(f'''
+                INSERT OR IGNORE INTO main.incident_idempotency
+                SELECT * FROM src.incident_idempotency WHERE incident_id IN ({placeholders})
+            ''', ids)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        conn.execute('BEGIN')
+        try:
+            for statement in (f'DELETE FROM src.incident_transitions WHERE incident_id IN ({placeholders})',
+                              f'DELETE FROM src.incident_idempotency WHERE incident_id IN ({placeholders})',
+                              f'DELETE FROM src.{table} WHERE id IN ({placeholders})'):
+                conn.execute(statement, ids)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def rebalance(self, days=30, wait=True, dry_run=False):
+        """Plan, pin and move; returns (placement, {region: incidents moved})"""
+        counts = self.region_counts(days)
+        placement = self.plan(counts)
+        if dry_run:
+            return placement, {}
+        self.pin(placement)
+        if wait:
+            time.sleep(self.refresh_seconds + 1)  # Until every worker writes by the new pins
+        moved = {}
+        for region, target in sorted(placement.items()):
+            if any(shard_no != target and region == name for shard_no, name in counts):
+                moved[region] = self.move_region(region, target)
+        VersionStamps(f'{self.db_path}-version').bump()
+        return placement, moved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sharded incident storage: status and rebalancing')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--shards', type=int, default=int(os.getenv('SHARD_COUNT', 4)))
+    parser.add_argument('--dir', default=os.getenv('SHARD_DIR', 'shards'))
+    parser.add_argument('--days', type=int, default=30, help='window of recent incidents that counts as load')
+    parser.add_argument('--status', action='store_true', help='incidents per shard')
+    parser.add_argument('--rebalance', action='store_true', help='pin every region to a shard and move its incidents')
+    parser.add_argument('--dry-run', action='store_true', help='with --rebalance: only print the plan')
+    parser.add_argument('--no-wait', action='store_true',
+                        help=f'move at once instead of waiting {SHARD_MAP_REFRESH_SECONDS} s for workers to reload pins')
+    parser.add_argument('--move', nargs=2, metavar=('REGION', 'SHARD'), help='pin one region to a shard and move it')
+    args = parser.parse_args()
+
+    router = ShardRouter(args.db)
+    router.configure(args.shards, args.dir)
+    router.prepare()
+    if args.move:
+        region, target = args.move[0], int(args.move[1])
+        if not 1 <= target <= router.count:
+            raise SystemExit(f'SHARD must be between 1 and {router.count}')
+        router.pin({region: target})
+        if not args.no_wait:
+            time.sleep(router.refresh_seconds + 1)
+        print(f"Moved {router.move_region(region, target)} incidents of {region} to shard {target}")
+    elif args.rebalance:
+        started = time.perf_counter()
+        placement, moved = router.rebalance(args.days, wait=not args.no_wait, dry_run=args.dry_run)
+        for region, target in sorted(placement.items()):
+            print(f"{region} -> shard {target}" + (f" ({moved[region]} moved)" if region in moved else ''))
+        print(f"{len(placement)} regions, {sum(moved.values())} incidents moved in {time.perf_counter() - started:.1f} s")
+    counts = router.region_counts(args.days)
+    for shard_no, path in enumerate(router.paths):
+        total = sum(c[0] for (n, _), c in counts.items() if n == shard_no)
+        recent = sum(c[1] for (n, _), c in counts.items() if n == shard_no)
+        regions = sum(1 for n, _ in counts if n == shard_no)
+        print(f"shard {shard_no:>2} {path:<36} {total:>9} incidents ({recent} in {args.days} days), {regions} regions")
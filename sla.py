@@ -0,0 +1,321 @@
+"""Dispatch response-time (SLA) analytics from incident status transitions
+
+Every status change is logged in incident_transitions by a trigger (see
+migrations/0006_incident_transitions.py). The aggregator folds new transitions
+into quantile sketches, one per metric and dimension value:
+
+    metrics      time_to_dispatch - first transition into any Dispatched status
+                 time_to_resolve  - first transition into Resolved
+                 (both measured from the incident's created_at)
+    dimensions   overall, region (geofence.region_of), unit type, incident type
+
+The sketches and the id of the last transition folded in (the watermark) are
+stored in the single sla_state row, so each run only reads transitions newer
+than the watermark, and /api/admin/sla reads one row - its cost depends on the
+number of regions/units/types, never on the size of the history.
+
+With sharded incidents (see shards.py) every shard file logs the transitions
+of its own incidents, with its own ids: the state in the primary keeps one
+watermark per file and each run folds in every file. Transitions copied by a
+region move are marked counted when the old shard had already folded them in.
+
+Sketches are log-bucketed histograms (as in DDSketch): every reported quantile
+is within RELATIVE_ACCURACY of the exact value, and their size is bounded by
+the range of durations, not their number.
+
+Run on a schedule from the app (SLA_INTERVAL_SECONDS) or from cron:
+    python sla.py            # fold in new transitions and print the summary
+    python sla.py --rebuild  # recompute from the full transition log
+"""
+import argparse
+import json
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from geofence import region_of
+from shards import ShardRouter
+
+RELATIVE_ACCURACY = 0.02
+MIN_SECONDS = 1.0  # Durations below this are counted as 0 (timestamps have 1 s resolution)
+QUANTILES = (0.5, 0.9, 0.99)
+DIMENSIONS = ('overall', 'region', 'unit', 'incident_type')
+
+# First transition of each kind per incident, with what it is grouped by
+TRANSITIONS_SQL = '''
+    SELECT t.id,
+           CASE WHEN t.to_status GLOB 'Dispatched*' THEN 'time_to_dispatch' ELSE 'time_to_resolve' END AS metric,
+           (julianday(t.created_at) - julianday(i.created_at)) * 86400 AS seconds,
+           i.incident_type, i.latitude, i.longitude,
+           COALESCE(t.unit, (SELECT p.unit FROM incident_transitions p
+                             WHERE p.incident_id = t.incident_id AND p.id < t.id AND p.unit IS NOT NULL
+                             ORDER BY p.id DESC LIMIT 1)) AS unit
+    FROM incident_transitions t
+    JOIN incidents_all i ON i.id = t.incident_id
+    WHERE t.id > ? AND t.id <= ?
+    AND (t.to_status GLOB 'Dispatched*' OR t.to_status = 'Resolved')
+    AND NOT t.counted
+    AND NOT EXISTS (
+        SELECT 1 FROM incident_transitions e
+        WHERE e.incident_id = t.incident_id AND e.id < t.id
+        AND (CASE WHEN e.to_status GLOB 'Dispatched*' THEN 1 WHEN e.to_status = 'Resolved' THEN 2 END)
+          = (CASE WHEN t.to_status GLOB 'Dispatched*' THEN 1 ELSE 2 END)
+    )
+'''
+
+# Unit names as dispatched ('Police Unit 2', 'Ambulance 4', legacy 'Police Patrol') to unit types
+UNIT_TYPES = (
+    ('swat', 'SWAT'),
+    ('police', 'Police'),
+    ('ambulance', 'Ambulance'),
+    ('fire', 'Fire Brigade'),
+    ('rapid response', 'Rapid Response'),
+)
+
+
+def unit_type(unit):
+    if not unit:
+        return 'Unassigned'
+    lowered = unit.lower()
+    return next((name for keyword, name in UNIT_TYPES if keyword in lowered), 'Other')
+
+
+class QuantileSketch:
+    """Log-bucketed histogram with relative-error quantiles
+
+    A value v >= MIN_SECONDS lands in bucket ceil(log(v) / log(gamma)); every
+    value in a bucket is within RELATIVE_ACCURACY of the bucket's midpoint.
+    """
+
+    gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    _log_gamma = math.log(gamma)
+
+    def __init__(self, bins=None, zeros=0, count=0, total=0.0, maximum=0.0):
+        self.bins = bins or {}
+        self.zeros = zeros
+        self.count = count
+        self.total = total
+        self.maximum = maximum
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        if value < MIN_SECONDS:
+            self.zeros += 1
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + 1
+
+    def quantiles(self, qs):
+        """Values at the sorted quantiles qs (0-1) in one pass over the buckets"""
+        if not self.count:
+            return [None] * len(qs)
+        values = []
+        ranks = iter((q, q * (self.count - 1)) for q in qs)
+        q, rank = next(ranks)
+        seen = self.zeros
+        try:
+            while rank < seen:
+                values.append(0.0)
+                q, rank = next(ranks)
+            for key in sorted(self.bins):
+                seen += self.bins[key]
+                while rank < seen:
+                    values.append(min(2 * self.gamma ** key / (self.gamma + 1), self.maximum))
+                    q, rank = next(ranks)
+        except StopIteration:
+            return values
+        return values + [self.maximum] * (len(qs) - len(values))
+
+    def summary(self):
+        result = {'count': self.count, 'mean': round(self.total / self.count, 1) if self.count else None,
+                  'max': round(self.maximum, 1) if self.count else None}
+        for q, value in zip(QUANTILES, self.quantiles(QUANTILES)):
+            result[f'p{round(q * 100)}'] = None if value is None else round(value, 1)
+        return result
+
+    def to_dict(self):
+        return {'bins': self.bins, 'zeros': self.zeros, 'count': self.count, 'total': self.total,
+                'max': self.maximum}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({int(key): n for key, n in data['bins'].items()}, data['zeros'], data['count'],
+                   data['total'], data['max'])
+
+
+def _watermarks(row):
+    """{shard number: watermark} from an sla_state (watermark, watermarks) row"""
+    if row is None:
+        return {}
+    if row[1] is None:
+        return {0: row[0]}  # Saved before shards were folded in: the primary's
+    return {int(shard_no): watermark for shard_no, watermark in json.loads(row[1]).items()}
+
+
+def _load_state(conn):
+    """({shard number: watermark}, {metric: {dimension: {value: QuantileSketch}}}) from sla_state"""
+    row = conn.execute('SELECT watermark, watermarks, sketches FROM sla_state WHERE id = 1').fetchone()
+    if row is None:
+        return {}, {}
+    sketches = {
+        metric: {dimension: {value: QuantileSketch.from_dict(data) for value, data in values.items()}
+                 for dimension, values in dimensions.items()}
+        for metric, dimensions in json.loads(row[2]).items()
+    }
+    return _watermarks(row), sketches
+
+
+def folded_watermarks(db_path):
+    """{shard number: last transition folded in} as stored in the primary at db_path"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        return _watermarks(conn.execute('SELECT watermark, watermarks FROM sla_state WHERE id = 1').fetchone())
+    finally:
+        conn.close()
+
+
+def _report(watermark, sketches):
+    """The SLA report served by /api/admin/sla, as a dict"""
+    report = {'watermark': watermark, 'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+              'unit': 'seconds', 'metrics': {}}
+    for metric in ('time_to_dispatch', 'time_to_resolve'):
+        dimensions = sketches.get(metric, {})
+        report['metrics'][metric] = {
+            dimension: {value: sketch.summary() for value, sketch in sorted(dimensions.get(dimension, {}).items())}
+            for dimension in DIMENSIONS
+        }
+    return report
+
+
+def aggregate(conn, batch_size=5000, shard_paths=()):
+    """Fold transitions newer than the watermarks into the sketches
+
+    conn is the primary, which holds the state; shard_paths are the shard
+    files (ShardRouter.paths[1:]), each folded in up to its own watermark.
+    Each batch is read and folded without holding the write lock; only
+    saving it - new watermarks, sketches and finished report - takes an
+    IMMEDIATE transaction, and the save goes ahead only if the stored
+    watermarks are still the ones the batch started from. When another run
+    (one per worker) got there first, the batch is dropped and folding
+    resumes from that run's state, so no transition is counted twice and
+    SOS writers only ever wait for the save.
+
+    Returns:
+        Number of transitions read
+    """
+    processed = 0
+    watermarks, sketches = _load_state(conn)
+    sources = [conn] + [sqlite3.connect(path, timeout=30) for path in shard_paths]
+    try:
+        shard_no = 0
+        while shard_no < len(sources):
+            source, watermark = sources[shard_no], watermarks.get(shard_no, 0)
+            upper = source.execute('SELECT MAX(id) FROM (SELECT id FROM incident_transitions WHERE id > ? ORDER BY id LIMIT ?)',
+                                   (watermark, batch_size)).fetchone()[0]
+            if upper is None:
+                shard_no += 1
+                continue
+            for _, metric, seconds, incident_type, latitude, longitude, unit in source.execute(
+                TRANSITIONS_SQL, (watermark, upper)
+            ):
+                if seconds is None:
+                    continue
+                seconds = max(0.0, seconds)
+                groups = sketches.setdefault(metric, {})
+                for dimension, value in (
+                    ('overall', 'all'),
+                    ('region', region_of(latitude, longitude)),
+                    ('unit', unit_type(unit)),
+                    ('incident_type', incident_type),
+                ):
+                    groups.setdefault(dimension, {}).setdefault(value, QuantileSketch()).add(seconds)
+            saved = {**watermarks, shard_no: upper}
+            payload = json.dumps({
+                metric: {dimension: {value: sketch.to_dict() for value, sketch in values.items()}
+                         for dimension, values in dimensions.items()}
+                for metric, dimensions in sketches.items()
+            }, separators=(',', ':'))
+            report = json.dumps(_report(sum(saved.values()), sketches), separators=(',', ':'))
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT watermark, watermarks FROM sla_state WHERE id = 1').fetchone()
+                if _watermarks(row) != watermarks:
+                    conn.execute('ROLLBACK')
+                    watermarks, sketches = _load_state(conn)  # Another run saved first: continue from its state
+                    continue
+                conn.execute('''
+                    INSERT INTO sla_state (id, watermark, watermarks, sketches, report, updated_at)
+                    VALUES (1, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (id) DO UPDATE SET watermark = excluded.watermark, watermarks = excluded.watermarks,
+                                                   sketches = excluded.sketches, report = excluded.report,
+                                                   updated_at = excluded.updated_at
+                ''', (sum(saved.values()), json.dumps(saved), payload, report))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            processed += upper - watermark
+            watermarks = saved
+    finally:
+        for source in sources[1:]:
+            source.close()
+    return processed
+
+
+def rebuild(conn, shard_paths=()):
+    """Drop the sketches and fold in the whole transition log again"""
+    conn.execute('DELETE FROM sla_state')
+    conn.commit()
+    return aggregate(conn, shard_paths=shard_paths)
+
+
+def stored_report(conn):
+    """(watermark, report JSON text) as of the last aggregation - a single-row read"""
+    row = conn.execute('SELECT watermark, report FROM sla_state WHERE id = 1').fetchone()
+    if row is None:
+        return 0, json.dumps(_report(0, {}), separators=(',', ':'))
+    return row[0], row[1]
+
+
+def start_scheduler(db_path, interval_seconds, shard_paths=()):
+    """Run aggregate() every interval_seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+            try:
+                aggregate(conn, shard_paths=shard_paths)
+            except sqlite3.Error as e:
+                print(f"[SLA] Aggregation run failed: {e}")
+            finally:
+                conn.close()
+
+    thread = threading.Thread(target=run, name='surakshita-sla', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dispatch response-time analytics')
+    parser.add_argument('--db', default='surakshita.db')
+    parser.add_argument('--rebuild', action='store_true', help='recompute from the full transition log')
+    parser.add_argument('--shards', type=int, default=0, help='number of incident shard files (0: not sharded)')
+    parser.add_argument('--shard-dir', default='shards')
+    args = parser.parse_args()
+
+    shard_paths = []
+    if args.shards:
+        router = ShardRouter(args.db)
+        router.configure(args.shards, args.shard_dir)
+        shard_paths = router.paths[1:]
+    conn = sqlite3.connect(args.db, timeout=30, isolation_level=None)
+    started = time.perf_counter()
+    count = rebuild(conn, shard_paths) if args.rebuild else aggregate(conn, shard_paths=shard_paths)
+    print(f"Folded in {count} transitions in {time.perf_counter() - started:.2f} s")
+    print(json.dumps(json.loads(stored_report(conn)[1])['metrics'], indent=2))
+    conn.close()
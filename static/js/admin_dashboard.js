@@ -0,0 +1,198 @@
+// Surakshita - Admin dispatch center (dispatch, resolve and live alerts)
+
+// Tab Switching
+document.querySelectorAll('.tab').forEach(tab => {
+    tab.addEventListener('click', () => {
+        // Remove active from all tabs and contents
+        document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
+        document.querySelectorAll('.tab-content').forEach(c => c.classList.remove('active'));
+
+        // Add active to clicked tab
+        tab.classList.add('active');
+        const tabName = tab.getAttribute('data-tab');
+        document.getElementById('tab-' + tabName).classList.add('active');
+    });
+});
+
+// Dispatch Unit Function
+function dispatchUnit(incidentId) {
+    const unitSelect = document.getElementById('unit-' + incidentId);
+    const selectedUnit = unitSelect.value;
+
+    if (!selectedUnit) {
+        alert('Please select a unit to dispatch');
+        return;
+    }
+
+    // Disable button to prevent double-click
+    const btn = event.target;
+    btn.disabled = true;
+    btn.textContent = 'DISPATCHING...';
+
+    fetch(`/api/dispatch/${incidentId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ unit: selectedUnit })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update UI instantly without reload
+            const alertCard = document.getElementById('alert-' + incidentId);
+            const dispatchConsole = alertCard.querySelector('.dispatch-console');
+
+            // Replace dispatch console with dispatched badge
+            dispatchConsole.outerHTML = `
+                <div class="dispatched-badge">
+                    UNIT EN ROUTE: ${selectedUnit}
+                </div>
+                <button class="btn-mark-resolved" onclick="markResolved(${incidentId})">MARK RESOLVED</button>
+            `;
+
+            // Add log entry
+            addLogEntry(`Unit "${selectedUnit}" dispatched to Alert #${incidentId}`);
+        } else {
+            alert('Failed to dispatch unit: ' + (data.error || 'Unknown error'));
+            btn.disabled = false;
+            btn.textContent = 'DISPATCH NOW';
+        }
+    })
+    .catch(error => {
+        console.error('Dispatch error:', error);
+        alert('Network error while dispatching');
+        btn.disabled = false;
+        btn.textContent = 'DISPATCH NOW';
+    });
+}
+
+// Mark Resolved Function
+function markResolved(incidentId) {
+    if (!confirm('Mark this incident as resolved?')) {
+        return;
+    }
+
+    fetch(`/api/admin/resolve/${incidentId}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Remove card from active alerts
+            const alertCard = document.getElementById('alert-' + incidentId);
+            if (alertCard) {
+                alertCard.style.opacity = '0';
+                setTimeout(() => alertCard.remove(), 300);
+            }
+
+            addLogEntry(`Alert #${incidentId} marked as resolved`);
+        } else {
+            alert('Failed to resolve incident: ' + (data.error || 'Unknown error'));
+        }
+    })
+    .catch(error => {
+        console.error('Resolve error:', error);
+        alert('Network error while resolving incident');
+    });
+}
+
+// Poll for New Alerts
+let lastAlertId = Number(document.currentScript.dataset.lastAlertId);
+let alertsEtag = null;
+
+// Conditional GET - idle polls are answered with 304 and no body
+function pollForNewAlerts() {
+    const headers = alertsEtag ? { 'If-None-Match': alertsEtag } : {};
+    fetch(`/api/admin/poll/alerts?last_id=${lastAlertId}`, { headers: headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304) {
+                return null;
+            }
+            alertsEtag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(data => {
+            if (data && data.alerts && data.alerts.length > 0) {
+                // Update lastAlertId
+                const maxId = Math.max(...data.alerts.map(a => a.id));
+                if (maxId > lastAlertId) {
+                    lastAlertId = maxId;
+
+                    // Add log entry for new alerts
+                    addLogEntry(`${data.alerts.length} new alert(s) received`);
+
+                    // Reload page to show new alerts (simple approach)
+                    // For production, implement dynamic card injection
+                    location.reload();
+                }
+            }
+
+            // Update polling status indicator
+            document.getElementById('polling-dot').classList.remove('inactive');
+            document.getElementById('polling-status').textContent = 'ACTIVE';
+        })
+        .catch(error => {
+            console.error('Polling error:', error);
+            document.getElementById('polling-dot').classList.add('inactive');
+            document.getElementById('polling-status').textContent = 'ERROR';
+        });
+}
+
+// Add Log Entry to System Logs
+function addLogEntry(message) {
+    const logsContainer = document.getElementById('system-logs');
+    const now = new Date();
+    const timeStr = now.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' });
+
+    const logEntry = document.createElement('div');
+    logEntry.className = 'log-entry';
+    logEntry.innerHTML = `<span class="log-time">${timeStr}</span>${message}`;
+
+    // Insert at top
+    logsContainer.insertBefore(logEntry, logsContainer.firstChild);
+
+    // Keep only last 20 entries
+    while (logsContainer.children.length > 20) {
+        logsContainer.removeChild(logsContainer.lastChild);
+    }
+}
+
+// Start polling every 5 seconds
+function startPolling() {
+    setInterval(pollForNewAlerts, 5000);
+
+    // Initial poll
+    pollForNewAlerts();
+}
+
+// Prefer the push channel (async serving mode), fall back to polling
+if (window.EventSource) {
+    const alertStream = new EventSource('/api/admin/stream/alerts');
+    let streamOpened = false;
+
+    alertStream.onopen = () => {
+        streamOpened = true;
+        document.getElementById('polling-dot').classList.remove('inactive');
+        document.getElementById('polling-status').textContent = 'LIVE';
+    };
+
+    alertStream.addEventListener('alerts', (event) => {
+        const data = JSON.parse(event.data);
+        addLogEntry(`${data.count} new alert(s) received`);
+        location.reload();
+    });
+
+    alertStream.onerror = () => {
+        // Endpoint missing (plain Flask server) - switch to polling
+        if (!streamOpened) {
+            alertStream.close();
+            startPolling();
+        }
+    };
+} else {
+    startPolling();
+}
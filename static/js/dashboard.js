@@ -0,0 +1,526 @@
+// Surakshita - Dashboard page (charts, maps and the SOS button)
+
+// Server-rendered data, from the JSON block in dashboard.html
+const pageData = JSON.parse(document.getElementById('dashboard-data').textContent);
+
+// Map Configuration - Grayscale CartoDB Positron
+const indiaBounds = L.latLngBounds(
+    [6.0, 68.0],
+    [38.0, 98.0]
+);
+
+let map = L.map('map', {
+    maxBounds: indiaBounds,
+    maxBoundsViscosity: 1.0
+}).setView([20.5937, 78.9629], 5);
+
+// Grayscale/High-Contrast Tiles - CartoDB Positron
+L.tileLayer('https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png', {
+    attribution: '©OpenStreetMap ©CartoDB',
+    subdomains: 'abcd',
+    maxZoom: 18
+}).addTo(map);
+
+// Fetch incident data
+fetch('/api/incidents')
+    .then(response => response.json())
+    .then(data => {
+        if (data.length === 0) {
+            L.marker([28.6139, 77.2090]).addTo(map)
+                .bindPopup('<b>No incidents yet</b>')
+                .openPopup();
+            return;
+        }
+
+        const markers = L.markerClusterGroup({
+            iconCreateFunction: function(cluster) {
+                const count = cluster.getChildCount();
+                return L.divIcon({
+                    html: '<div><span>' + count + '</span></div>',
+                    className: 'marker-cluster',
+                    iconSize: L.point(40, 40)
+                });
+            }
+        });
+
+        const heatData = [];
+
+        data.forEach(incident => {
+            const lat = parseFloat(incident.latitude);
+            const lng = parseFloat(incident.longitude);
+
+            heatData.push([lat, lng, 0.5]);
+
+            // Simple black markers
+            const markerIcon = L.divIcon({
+                className: 'custom-marker',
+                html: `<div style="background-color: #111111; width: 10px; height: 10px; border-radius: 50%; border: 2px solid white;"></div>`,
+                iconSize: [10, 10]
+            });
+
+            const marker = L.marker([lat, lng], { icon: markerIcon });
+
+            const popupContent = `
+                <div style="color: #111111; font-size: 0.875rem;">
+                    <strong>${incident.incident_type}</strong><br>
+                    ${incident.description.substring(0, 100)}<br>
+                    <span style="color: #737373; font-size: 0.75rem;">${new Date(incident.created_at).toLocaleDateString()}</span>
+                </div>
+            `;
+            marker.bindPopup(popupContent);
+            markers.addLayer(marker);
+        });
+
+        map.addLayer(markers);
+
+        if (heatData.length > 0) {
+            L.heatLayer(heatData, {
+                radius: 25,
+                blur: 15,
+                maxZoom: 17,
+                max: 1.0,
+                gradient: {
+                    0.0: 'transparent',
+                    0.5: '#E5E5E5',
+                    1.0: '#737373'
+                }
+            }).addTo(map);
+        }
+
+        // Fit map to show all markers
+        if (data.length > 0) {
+            const bounds = L.latLngBounds(data.map(inc => [inc.latitude, inc.longitude]));
+            map.fitBounds(bounds, { padding: [50, 50] });
+        }
+    })
+    .catch(error => console.error('Error loading incident data:', error));
+
+// Chart.js Configuration - Swiss Minimal Style
+Chart.defaults.color = '#111111';
+Chart.defaults.borderColor = '#E5E5E5';
+Chart.defaults.font.family = 'Inter';
+
+// Bar Chart - Incidents by Category
+const categoryData = pageData.incidentsByCategory;
+const categoryLabels = categoryData.map(item => item.incident_type || item[0]);
+const categoryCounts = categoryData.map(item => item.count || item[1]);
+
+const categoryCtx = document.getElementById('categoryChart').getContext('2d');
+new Chart(categoryCtx, {
+    type: 'bar',
+    data: {
+        labels: categoryLabels.length > 0 ? categoryLabels : ['No Data'],
+        datasets: [{
+            label: 'Incidents',
+            data: categoryCounts.length > 0 ? categoryCounts : [0],
+            backgroundColor: 'transparent',
+            borderColor: '#111111',
+            borderWidth: 2
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        animation: {
+            duration: 0
+        },
+        plugins: {
+            legend: {
+                display: false
+            },
+            tooltip: {
+                backgroundColor: '#111111',
+                titleColor: '#FFFFFF',
+                bodyColor: '#FFFFFF',
+                borderColor: '#111111',
+                borderWidth: 1,
+                padding: 12,
+                displayColors: false,
+                titleFont: {
+                    size: 12,
+                    weight: '700'
+                },
+                bodyFont: {
+                    size: 11,
+                    weight: '400'
+                }
+            }
+        },
+        scales: {
+            y: {
+                beginAtZero: true,
+                ticks: {
+                    stepSize: 1,
+                    color: '#737373',
+                    font: {
+                        size: 11
+                    }
+                },
+                grid: {
+                    display: false
+                },
+                border: {
+                    display: false
+                }
+            },
+            x: {
+                ticks: {
+                    color: '#111111',
+                    font: {
+                        size: 11,
+                        weight: '600'
+                    }
+                },
+                grid: {
+                    display: false
+                },
+                border: {
+                    color: '#111111',
+                    width: 1
+                }
+            }
+        }
+    }
+});
+
+// Line Chart - Reports Over Time
+const timelineData = pageData.reportsOverTime;
+const timelineLabels = timelineData.map(item => {
+    const date = new Date(item.date || item[0]);
+    return date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
+});
+const timelineCounts = timelineData.map(item => item.count || item[1]);
+
+const timelineCtx = document.getElementById('timelineChart').getContext('2d');
+new Chart(timelineCtx, {
+    type: 'line',
+    data: {
+        labels: timelineLabels.length > 0 ? timelineLabels : ['No Data'],
+        datasets: [{
+            label: 'Incidents',
+            data: timelineCounts.length > 0 ? timelineCounts : [0],
+            borderColor: '#111111',
+            backgroundColor: 'transparent',
+            borderWidth: 2,
+            fill: false,
+            tension: 0,
+            pointRadius: 0,
+            pointHoverRadius: 0
+        }]
+    },
+    options: {
+        responsive: true,
+        maintainAspectRatio: false,
+        animation: {
+            duration: 0
+        },
+        plugins: {
+            legend: {
+                display: false
+            },
+            tooltip: {
+                backgroundColor: '#111111',
+                titleColor: '#FFFFFF',
+                bodyColor: '#FFFFFF',
+                borderColor: '#111111',
+                borderWidth: 1,
+                padding: 12,
+                displayColors: false,
+                titleFont: {
+                    size: 12,
+                    weight: '700'
+                },
+                bodyFont: {
+                    size: 11,
+                    weight: '400'
+                }
+            }
+        },
+        scales: {
+            y: {
+                beginAtZero: true,
+                ticks: {
+                    stepSize: 1,
+                    color: '#737373',
+                    font: {
+                        size: 11
+                    }
+                },
+                grid: {
+                    display: false
+                },
+                border: {
+                    display: false
+                }
+            },
+            x: {
+                ticks: {
+                    color: '#111111',
+                    font: {
+                        size: 11,
+                        weight: '600'
+                    }
+                },
+                grid: {
+                    display: false
+                },
+                border: {
+                    color: '#111111',
+                    width: 1
+                }
+            }
+        }
+    }
+});
+
+// ==================== SOS FUNCTIONALITY ====================
+
+// SOS Button Event Listener
+document.getElementById('sosButton').addEventListener('click', function() {
+    document.getElementById('sosModal').classList.add('active');
+});
+
+// Open SOS Modal with Smooth Transition
+function openSosModal() {
+    const modal = document.getElementById('sosModal');
+    modal.style.display = 'flex';
+    // Use a small timeout to allow display:flex to register before opacity change
+    setTimeout(() => {
+        modal.classList.add('active');
+        const modalContent = modal.querySelector('.bg-gray-900');
+        if (modalContent) {
+            modalContent.style.transform = 'scale(1)';
+        }
+    }, 10);
+}
+
+// Close SOS Modal with Smooth Transition
+function closeSosModal() {
+    const modal = document.getElementById('sosModal');
+    modal.classList.remove('active');
+    const modalContent = modal.querySelector('.bg-gray-900');
+    if (modalContent) {
+        modalContent.style.transform = 'scale(0.95)';
+    }
+    // Wait for CSS transition (0.3s) before hiding
+    setTimeout(() => {
+        modal.style.display = 'none';
+        document.getElementById('sosStatus').innerHTML = '';
+    }, 300);
+}
+
+// Send SOS Alert
+function sendSOS() {
+    const statusDiv = document.getElementById('sosStatus');
+    statusDiv.innerHTML = '<i class="fas fa-spinner fa-spin mr-2"></i><span class="text-yellow-400">Getting location...</span>';
+
+    if (!navigator.geolocation) {
+        statusDiv.innerHTML = '<span class="text-red-400"><i class="fas fa-exclamation-triangle"></i> Geolocation not supported</span>';
+        return;
+    }
+
+    navigator.geolocation.getCurrentPosition(
+        function(position) {
+            const latitude = position.coords.latitude;
+            const longitude = position.coords.longitude;
+            const incidentType = document.getElementById('sosIncidentType').value;
+            const requiredHelp = document.getElementById('sosRequiredHelp').value;
+            const description = document.getElementById('sosDescription').value || 'Emergency SOS alert triggered';
+
+            // Validate required help selection
+            if (!requiredHelp) {
+                statusDiv.innerHTML = '<span class="text-red-400">✗ Please select what help you need</span>';
+                return;
+            }
+
+            statusDiv.innerHTML = '<i class="fas fa-spinner fa-spin mr-2"></i><span class="text-yellow-400">Sending alert...</span>';
+
+            // Send SOS to backend
+            fetch('/api/report', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': pageData.csrfToken
+                },
+                body: JSON.stringify({
+                    latitude: latitude,
+                    longitude: longitude,
+                    incident_type: incidentType,
+                    required_help: requiredHelp,
+                    description: description
+                })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    statusDiv.innerHTML = '<span class="text-green-400">✓ SOS Alert Sent Successfully!</span>';
+
+                    // Show success notification
+                    showNotification('SOS Alert Sent!', 'Your emergency alert has been sent. Help is on the way.', 'success');
+
+                    // Close modal after 2 seconds
+                    setTimeout(() => {
+                        closeSosModal();
+                        // Reload page to show new incident
+                        location.reload();
+                    }, 2000);
+                } else {
+                    statusDiv.innerHTML = '<span class="text-red-400">✗ Error: ' + data.error + '</span>';
+                }
+            })
+            .catch(error => {
+                statusDiv.innerHTML = '<span class="text-red-400">✗ Network error occurred</span>';
+                console.error('Error sending SOS:', error);
+            });
+        },
+        function(error) {
+            let errorMsg = 'Unable to get location';
+            if (error.code === error.PERMISSION_DENIED) {
+                errorMsg = 'Location permission denied. Please enable location access.';
+            }
+            statusDiv.innerHTML = '<span class="text-red-400">✗ ' + errorMsg + '</span>';
+        },
+        {
+            enableHighAccuracy: true,
+            timeout: 10000,
+            maximumAge: 0
+        }
+    );
+}
+
+// ==================== REAL-TIME POLLING ====================
+
+let lastIncidentId = 0;
+// Ids already shown - with sharding a poll also returns the last few seconds before lastIncidentId
+const seenIncidentIds = new Set();
+let pollingInterval;
+
+// Initialize polling
+function initPolling() {
+    // Get the highest incident ID currently displayed
+    fetch('/api/incidents')
+        .then(response => response.json())
+        .then(data => {
+            if (data.length > 0) {
+                lastIncidentId = Math.max(...data.map(inc => inc.id));
+                data.forEach(inc => seenIncidentIds.add(inc.id));
+            }
+
+            // Start polling every 5 seconds
+            pollingInterval = setInterval(pollForNewIncidents, 5000);
+        })
+        .catch(error => console.error('Error initializing polling:', error));
+}
+
+// Poll for new incidents - conditional GET, so idle polls are answered with 304
+let pollEtag = null;
+
+function pollForNewIncidents() {
+    const headers = pollEtag ? { 'If-None-Match': pollEtag } : {};
+    fetch(`/api/poll/incidents?last_id=${lastIncidentId}`, { headers: headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304) {
+                return null;
+            }
+            pollEtag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(data => {
+            const incidents = data ? data.incidents.filter(inc => !seenIncidentIds.has(inc.id)) : [];
+            if (incidents.length > 0) {
+                // Update last incident ID
+                const newIds = incidents.map(inc => inc.id);
+                newIds.forEach(id => seenIncidentIds.add(id));
+                lastIncidentId = Math.max(...newIds, lastIncidentId);
+
+                // Show notification
+                if (incidents.some(inc => inc.is_sos)) {
+                    showNotification('High Alert!', `${incidents.length} new SOS alert(s) received!`, 'alert');
+                } else {
+                    showNotification('New Incident', `${incidents.length} new incident(s) reported`, 'info');
+                }
+
+                // Smooth fly to new incidents on map
+                if (incidents.length > 0) {
+                    const bounds = L.latLngBounds(incidents.map(inc => [inc.latitude, inc.longitude]));
+                    map.flyToBounds(bounds, {
+                        padding: [50, 50],
+                        duration: 1.5 // Smooth 1.5 second flight
+                    });
+                }
+
+                // Update last update time
+                updateLastUpdateTime();
+
+                // Reload page to show new data (you can implement dynamic updates instead)
+                setTimeout(() => location.reload(), 2000);
+            }
+        })
+        .catch(error => console.error('Error polling for incidents:', error));
+}
+
+// Update last update time
+function updateLastUpdateTime() {
+    const now = new Date();
+    const timeString = now.toLocaleTimeString();
+    document.getElementById('lastUpdateTime').textContent = timeString;
+}
+
+// Enhanced Notification with Slide-In Animation
+function showNotification(title, message, type = 'info') {
+    // Create notification element
+    const notification = document.createElement('div');
+    // Start off-screen to the right
+    notification.style.transform = 'translateX(120%)';
+    notification.className = 'fixed top-4 right-4 z-50 max-w-sm w-full bg-white border-l-4 p-4 shadow-xl rounded-lg transition-all duration-500 ease-in-out';
+
+    let iconColor = 'text-blue-400';
+    let icon = 'fa-info-circle';
+    let borderColor = 'border-blue-500';
+
+    if (type === 'success') {
+        iconColor = 'text-green-400';
+        icon = 'fa-check-circle';
+        borderColor = 'border-green-500';
+    } else if (type === 'alert') {
+        iconColor = 'text-red-400';
+        icon = 'fa-exclamation-triangle';
+        borderColor = 'border-red-500';
+    }
+
+    notification.className += ' ' + borderColor;
+
+    notification.innerHTML = `
+        <div class="flex items-start">
+            <div class="flex-shrink-0">
+                <i class="fas ${icon} ${iconColor} text-2xl"></i>
+            </div>
+            <div class="ml-3 flex-1">
+                <h3 class="text-sm font-semibold text-gray-900">${title}</h3>
+                <p class="mt-1 text-sm text-gray-600">${message}</p>
+            </div>
+            <button onclick="this.parentElement.parentElement.style.transform='translateX(120%)'; setTimeout(() => this.parentElement.parentElement.remove(), 500);" class="ml-3 text-gray-400 hover:text-gray-600">
+                <i class="fas fa-times"></i>
+            </button>
+        </div>
+    `;
+
+    document.body.appendChild(notification);
+
+    // Trigger slide-in animation
+    requestAnimationFrame(() => {
+        notification.style.transform = 'translateX(0)';
+    });
+
+    // Auto-remove after 5 seconds with slide-out
+    setTimeout(() => {
+        notification.style.transform = 'translateX(120%)';
+        setTimeout(() => notification.remove(), 500);
+    }, 5000);
+}
+
+// Start polling when page loads
+initPolling();
+
+// Update time every minute
+setInterval(updateLastUpdateTime, 60000);
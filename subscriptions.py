@@ -0,0 +1,226 @@
+"""Geofence subscriptions: warn users about incidents near places they care about
+
+Users register circles (centre and radius) or polygons around their home,
+college or commute. Each subscription's bounding box is kept in an SQLite
+R*Tree (geofence_subscriptions_rtree), so matching an incident is an index
+lookup for the few boxes containing the point followed by an exact test of
+just those candidates - cost grows with the number of nearby subscriptions,
+not with the total.
+
+Matching runs off the request path: new incidents are put on a local queue
+and a worker thread matches them and writes one notification row per
+subscriber (never the reporter). Users read them from /api/notifications.
+Only the incident type, an approximate location and the time are shared -
+never who reported it.
+
+Tables are created by migrations/0007_geofence_subscriptions.py.
+"""
+import json
+import logging
+import math
+import queue
+import sqlite3
+import threading
+
+from validators import validate_coordinates
+
+logger = logging.getLogger(__name__)
+
+MAX_SUBSCRIPTIONS_PER_USER = 10
+MIN_RADIUS_M = 100
+MAX_RADIUS_M = 20000
+MAX_POLYGON_VERTICES = 100
+MAX_NAME_LENGTH = 50
+
+EARTH_RADIUS_M = 6371000.0
+SHARED_LOCATION_DECIMALS = 3  # ~100 m - enough to know where, not whose door
+
+
+def _bbox_circle(lat, lon, radius_m):
+    """Bounding box of a circle on the same sphere distance_m() uses, so no match falls outside it"""
+    angle = radius_m / EARTH_RADIUS_M
+    dlat = math.degrees(angle) + 1e-6
+    dlon = math.degrees(math.asin(min(1.0, math.sin(angle) / max(math.cos(math.radians(lat)), 1e-6)))) + 1e-6
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def point_in_polygon(lat, lon, ring):
+    """Even-odd test of a point against a ring of [lon, lat] pairs"""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > lat) != (yj > lat) and lon < xi + (lat - yi) * (xj - xi) / (yj - yi):
+            inside = not inside
+        j = i
+    return inside
+
+
+def validate_subscription(data):
+    """Check a subscription request
+
+    Accepts {"name", "type": "circle", "latitude", "longitude", "radius_m"} or
+    {"name", "type": "polygon", "coordinates": [[lon, lat], ...]} (GeoJSON order).
+
+    Returns:
+        (fields dict, None) or (None, error message)
+    """
+    if not isinstance(data, dict):
+        return None, 'Expected a JSON object'
+    name = str(data.get('name') or '').strip()[:MAX_NAME_LENGTH] or 'My area'
+    kind = data.get('type')
+
+    try:
+        if kind == 'circle':
+            lat, lon, radius = float(data['latitude']), float(data['longitude']), float(data['radius_m'])
+            is_valid, error_msg = validate_coordinates(lat, lon)
+            if not is_valid:
+                return None, error_msg
+            if not MIN_RADIUS_M <= radius <= MAX_RADIUS_M:
+                return None, f'radius_m must be between {MIN_RADIUS_M} and {MAX_RADIUS_M}'
+            return {'name': name, 'kind': 'circle', 'latitude': lat, 'longitude': lon, 'radius_m': radius,
+                    'polygon': None, 'bbox': _bbox_circle(lat, lon, radius)}, None
+
+        if kind == 'polygon':
+            ring = [(float(lon), float(lat)) for lon, lat in data['coordinates']]
+            if ring and ring[0] == ring[-1]:
+                ring.pop()
+            if not 3 <= len(ring) <= MAX_POLYGON_VERTICES:
+                return None, f'A polygon needs 3 to {MAX_POLYGON_VERTICES} vertices'
+            for lon, lat in ring:
+                is_valid, error_msg = validate_coordinates(lat, lon)
+                if not is_valid:
+                    return None, error_msg
+            lats, lons = [lat for _, lat in ring], [lon for lon, _ in ring]
+            if distance_m(min(lats), min(lons), max(lats), max(lons)) > 2 * MAX_RADIUS_M * math.sqrt(2):
+                return None, 'Polygon is too large'
+            return {'name': name, 'kind': 'polygon', 'latitude': sum(lats) / len(lats),
+                    'longitude': sum(lons) / len(lons), 'radius_m': None, 'polygon': ring,
+                    'bbox': (min(lats), max(lats), min(lons), max(lons))}, None
+    except (KeyError, TypeError, ValueError):
+        return None, 'Invalid coordinates'
+
+    return None, "type must be 'circle' or 'polygon'"
+
+
+def add_subscription(conn, user_id, fields):
+    """Store a validated subscription and index its bounding box; returns its id or None if at the limit"""
+    count = conn.execute('SELECT COUNT(*) FROM geofence_subscriptions WHERE user_id = ?', (user_id,)).fetchone()[0]
+    if count >= MAX_SUBSCRIPTIONS_PER_USER:
+        return None
+    cursor = conn.execute('''
+        INSERT INTO geofence_subscriptions (user_id, name, kind, latitude, longitude, radius_m, polygon)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, fields['name'], fields['kind'], fields['latitude'], fields['longitude'], fields['radius_m'],
+          json.dumps(fields['polygon']) if fields['polygon'] else None))
+    subscription_id = cursor.lastrowid
+    conn.execute('INSERT INTO geofence_subscriptions_rtree VALUES (?, ?, ?, ?, ?)',
+                 (subscription_id, *fields['bbox']))
+    conn.commit()
+    return subscription_id
+
+
+def delete_subscription(conn, user_id, subscription_id):
+    """Remove one of the user's subscriptions; returns True if it existed"""
+    cursor = conn.execute('DELETE FROM geofence_subscriptions WHERE id = ? AND user_id = ?',
+                          (subscription_id, user_id))
+    if cursor.rowcount:
+        conn.execute('DELETE FROM geofence_subscriptions_rtree WHERE id = ?', (subscription_id,))
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+# Candidates: subscriptions whose bounding box contains the point
+CANDIDATES_SQL = '''
+    SELECT s.id, s.user_id, s.kind, s.latitude, s.longitude, s.radius_m, s.polygon
+    FROM geofence_subscriptions_rtree r
+    JOIN geofence_subscriptions s ON s.id = r.id
+    WHERE r.min_lat <= ? AND r.max_lat >= ? AND r.min_lon <= ? AND r.max_lon >= ?
+'''
+
+
+def match(conn, latitude, longitude):
+    """[(subscription id, user id)] of every subscription containing the point"""
+    matches = []
+    for sub_id, user_id, kind, lat, lon, radius_m, polygon in conn.execute(
+        CANDIDATES_SQL, (latitude, latitude, longitude, longitude)
+    ):
+        if kind == 'circle':
+            hit = distance_m(latitude, longitude, lat, lon) <= radius_m
+        else:
+            hit = point_in_polygon(latitude, longitude, json.loads(polygon))
+        if hit:
+            matches.append((sub_id, user_id))
+    return matches
+
+
+class Notifier:
+    """Matches new incidents against subscriptions on a worker thread and stores notifications
+
+    Args:
+        db_path: Database holding the subscriptions and notifications
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.enabled = False
+        self._queue = None
+        self.metrics = {'submitted': 0, 'dropped': 0, 'matched': 0, 'notifications': 0, 'failures': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('NOTIFY_ENABLED', True)
+        if self.enabled:
+            self._queue = queue.Queue(maxsize=app.config.get('NOTIFY_QUEUE_SIZE', 10000))
+            threading.Thread(target=self._run, name='surakshita-notifier', daemon=True).start()
+
+    def submit(self, incident_id, reporter_id, incident_type, latitude, longitude):
+        """Queue a new incident for matching - never blocks the caller"""
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait((incident_id, reporter_id, incident_type, latitude, longitude))
+            self.metrics['submitted'] += 1
+        except queue.Full:
+            self.metrics['dropped'] += 1
+            print(f"[NOTIFY] Queue full, no notifications for incident {incident_id}")
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        while True:
+            item = self._queue.get()
+            try:
+                self.metrics['notifications'] += self.notify(conn, *item)
+                self.metrics['matched'] += 1
+            except Exception:
+                # Anything, so one bad incident cannot stop notifications for good
+                conn.rollback()
+                self.metrics['failures'] += 1
+                logger.exception(f"[NOTIFY] Matching incident {item[0]} failed")
+            finally:
+                self._queue.task_done()
+
+    def notify(self, conn, incident_id, reporter_id, incident_type, latitude, longitude):
+        """Match one incident and write its notifications; returns how many were written"""
+        recipients = {}
+        for sub_id, user_id in match(conn, latitude, longitude):
+            if user_id != reporter_id:
+                recipients.setdefault(user_id, sub_id)  # One notification per user, however many areas match
+        if recipients:
+            shared_lat = round(latitude, SHARED_LOCATION_DECIMALS)
+            shared_lon = round(longitude, SHARED_LOCATION_DECIMALS)
+            conn.executemany('''
+                INSERT INTO notifications (user_id, incident_id, subscription_id, incident_type, latitude, longitude)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(user_id, incident_id, sub_id, incident_type, shared_lat, shared_lon)
+                  for user_id, sub_id in recipients.items()])
+            conn.commit()
+        return len(recipients)
@@ -1,6 +1,29 @@
 """Input validation functions for Surakshita"""
 import re
-from typing import Tuple, Optional
+from typing import List, Optional, Sequence, Tuple
+
+import geofence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OUTSIDE_INDIA_ERROR = "This service is only available within Indian territories."
+
+INCIDENT_TYPES = frozenset({
+    'Harassment', 'Stalking', 'Assault', 'Theft',
+    'Suspicious Activity', 'Unsafe Area', 'Other',
+    'SOS Emergency', 'Emergency', 'Threat'
+})
+
+# Suspicious description content, compiled once (descriptions are checked in bulk)
+SUSPICIOUS_DESCRIPTION = re.compile(
+    r'<script[^>]*>'    # Script tags
+    r'|javascript:'     # JavaScript protocol
+    r'|on\w+\s*=',      # Event handlers (onclick, onerror, etc.)
+    re.IGNORECASE
+)
 
 def validate_coordinates(latitude: float, longitude: float) -> Tuple[bool, Optional[str]]:
     """
@@ -17,11 +40,9 @@ def validate_coordinates(latitude: float, longitude: float) -> Tuple[bool, Optio
         lat = float(latitude)
         lon = float(longitude)
         
-        # Strict bounding box for India - enforced geographic lock
-        # Latitude: 8.4°N to 37.6°N (Kashmir to Kanyakumari)
-        # Longitude: 68.1°E to 97.4°E (Gujarat to Arunachal Pradesh)
-        if not (8.4 <= lat <= 37.6) or not (68.1 <= lon <= 97.4):
-            return False, "This service is only available within Indian territories."
+        # Enforced geographic lock - India boundary polygon (see geofence.py)
+        if not geofence.india().contains(lat, lon):
+            return False, OUTSIDE_INDIA_ERROR
         
         return True, None
     
@@ -29,6 +50,47 @@ def validate_coordinates(latitude: float, longitude: float) -> Tuple[bool, Optio
         return False, "Invalid coordinate format"
 
 
+def validate_coordinates_batch(latitudes: Sequence, longitudes: Sequence) -> List[Optional[str]]:
+    """
+    Validate many GPS coordinates at once with the same rules as validate_coordinates
+    
+    A batch of numbers is converted and checked against the geofence in one
+    vectorized pass (Geofence.contains_many). Only a batch with unparseable
+    values is parsed one value at a time, to find which ones.
+    
+    Args:
+        latitudes: Latitude values
+        longitudes: Longitude values (same length)
+    
+    Returns:
+        List with None for each valid point, or the error message
+    """
+    if np is not None:
+        try:
+            lats = np.asarray(latitudes, dtype=np.float64)
+            lons = np.asarray(longitudes, dtype=np.float64)
+        except (ValueError, TypeError):
+            lats = lons = None  # Some value is not a number: find which below
+        if lats is not None and lats.ndim == 1 and lons.shape == lats.shape:
+            inside = geofence.india().contains_many(lats, lons)
+            return [None if ok else OUTSIDE_INDIA_ERROR for ok in inside]
+
+    errors = []
+    points = []  # (position in errors, lat, lon) of the parseable coordinates
+    for latitude, longitude in zip(latitudes, longitudes):
+        try:
+            points.append((len(errors), float(latitude), float(longitude)))
+            errors.append(None)
+        except (ValueError, TypeError):
+            errors.append("Invalid coordinate format")
+    
+    inside = geofence.india().contains_many([p[1] for p in points], [p[2] for p in points])
+    for (position, _, _), ok in zip(points, inside):
+        if not ok:
+            errors[position] = OUTSIDE_INDIA_ERROR
+    return errors
+
+
 def validate_description(description: str, max_length: int = 500) -> Tuple[bool, Optional[str]]:
     """
     Validate incident description
@@ -47,15 +109,8 @@ def validate_description(description: str, max_length: int = 500) -> Tuple[bool,
         return False, f"Description must be {max_length} characters or less"
     
     # Check for suspicious patterns
-    suspicious_patterns = [
-        r'<script[^>]*>',  # Script tags
-        r'javascript:',     # JavaScript protocol
-        r'on\w+\s*=',      # Event handlers (onclick, onerror, etc.)
-    ]
-    
-    for pattern in suspicious_patterns:
-        if re.search(pattern, description, re.IGNORECASE):
-            return False, "Description contains invalid content"
+    if SUSPICIOUS_DESCRIPTION.search(description):
+        return False, "Description contains invalid content"
     
     return True, None
 
@@ -70,14 +125,8 @@ def validate_incident_type(incident_type: str) -> Tuple[bool, Optional[str]]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    allowed_types = {
-        'Harassment', 'Stalking', 'Assault', 'Theft', 
-        'Suspicious Activity', 'Unsafe Area', 'Other',
-        'SOS Emergency', 'Emergency', 'Threat'
-    }
-    
-    if incident_type not in allowed_types:
-        return False, f"Invalid incident type. Must be one of: {', '.join(allowed_types)}"
+    if incident_type not in INCIDENT_TYPES:
+        return False, f"Invalid incident type. Must be one of: {', '.join(INCIDENT_TYPES)}"
     
     return True, None
 
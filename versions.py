@@ -0,0 +1,129 @@
+"""Data-change version stamps and versioned snapshots for Surakshita
+
+Stamps live in a small memory-mapped file next to the database, so every
+worker process sees the same values and reading one costs a memory load - no
+SQL, no lock. Slot 0 is the global stamp; user ids hash into the remaining
+slots, and two users sharing a slot only costs an occasional extra response.
+Each write replaces a stamp with a fresh random value instead of incrementing
+it, which means concurrent writers in different processes can never produce a
+value a reader has already seen.
+
+Ordering rule: readers take the stamp *before* querying, writers bump it
+*after* committing. A write that races with a read then costs at most one
+extra recompute, never a stale result.
+
+The stamps survive restarts. A tool that changes the database while the app
+is stopped (a restore, a manual edit) should delete the stamp file, so the
+next start begins from fresh random stamps.
+"""
+import mmap
+import os
+import struct
+import threading
+
+_STAMP = struct.Struct('<Q')
+USER_SLOTS = 4096
+
+
+class VersionStamps:
+    """Cross-process data-change counters (global and per user) in a memory-mapped file"""
+
+    def __init__(self, path, user_slots=USER_SLOTS):
+        self.path = path
+        self.user_slots = user_slots
+        self._mapped = None
+        self._open_lock = threading.Lock()
+
+    @property
+    def _map(self):
+        """The stamp file, mapped on first use so importing the app touches no files"""
+        if self._mapped is None:
+            with self._open_lock:
+                if self._mapped is None:
+                    self._mapped = self._open()
+        return self._mapped
+
+    def _open(self):
+        size = _STAMP.size * (1 + self.user_slots)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fresh = os.fstat(fd).st_size < size
+            if fresh:
+                os.ftruncate(fd, size)
+            mapped = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        # Only a new (or truncated) file starts from random stamps: randomizing a live
+        # file would change every stamp under the workers already serving from it
+        if fresh:
+            mapped[:size] = os.urandom(size)
+        return mapped
+
+    def _offset(self, user_id):
+        if user_id is None:
+            return 0
+        return _STAMP.size * (1 + int(user_id) % self.user_slots)
+
+    def current(self, user_id=None):
+        """Return the global stamp, or the stamp for one user's incidents"""
+        return _STAMP.unpack_from(self._map, self._offset(user_id))[0]
+
+    def bump(self, user_id=None):
+        """Mark the data as changed - call after every committed write
+
+        Always bumps the global stamp; pass the owner of the changed incident
+        to bump their stamp as well.
+        """
+        _STAMP.pack_into(self._map, 0, int.from_bytes(os.urandom(8), 'little'))
+        if user_id is not None:
+            _STAMP.pack_into(self._map, self._offset(user_id), int.from_bytes(os.urandom(8), 'little'))
+
+    def dump(self):
+        """Copy of every stamp, for recording which writes a copy of the database has seen"""
+        return bytes(self._map)
+
+    def stamp_in(self, dump, user_id=None):
+        """Read the global or one user's stamp out of a dump()"""
+        return _STAMP.unpack_from(dump, self._offset(user_id))[0]
+
+    def etag(self, prefix, user_id=None):
+        """Strong ETag value (without quotes) for data at the current stamp"""
+        return f"{prefix}-{self.current(user_id):016x}"
+
+
+class VersionedSnapshot:
+    """Single-flight cache of one computed value, invalidated by a version stamp
+
+    Concurrent requests that find the snapshot out of date wait for one thread
+    to recompute it instead of each running the same queries. Pass version to
+    key the snapshot on something other than the global stamp.
+    """
+
+    def __init__(self, compute, stamps, version=None):
+        self.compute = compute
+        self.stamps = stamps
+        self.version = version or stamps.current
+        self._entry = None
+        self._build_lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self):
+        """Return (version, value), recomputing only if the data changed"""
+        entry = self._entry
+        if entry is not None and entry[0] == self.version():
+            self.hits += 1
+            return entry
+
+        with self._build_lock:
+            # Another thread may have rebuilt it while we waited
+            version = self.version()
+            entry = self._entry
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry
+
+            entry = (version, self.compute())
+            self._entry = entry
+            self.builds += 1
+            return entry